@@ -0,0 +1,81 @@
+"""
+Benchmark do pipeline contra simuladores locais da Sankhya, VTEX e Telegram.
+
+    python -m benchmark --pedidos 100 --workers 8 --latencia-ms 40 --taxa-429 0.02
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+from benchmark.simulator import Comportamento, SimuladorSankhya, SimuladorTelegram, SimuladorVtex
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do orquestrador com Sankhya/VTEX simuladas")
+    parser.add_argument("--pedidos", type=int, default=50, help="Pedidos por cenário (padrão: 50)")
+    parser.add_argument("-w", "--workers", type=int, default=8, help="Workers do pipeline (padrão: 8)")
+    parser.add_argument("--cenarios", nargs="+", default=["individual", "agrupado"],
+                        choices=["individual", "agrupado"], help="Cenários executados, em ordem")
+    parser.add_argument("--itens", type=int, default=1, help="Itens por pedido VTEX simulado")
+    parser.add_argument("--latencia-ms", type=float, default=20, help="Latência média da Sankhya simulada")
+    parser.add_argument("--latencia-vtex-ms", type=float, default=None,
+                        help="Latência média da VTEX simulada (padrão: a mesma da Sankhya)")
+    parser.add_argument("--jitter-ms", type=float, default=5, help="Variação máxima da latência (±)")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="Fração de respostas 503")
+    parser.add_argument("--taxa-429", type=float, default=0.0, help="Fração de respostas 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After das respostas 429 (s)")
+    parser.add_argument("--limite-rps", type=float, default=0,
+                        help="Requisições/s aceitas por simulador antes de responder 429 (0 = sem limite)")
+    parser.add_argument("--sem-limite-taxa", action="store_true",
+                        help="Desliga o rate limiter do cliente para medir só os upstreams")
+    parser.add_argument("--semente", type=int, default=None, help="Semente dos sorteios de erro/latência")
+    return parser.parse_args(argv)
+
+
+def _comportamento(args, latencia_ms: float) -> Comportamento:
+    return Comportamento(latencia=latencia_ms / 1000, jitter=args.jitter_ms / 1000, taxa_erro=args.taxa_erro,
+                         taxa_429=args.taxa_429, retry_after=args.retry_after, limite_rps=args.limite_rps,
+                         semente=args.semente)
+
+
+def _configurar_ambiente(args, sankhya_url: str, vtex_url: str, telegram_url: str):
+    """Os módulos do orquestrador leem a configuração ao serem importados: isto roda antes."""
+    os.environ.update({
+        "SANKHYA_BASE_URL": sankhya_url,
+        "VTEX_BASE_URL": vtex_url,
+        "TELEGRAM_API_URL": telegram_url,
+        "SANKHYA_TOKEN": "benchmark", "SANKHYA_APPKEY": "benchmark",
+        "SANKHYA_USERNAME": "benchmark", "SANKHYA_PASSWORD": "benchmark",
+        "VTEX_ACCOUNT": "benchmark", "VTEX_APP_KEY": "benchmark", "VTEX_APP_TOKEN": "benchmark",
+        "BOTTOKEN": "benchmark", "CHATID": "0",
+        "ORQ_DATA_DIR": tempfile.mkdtemp(prefix="orq-benchmark-"),
+    })
+    os.environ.setdefault("APP_ENV", "1")
+    if args.sem_limite_taxa:
+        for variavel in ("RATE_LIMIT_SANKHYA_MGE", "RATE_LIMIT_SANKHYA_MGECOM", "RATE_LIMIT_VTEX_OMS",
+                         "RATE_LIMIT_TELEGRAM"):
+            os.environ[variavel] = "0"
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    latencia_vtex = args.latencia_ms if args.latencia_vtex_ms is None else args.latencia_vtex_ms
+    sankhya = SimuladorSankhya(_comportamento(args, args.latencia_ms))
+    vtex = SimuladorVtex(_comportamento(args, latencia_vtex), itens_por_pedido=args.itens)
+    telegram = SimuladorTelegram()
+    _configurar_ambiente(args, sankhya.iniciar(), vtex.iniciar(), telegram.iniciar())
+
+    from benchmark.scenarios import executar_cenario, formatar_relatorio
+    from sankhya_api.auth import SankhyaClient
+
+    client = SankhyaClient()
+    resultados = []
+    for cenario in args.cenarios:
+        order_ids = [f"{cenario[:3].upper()}{indice:07d}-01" for indice in range(args.pedidos)]
+        resultados.append(executar_cenario(cenario, order_ids, client, args.workers, [sankhya, vtex]))
+
+    print(formatar_relatorio(resultados))
+    for simulador in (sankhya, vtex, telegram):
+        simulador.parar()
+    sys.exit(1 if any(resultado["falhas"] for resultado in resultados) else 0)
@@ -0,0 +1,120 @@
+import time
+from typing import Dict, List
+
+import main
+from observability.metrics import etapa_latencia, sankhya_latencia, vtex_latencia
+from pipeline.approval import AprovacaoConcedida
+from pipeline.batch import processa_lote
+from sankhya_api.auth import SankhyaClient
+from sankhya_api.partner_index import partner_index
+from sankhya_api.product_index import product_index
+from sankhya_api.refcache import reference_cache
+
+
+# ------------------------------------------------------------------------------
+# 🏁 Cenários
+# ------------------------------------------------------------------------------
+
+def _cenario_individual(order_ids: List[str], client: SankhyaClient, workers: int) -> dict:
+    """Um pedido por worker, do cadastro do parceiro ao envio da invoice (processa_pedido_fatura_nota)."""
+    aprovacao = AprovacaoConcedida()
+    return processa_lote(order_ids,
+                         lambda order_id: main.processa_pedido_fatura_nota(order_id, client, aprovacao=aprovacao),
+                         workers)
+
+
+def _cenario_agrupado(order_ids: List[str], client: SankhyaClient, workers: int) -> dict:
+    """Lote em etapas com chamadas de múltiplos registros (--agrupar)."""
+    return main.processa_pedidos_agrupados(order_ids, client, workers, AprovacaoConcedida())
+
+
+CENARIOS = {
+    "individual": _cenario_individual,
+    "agrupado": _cenario_agrupado,
+}
+
+
+# ------------------------------------------------------------------------------
+# 📊 Coleta e relatório
+# ------------------------------------------------------------------------------
+
+def _diferenca_series(antes: dict, depois: dict) -> dict:
+    diferenca = {}
+    for chave, serie in depois.items():
+        anterior = antes.get(chave, {"buckets": [0] * len(serie["buckets"]), "soma": 0.0, "total": 0})
+        total = serie["total"] - anterior["total"]
+        if total:
+            diferenca[chave] = {
+                "total": total,
+                "soma": serie["soma"] - anterior["soma"],
+                "buckets": [a - b for a, b in zip(serie["buckets"], anterior["buckets"])],
+            }
+    return diferenca
+
+
+def _resumo_latencias(histograma, antes: dict) -> Dict[str, dict]:
+    """Média e p95 (limite superior do bucket) de cada série observada durante o cenário."""
+    resumo = {}
+    for chave, serie in _diferenca_series(antes, histograma.series()).items():
+        alvo = 0.95 * serie["total"]
+        p95 = next((limite for limite, quantidade in zip(histograma.buckets, serie["buckets"]) if quantidade >= alvo),
+                   float("inf"))
+        resumo["/".join(chave) or "-"] = {"chamadas": serie["total"], "media": serie["soma"] / serie["total"],
+                                          "p95": p95}
+    return resumo
+
+
+def executar_cenario(nome: str, order_ids: List[str], client: SankhyaClient, workers: int,
+                     simuladores: list) -> dict:
+    # Cada cenário começa sem caches locais para medir o custo real das consultas
+    reference_cache.invalidar()
+    partner_index.invalidar()
+    product_index.invalidar()
+
+    histogramas = {"etapas": etapa_latencia, "sankhya": sankhya_latencia, "vtex": vtex_latencia}
+    antes = {nome_hist: hist.series() for nome_hist, hist in histogramas.items()}
+    chamadas_antes = [simulador.chamadas.copy() for simulador in simuladores]
+
+    inicio = time.perf_counter()
+    resumo = CENARIOS[nome](order_ids, client, workers)
+    duracao = time.perf_counter() - inicio
+
+    chamadas = {}
+    for simulador, anteriores in zip(simuladores, chamadas_antes):
+        for chave, quantidade in (simulador.chamadas - anteriores).items():
+            chamadas[chave] = chamadas.get(chave, 0) + quantidade
+
+    pedidos = len(order_ids)
+    return {
+        "cenario": nome,
+        "pedidos": pedidos,
+        "falhas": len(resumo["falhas"]),
+        "duracao": duracao,
+        "pedidos_por_segundo": pedidos / duracao if duracao > 0 else 0.0,
+        "chamadas_por_pedido": sum(chamadas.values()) / pedidos if pedidos else 0.0,
+        "chamadas": {chave: quantidade / pedidos for chave, quantidade in sorted(chamadas.items())},
+        "latencias": {nome_hist: _resumo_latencias(hist, antes[nome_hist])
+                      for nome_hist, hist in histogramas.items()},
+    }
+
+
+def formatar_relatorio(resultados: List[dict]) -> str:
+    linhas = ["", f"{'cenário':<12} {'pedidos':>8} {'falhas':>7} {'duração':>9} {'pedidos/s':>10} {'chamadas/pedido':>16}"]
+    for r in resultados:
+        linhas.append(f"{r['cenario']:<12} {r['pedidos']:>8} {r['falhas']:>7} {r['duracao']:>8.2f}s "
+                      f"{r['pedidos_por_segundo']:>10.2f} {r['chamadas_por_pedido']:>16.2f}")
+
+    for r in resultados:
+        linhas.append("")
+        linhas.append(f"── {r['cenario']} ──")
+        linhas.append("  chamadas por pedido:")
+        for chave, media in r["chamadas"].items():
+            linhas.append(f"    {chave:<40} {media:>6.2f}")
+        for grupo, series in r["latencias"].items():
+            if not series:
+                continue
+            linhas.append(f"  latência ({grupo}):")
+            for chave, serie in sorted(series.items()):
+                linhas.append(f"    {chave:<40} n={serie['chamadas']:<6} média={serie['media'] * 1000:8.1f}ms "
+                              f"p95≤{serie['p95'] * 1000:8.0f}ms")
+    return "\n".join(linhas)
@@ -0,0 +1,462 @@
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter, deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Chave primária de cada entidade: o loadRecords a devolve depois dos campos pedidos quando não listada
+CHAVES_PRIMARIAS = {
+    "Parceiro": "CODPARC",
+    "Endereco": "CODEND",
+    "Bairro": "CODBAI",
+    "Cidade": "CODCID",
+    "Produto": "CODPROD",
+    "Estoque": "CODPROD",
+    "ComplementoParc": "CODPARC",
+}
+
+
+def _codigo_estavel(texto: str) -> str:
+    return str(zlib.crc32(texto.encode("utf-8")) % 90000 + 10000)
+
+
+def _valores_lista(sql: str) -> list:
+    """Valores do último IN (...) do SQL, sem aspas."""
+    grupos = re.findall(r"IN\s*\(([^)]*)\)", sql, flags=re.IGNORECASE)
+    if not grupos:
+        return []
+    return [valor.strip().strip("'") for valor in grupos[-1].split(",") if valor.strip()]
+
+
+# ------------------------------------------------------------------------------
+# 🎛️ Comportamento configurável (latência, erros, 429)
+# ------------------------------------------------------------------------------
+class Comportamento:
+    """
+    Latência (s) com jitter, fração de respostas 503 e 429 sorteadas ao acaso e,
+    opcionalmente, um limite de requisições por segundo acima do qual o
+    servidor responde 429 como um gateway real.
+    """
+
+    def __init__(self, latencia: float = 0.0, jitter: float = 0.0, taxa_erro: float = 0.0,
+                 taxa_429: float = 0.0, retry_after: float = 1.0, limite_rps: float = 0.0, semente: int = None):
+        self.latencia = latencia
+        self.jitter = jitter
+        self.taxa_erro = taxa_erro
+        self.taxa_429 = taxa_429
+        self.retry_after = retry_after
+        self.limite_rps = limite_rps
+        self._random = random.Random(semente)
+        self._janela = deque()
+        self._lock = threading.Lock()
+
+    def _acima_do_limite(self, agora: float) -> bool:
+        if not self.limite_rps:
+            return False
+        while self._janela and agora - self._janela[0] >= 1.0:
+            self._janela.popleft()
+        if len(self._janela) >= self.limite_rps:
+            return True
+        self._janela.append(agora)
+        return False
+
+    def sortear(self):
+        """Retorna (espera, status forçado ou None) para a próxima requisição."""
+        with self._lock:
+            espera = max(0.0, self.latencia + self._random.uniform(-self.jitter, self.jitter))
+            sorteio = self._random.random()
+            limitado = self._acima_do_limite(time.monotonic())
+        if limitado or sorteio < self.taxa_429:
+            return espera, 429
+        if sorteio < self.taxa_429 + self.taxa_erro:
+            return espera, 503
+        return espera, None
+
+
+# ------------------------------------------------------------------------------
+# 🌐 Servidor HTTP base dos simuladores
+# ------------------------------------------------------------------------------
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Cabeçalhos e corpo saem em escritas separadas; sem isto o Nagle soma ~40ms por resposta
+    disable_nagle_algorithm = True
+
+    def _ler_corpo(self):
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        bruto = self.rfile.read(tamanho) if tamanho else b""
+        if not bruto:
+            return {}
+        try:
+            return json.loads(bruto)
+        except ValueError:
+            return {campo: valores[0] for campo, valores in parse_qs(bruto.decode("utf-8")).items()}
+
+    def _responder(self, status: int, corpo=None, headers=None):
+        dados = json.dumps(corpo if corpo is not None else {}, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(dados)))
+        for nome, valor in (headers or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _atender(self, metodo):
+        simulador = self.server.simulador
+        partes = urlsplit(self.path)
+        corpo = self._ler_corpo()
+        chave = simulador.chave_requisicao(metodo, partes, corpo)
+        simulador.registrar(chave)
+
+        espera, forcado = simulador.comportamento.sortear()
+        if espera:
+            time.sleep(espera)
+        if forcado == 429:
+            self._responder(429, {"error": "Too Many Requests"},
+                            {"Retry-After": f"{simulador.comportamento.retry_after:g}"})
+            return
+        if forcado:
+            self._responder(forcado, {"error": "Service Unavailable"})
+            return
+        try:
+            status, resposta = simulador.atender(metodo, partes, corpo, self.headers)
+        except Exception as e:
+            status, resposta = 500, {"error": f"{e.__class__.__name__}: {e}"}
+        self._responder(status, resposta)
+
+    def do_GET(self):
+        self._atender("GET")
+
+    def do_POST(self):
+        self._atender("POST")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Simulador:
+    """Servidor local em thread própria; subclasses implementam `atender`."""
+
+    def __init__(self, comportamento: Comportamento = None):
+        self.comportamento = comportamento or Comportamento()
+        self.chamadas = Counter()
+        self._lock_chamadas = threading.Lock()
+        self._servidor = None
+
+    @property
+    def url(self) -> str:
+        host, porta = self._servidor.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def iniciar(self, porta: int = 0) -> str:
+        self._servidor = ThreadingHTTPServer(("127.0.0.1", porta), _Handler)
+        self._servidor.daemon_threads = True
+        self._servidor.simulador = self
+        threading.Thread(target=self._servidor.serve_forever, name=self.__class__.__name__, daemon=True).start()
+        return self.url
+
+    def parar(self):
+        if self._servidor is not None:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+
+    def registrar(self, chave: str):
+        with self._lock_chamadas:
+            self.chamadas[chave] += 1
+
+    def chave_requisicao(self, metodo, partes, corpo) -> str:
+        return f"{metodo} {partes.path}"
+
+    def atender(self, metodo, partes, corpo, headers):
+        raise NotImplementedError
+
+
+# ------------------------------------------------------------------------------
+# 🏭 Gateway Sankhya
+# ------------------------------------------------------------------------------
+class SimuladorSankhya(Simulador):
+    """
+    Responde /login e /gateway/v1/{mge,mgecom}/service.sbr com o formato da
+    Sankhya para os serviços usados pelo orquestrador, guardando parceiros,
+    pedidos e notas em memória.
+    """
+
+    TOKEN = "token-simulado"
+
+    def __init__(self, comportamento: Comportamento = None):
+        super().__init__(comportamento)
+        self._lock = threading.Lock()
+        self._sequencia_parceiro = itertools.count(5000)
+        self._sequencia_nota = itertools.count(100000)
+        self.parceiros = {}          # CODPARC -> {campo: valor}
+        self.pedidos = {}            # NUNOTA -> {"origem", "statusnota", "itens", "nota"}
+        self.notas_por_pedido = {}   # NUNOTAORIG -> NUNOTA da nota faturada
+        self.referencias = {}        # entidade -> {nome: codigo}
+
+    def chave_requisicao(self, metodo, partes, corpo) -> str:
+        servico = parse_qs(partes.query).get("serviceName", [None])[0]
+        return servico or partes.path
+
+    def atender(self, metodo, partes, corpo, headers):
+        if partes.path.endswith("/login"):
+            return 200, {"bearerToken": self.TOKEN, "expires_in": 3600}
+        if headers.get("Authorization") != f"Bearer {self.TOKEN}":
+            return 401, {"error": "Não autorizado"}
+
+        servico = parse_qs(partes.query).get("serviceName", [""])[0]
+        corpo_requisicao = corpo.get("requestBody", {})
+        tratadores = {
+            "CRUDServiceProvider.loadRecords": self._load_records,
+            "DatasetSP.save": self._dataset_save,
+            "CACSP.incluirNota": self._incluir_nota,
+            "CACSP.confirmarNota": self._confirmar_nota,
+            "SelecaoDocumentoSP.faturar": self._faturar,
+            "DbExplorerSP.executeQuery": self._execute_query,
+        }
+        tratador = tratadores.get(servico)
+        if tratador is None:
+            return 200, {"serviceName": servico, "status": "0", "statusMessage": "Serviço não simulado"}
+        with self._lock:
+            resposta = tratador(corpo_requisicao)
+        return 200, {"serviceName": servico, "status": "1", **resposta}
+
+    # -- CRUDServiceProvider.loadRecords ---------------------------------------
+    def _linhas_entidade(self, entidade: str, criterio: str) -> list:
+        if entidade == "Parceiro":
+            cpfs = re.findall(r"'([^']*)'", criterio or "")
+            return [dados for dados in self.parceiros.values()
+                    if not cpfs or dados.get("CGC_CPF") in cpfs]
+
+        chave = CHAVES_PRIMARIAS.get(entidade, "CODIGO")
+        conhecidas = self.referencias.setdefault(entidade, {})
+        if not criterio:
+            return [{chave: codigo, "NOME": nome} for nome, codigo in conhecidas.items()]
+
+        nomes = re.findall(r"'([^']*)'", criterio)
+        linhas = []
+        for nome in nomes or [criterio]:
+            codigo = conhecidas.setdefault(nome, _codigo_estavel(f"{entidade}:{nome}"))
+            if entidade == "Endereco":
+                # Logradouros com o mesmo nome e tipos diferentes (Rua X, Avenida X, Travessa X)
+                for tipo in ("R", "Av", "TV"):
+                    linhas.append({"CODEND": _codigo_estavel(f"Endereco:{tipo}:{nome}"), "NOMEEND": nome,
+                                   "TIPO": tipo})
+            elif entidade == "Produto":
+                linhas.append({"CODPROD": nome, "REFERENCIA": nome, "ATIVO": "S", "DESCRPROD": f"Produto {nome}"})
+            elif entidade == "Estoque":
+                linhas.append({"CODPROD": nome, "ESTOQUE": 1000, "RESERVADO": 0})
+            else:
+                linhas.append({chave: codigo, "NOMEBAI": nome, "NOMECID": nome})
+        return linhas
+
+    def _load_records(self, corpo: dict) -> dict:
+        data_set = corpo.get("dataSet", {})
+        entidade = data_set.get("rootEntity")
+        criterio = (data_set.get("criteria") or {}).get("expression", {}).get("$")
+        entidade_campos = data_set.get("entity") or {}
+        if isinstance(entidade_campos, list):
+            entidade_campos = entidade_campos[0] if entidade_campos else {}
+        campos = [campo.strip() for campo in entidade_campos.get("fieldset", {}).get("list", "").split(",")
+                  if campo.strip()]
+        chave = CHAVES_PRIMARIAS.get(entidade)
+        if chave and chave not in campos:
+            campos.append(chave)
+
+        linhas = self._linhas_entidade(entidade, criterio)
+        entidades = [{f"f{i}": ({"$": str(linha[campo])} if linha.get(campo) is not None else {})
+                      for i, campo in enumerate(campos)} for linha in linhas]
+        resultado = {"total": str(len(entidades)), "hasMoreResult": "false", "offsetPage": "0",
+                     "metadata": {"fields": {"field": [{"name": campo} for campo in campos]}}}
+        if entidades:
+            resultado["entity"] = entidades[0] if len(entidades) == 1 else entidades
+        return {"responseBody": {"entities": resultado}}
+
+    # -- DatasetSP.save ----------------------------------------------------------
+    def _dataset_save(self, corpo: dict) -> dict:
+        entidade = corpo.get("entityName")
+        campos = corpo.get("fields", [])
+        chave = CHAVES_PRIMARIAS.get(entidade, "CODIGO")
+        resultado = []
+        for registro in corpo.get("records", []):
+            valores = {campos[int(indice)]: valor for indice, valor in registro.get("values", {}).items()}
+            codigo = (registro.get("pk") or {}).get(chave) or valores.get(chave)
+            if entidade == "Parceiro":
+                if not codigo:
+                    codigo = str(next(self._sequencia_parceiro))
+                self.parceiros.setdefault(str(codigo), {}).update(valores, **{chave: str(codigo)})
+            valores[chave] = codigo
+            resultado.append([valores.get(campo) for campo in campos])
+        return {"responseBody": {"result": resultado}}
+
+    # -- CACSP / SelecaoDocumentoSP ---------------------------------------------
+    def _incluir_nota(self, corpo: dict) -> dict:
+        nota = corpo.get("nota", {})
+        cabecalho = nota.get("cabecalho", {})
+        itens = nota.get("itens", {}).get("item", [])
+        nunota = str(next(self._sequencia_nota))
+        self.pedidos[nunota] = {
+            "origem": cabecalho.get("AD_NUNOTAORIG", {}).get("$"),
+            "statusnota": "A",
+            "itens": itens if isinstance(itens, list) else [itens],
+            "nota": None,
+        }
+        return {"responseBody": {"pk": {"NUNOTA": {"$": nunota}}}}
+
+    def _confirmar_nota(self, corpo: dict) -> dict:
+        nunota = str(corpo.get("nota", {}).get("NUNOTA", {}).get("$"))
+        if nunota in self.pedidos:
+            self.pedidos[nunota]["statusnota"] = "L"
+        return {"responseBody": {}}
+
+    def _faturar(self, corpo: dict) -> dict:
+        pedidos = corpo.get("notas", {}).get("nota", [])
+        notas = []
+        for pedido in pedidos if isinstance(pedidos, list) else [pedidos]:
+            nunota = str(pedido.get("$"))
+            nota = self.notas_por_pedido.get(nunota)
+            if nota is None:
+                nota = str(next(self._sequencia_nota))
+                self.notas_por_pedido[nunota] = nota
+                if nunota in self.pedidos:
+                    self.pedidos[nunota]["nota"] = nota
+            notas.append({"$": nota})
+        return {"responseBody": {"notas": {"nota": notas[0] if len(notas) == 1 else notas}}}
+
+    # -- DbExplorerSP.executeQuery ----------------------------------------------
+    def _invoice(self, nota: str) -> str:
+        pedido = next((dados for dados in self.pedidos.values() if dados["nota"] == nota), None)
+        valor = 0
+        for item in (pedido or {}).get("itens", []):
+            try:
+                valor += float(item.get("VLRTOT", {}).get("$") or 0) - float(item.get("VLRDESC", {}).get("$") or 0)
+            except ValueError:
+                pass
+        return json.dumps({
+            "type": "Output",
+            "invoiceNumber": nota,
+            "invoiceKey": nota.rjust(44, "0"),
+            "invoiceValue": int(round(valor * 100)),
+            "issuanceDate": datetime.now().strftime("%Y-%m-%d"),
+            "invoiceUrl": "",
+            "courier": "",
+            "trackingNumber": "",
+            "items": [],
+        })
+
+    def _execute_query(self, corpo: dict) -> dict:
+        sql = corpo.get("sql", "")
+        if "AD_NUNOTAORIG IN" in sql:
+            origens = set(_valores_lista(sql))
+            linhas = [[dados["origem"], nunota, dados["statusnota"], dados["nota"]]
+                      for nunota, dados in self.pedidos.items() if dados["origem"] in origens]
+        elif "FROM TGFVAR" in sql:
+            linhas = [[pedido, self.notas_por_pedido[pedido]] for pedido in _valores_lista(sql)
+                      if pedido in self.notas_por_pedido]
+        elif "CC_VTEX_INVOICE(CAB.NUNOTA)" in sql:
+            linhas = [[nota, self._invoice(nota)] for nota in _valores_lista(sql)]
+        else:
+            encontrado = re.search(r"CC_VTEX_INVOICE\((\d+)\)", sql)
+            linhas = [[self._invoice(encontrado.group(1))]] if encontrado else []
+        return {"responseBody": {"rows": linhas}}
+
+
+# ------------------------------------------------------------------------------
+# 🛒 VTEX OMS
+# ------------------------------------------------------------------------------
+def gerar_pedido_vtex(order_id: str, itens: int = 1) -> dict:
+    """Pedido VTEX determinístico a partir do ID (mesmo ID, mesmo pedido)."""
+    semente = zlib.crc32(order_id.encode("utf-8"))
+    gerador = random.Random(semente)
+    lista_itens, metadados, total = [], [], 0
+    for indice in range(itens):
+        ref_id = str(gerador.randint(1000, 9999))
+        quantidade = gerador.randint(1, 3)
+        preco = gerador.randint(1000, 50000)
+        # Parte dos itens com promoção, como nos pedidos reais
+        desconto = preco * gerador.choice([0, 0, 0, 5, 10]) // 100
+        preco_venda = preco - desconto
+        total += preco_venda * quantidade
+        lista_itens.append({
+            "id": str(indice + 1),
+            "refId": ref_id,
+            "quantity": quantidade,
+            "price": preco,
+            "listPrice": preco,
+            "sellingPrice": preco_venda,
+            "priceTags": [{"name": "discount@price", "value": -desconto * quantidade}] if desconto else [],
+            "priceDefinition": {"sellingPrices": [{"value": preco_venda, "quantity": quantidade}],
+                                "total": preco_venda * quantidade},
+        })
+        metadados.append({"Id": str(indice + 1), "RefId": ref_id})
+    # Frete derivado da semente, sem mudar a sequência do gerador (mesmos itens de antes)
+    frete = semente % 3 * 1500
+
+    return {
+        "orderId": order_id,
+        "sequence": str(semente % 900000 + 100000),
+        "value": total + frete,
+        "totals": [{"id": "Items", "value": total}, {"id": "Shipping", "value": frete}],
+        "clientProfileData": {
+            "firstName": "Cliente",
+            "lastName": f"Simulado {semente % 1000}",
+            "document": str(semente % 10 ** 11).rjust(11, "0"),
+            "phone": "+5591999990000",
+        },
+        "shippingData": {"address": {
+            "street": gerador.choice(["Rua Brasil", "Avenida Nazaré", "Travessa Curuzu", "Rua dos Mundurucus"]),
+            "number": str(gerador.randint(1, 2000)),
+            "complement": "",
+            "neighborhood": gerador.choice(["Nazaré", "Umarizal", "Batista Campos", "Marco"]),
+            "city": "Belém",
+            "postalCode": "66000-000",
+        }},
+        "items": lista_itens,
+        "itemMetadata": {"Items": metadados},
+        "paymentData": {"transactions": [{"payments": [{"paymentSystem": "125"}]}]},
+    }
+
+
+class SimuladorVtex(Simulador):
+    """Responde GET /api/oms/pvt/orders/{id} e POST .../invoice."""
+
+    def __init__(self, comportamento: Comportamento = None, itens_por_pedido: int = 1):
+        super().__init__(comportamento)
+        self.itens_por_pedido = itens_por_pedido
+        self.invoices = {}
+
+    def chave_requisicao(self, metodo, partes, corpo) -> str:
+        return "vtex.invoice" if partes.path.endswith("/invoice") else "vtex.pedido"
+
+    def atender(self, metodo, partes, corpo, headers):
+        encontrado = re.match(r"^/api/oms/pvt/orders/([^/]+)(/invoice)?$", partes.path)
+        if not encontrado:
+            return 404, {"error": "Not Found"}
+        order_id, invoice = encontrado.groups()
+        if invoice:
+            self.invoices[order_id] = corpo
+            return 200, {"date": datetime.now().isoformat(), "orderId": order_id,
+                         "receipt": f"{zlib.crc32(json.dumps(corpo).encode()):08x}"}
+        return 200, gerar_pedido_vtex(order_id, self.itens_por_pedido)
+
+
+# ------------------------------------------------------------------------------
+# 📨 Telegram
+# ------------------------------------------------------------------------------
+class SimuladorTelegram(Simulador):
+    def __init__(self, comportamento: Comportamento = None):
+        super().__init__(comportamento)
+        self.mensagens = []
+
+    def chave_requisicao(self, metodo, partes, corpo) -> str:
+        return "telegram.sendMessage"
+
+    def atender(self, metodo, partes, corpo, headers):
+        self.mensagens.append(corpo.get("text"))
+        return 200, {"ok": True, "result": {"message_id": len(self.mensagens)}}
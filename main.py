@@ -1,51 +1,401 @@
-from notifications.telegram import enviar_notificacao_telegram
-from sankhya_api.fetch import snk_fetch_invoice_data
-from sankhya_api.update import snk_confirmar_nota, snk_faturar_nota
-from utils import configure_logging
+import argparse
+import sys
+import time
+
+from notifications.dispatcher import INVOICE_ENVIADA, notificar, telegram_dispatcher
+from observability.logs import LazyJson, atualizar_contexto_log, configurar_logging
+from observability.metrics import gravar_arquivo_metricas, iniciar_exportador, medir_etapa, pedidos_processados
+from pipeline.approval import APROVADO, PENDENTE, POLITICAS, REJEITADO, AprovacaoConcedida, fila_aprovacao
+from pipeline.batch import carrega_produtos_lote, ler_order_ids, processa_lote, sincroniza_parceiros_lote, \
+    verifica_pedidos_existentes
+from pipeline.jobs import ENVIADO_VTEX, INVOICE_OBTIDA, NOTA_FATURADA, PARCEIRO_SINCRONIZADO, PEDIDO_CONFIRMADO, \
+    PEDIDO_CRIADO, etapa_concluida, job_store
+from sankhya_api.fetch import snk_fetch_invoice_data, snk_fetch_invoices_data, snk_fetch_pedidos_por_origem
+from sankhya_api.product_index import product_index
+from sankhya_api.refcache import reference_cache
+from sankhya_api.refindex import reference_index
+from sankhya_api.update import snk_confirmar_nota, snk_faturar_nota, snk_faturar_notas, snk_fetch_nota_faturada, \
+    snk_fetch_notas_faturadas
+from transport import replay
 from vtex_api.builders import *
+from vtex_api.cache import order_cache
+from vtex_api.fetch import vtex_fetch_order_data
 from sankhya_api.insert import *
 from vtex_api.invoice import vtex_send_invoice
 
-configure_logging()
+configurar_logging()
+
+# Jobs atualizados antes deste instante vêm de uma execução anterior
+INICIO_EXECUCAO = time.time()
 
 
-def processa_cadastro_parceiro_vtex_snk(order_id):
+def processa_cadastro_parceiro_vtex_snk(order_id, client: SankhyaClient):
     # Busca o dados do pedido no Vtex
     vtex_dados_cliente = vtex_customer_payload_data(order_id)
     # Cadastra ou atualiza parceiro no sankhya
-    snk_cadastra_atualiza_parceiro(vtex_dados_cliente, client)
+    return snk_cadastra_atualiza_parceiro(vtex_dados_cliente, client)
+
+
+def processa_pedido_fatura_nota(order_id, client: SankhyaClient, sincronizar_parceiro: bool = True,
+                                aprovacao=None):
+    try:
+        _processa_pedido_fatura_nota(order_id, client, sincronizar_parceiro, aprovacao)
+    except Exception as e:
+        job_store.registrar_erro(order_id, str(e))
+        raise
+    finally:
+        # O documento do pedido só é compartilhado durante o processamento dele
+        order_cache.invalidar(order_id)
+
+
+def registra_pedido_existente(order_id, pedido: dict) -> dict:
+    """Avança o pedido até a etapa em que ele já se encontra na Sankhya."""
+    if pedido["NOTA"]:
+        etapa = NOTA_FATURADA
+    elif pedido["STATUSNOTA"] == "L":
+        etapa = PEDIDO_CONFIRMADO
+    else:
+        etapa = PEDIDO_CRIADO
+    return job_store.avancar(order_id, etapa, nunota=pedido["NUNOTA"], nota=pedido["NOTA"])
+
+
+def retoma_pedidos_existentes(order_ids, client: SankhyaClient, workers: int):
+    """
+    Registra, com uma consulta por lote, os pedidos que já foram criados na Sankhya
+    e carrega de uma vez os produtos dos que ainda serão criados.
+    """
+    pendentes = [order_id for order_id in order_ids if not etapa_concluida(job_store.obter(order_id), PEDIDO_CRIADO)]
+    if pendentes:
+        for order_id, pedido in verifica_pedidos_existentes(pendentes, client, workers).items():
+            registra_pedido_existente(order_id, pedido)
+    a_criar = [order_id for order_id in pendentes if not etapa_concluida(job_store.obter(order_id), PEDIDO_CRIADO)]
+    if a_criar:
+        try:
+            carrega_produtos_lote(a_criar, client, workers)
+        except Exception as e:
+            # A carga é só antecipação: cada pedido ainda valida os próprios produtos
+            logging.error(f"🚨 Erro ao carregar produtos em lote: {e}")
 
 
-def processa_pedido_fatura_nota(order_id):
-    # 1) Atualiza ou cadatra parceiro
-    processa_cadastro_parceiro_vtex_snk(order_id)
+def cria_confirma_pedido(order_id, client: SankhyaClient, sincronizar_parceiro: bool = True):
+    job = job_store.obter(order_id)
+    if not etapa_concluida(job, PEDIDO_CRIADO):
+        # Webhooks reenviados e reprocessamentos não devem gerar um segundo pedido
+        origem = str(vtex_fetch_order_data(order_id)["sequence"])
+        existente = snk_fetch_pedidos_por_origem([origem], client).get(origem)
+        if existente:
+            job = registra_pedido_existente(order_id, existente)
+    if etapa_concluida(job, PEDIDO_CRIADO):
+        logging.info(f"⏩ Pedido {order_id} retomado na etapa '{job['etapa']}' (NUNOTA {job['nunota']})")
+
+    # 1) Atualiza ou cadatra parceiro (pulado quando já sincronizado em lote)
+    if sincronizar_parceiro and not etapa_concluida(job, PARCEIRO_SINCRONIZADO):
+        with medir_etapa(PARCEIRO_SINCRONIZADO):
+            sincronizado = processa_cadastro_parceiro_vtex_snk(order_id, client)
+        if not sincronizado:
+            # As etapas são lineares: seguir adiante marcaria o parceiro como sincronizado
+            raise RuntimeError(f"Falha ao sincronizar parceiro do pedido {order_id}")
+        job = job_store.avancar(order_id, PARCEIRO_SINCRONIZADO)
 
     # 2) Criar pedido no Sankhya
-    pedido = snk_cadastra_pedido_snk(order_id, client)
+    if not etapa_concluida(job, PEDIDO_CRIADO):
+        with medir_etapa(PEDIDO_CRIADO):
+            pedido = snk_cadastra_pedido_snk(order_id, client)
+        if isinstance(pedido, dict):
+            raise RuntimeError(f"Falha ao criar pedido: {pedido.get('error')}")
+        job = job_store.avancar(order_id, PEDIDO_CRIADO, nunota=pedido)
+    atualizar_contexto_log(nunota=job["nunota"])
 
     # 3) Confirma pedido no Sankhya
-    snk_confirmar_nota(pedido, client)
+    if not etapa_concluida(job, PEDIDO_CONFIRMADO):
+        with medir_etapa(PEDIDO_CONFIRMADO):
+            resp = snk_confirmar_nota(job["nunota"], client)
+        status, msg = resp.get("status"), resp.get("statusMessage", "")
+        if "error" in resp or not (status == "0" or (status == "1" and not msg)):
+            raise RuntimeError(f"Falha ao confirmar pedido {job['nunota']}: {resp.get('error') or msg}")
+        job = job_store.avancar(order_id, PEDIDO_CONFIRMADO)
+    return job["nunota"]
+
+
+def confirmado_em_execucao_anterior(job: dict) -> bool:
+    """Uma execução anterior pode ter faturado o pedido e parado antes de registrar a nota."""
+    return bool(job.get("atualizado_em")) and job["atualizado_em"] < INICIO_EXECUCAO
+
+
+def fatura_pedido(order_id, pedido, client: SankhyaClient):
+    job = job_store.obter(order_id)
+    if etapa_concluida(job, NOTA_FATURADA):
+        return job["nota"]
 
     # 4) Fatura pedido no Sankhya
-    nota = snk_faturar_nota(pedido, client)
+    if confirmado_em_execucao_anterior(job):
+        nota = snk_fetch_nota_faturada(pedido, client)
+        if nota:
+            logging.info(f"♻️ Pedido {pedido} já faturado na nota {nota}")
+            job_store.avancar(order_id, NOTA_FATURADA, nota=nota)
+            return nota
+
+    with medir_etapa(NOTA_FATURADA):
+        nota = snk_faturar_nota(pedido, client)
+    if isinstance(nota, dict):
+        raise RuntimeError(f"Falha ao faturar pedido {pedido}: {nota.get('error')}")
+    job_store.avancar(order_id, NOTA_FATURADA, nota=nota)
+    return nota
+
+
+def envia_invoice_vtex(order_id, nota, client: SankhyaClient, aprovacao=None):
+    job = job_store.obter(order_id)
+    if job["nunota"]:
+        atualizar_contexto_log(nunota=job["nunota"])
+    if etapa_concluida(job, ENVIADO_VTEX):
+        logging.info(f"⏩ Invoice da nota {nota} já enviada para o pedido {order_id}")
+        return
 
     # 5) Captura o JSON da invoice
-    xml = snk_fetch_invoice_data(nota, client)
-
-    # 6) Pergunta ao usuário se quer enviar para a VTEX
-    resposta = input(f"Deseja enviar a invoice da nota {nota} para o pedido {order_id}? (s/n): ").strip().lower()
-    if resposta and resposta[0] == "s":
-        logging.info("👍 Usuário confirmou envio da invoice para VTEX.")
-        resultado = vtex_send_invoice(order_id, xml)
-        enviar_notificacao_telegram(f"XML da nota {nota} foi enviado para o pedido {order_id} no VTEX")
-        logging.debug("Resposta VTEX:", resultado)
+    if etapa_concluida(job, INVOICE_OBTIDA):
+        xml = job["invoice"]
+    else:
+        with medir_etapa(INVOICE_OBTIDA):
+            xml = snk_fetch_invoice_data(nota, client)
+        if "error" in xml:
+            raise RuntimeError(f"Falha ao obter invoice da nota {nota}: {xml['error']}")
+        job_store.avancar(order_id, INVOICE_OBTIDA, invoice=xml)
+
+    # 6) Aprovação do envio para a VTEX, conforme a política escolhida
+    aprovacao = aprovacao or POLITICAS["fila"]()
+    pedido_vtex = (vtex_fetch_order_data(order_id) or {}) if aprovacao.usa_pedido_vtex else {}
+    decisao = aprovacao.avaliar(order_id, nota, xml, pedido_vtex)
+    if decisao == APROVADO:
+        logging.info("👍 Envio da invoice para VTEX aprovado.")
+        with medir_etapa(ENVIADO_VTEX):
+            resultado = vtex_send_invoice(order_id, xml)
+        if "error" in resultado:
+            raise RuntimeError(f"Falha ao enviar invoice para a VTEX: {resultado['error']}")
+        job_store.avancar(order_id, ENVIADO_VTEX)
+        notificar(f"nota {nota} → pedido {order_id}", categoria=INVOICE_ENVIADA)
+        logging.debug("Resposta VTEX:\n%s", LazyJson(resultado))
+    elif decisao == PENDENTE:
+        logging.info(f"⏸️ Invoice da nota {nota} aguardando aprovação na fila.")
     else:
         logging.info("👎 Envio da invoice para VTEX cancelado pelo usuário.")
 
 
+def _processa_pedido_fatura_nota(order_id, client: SankhyaClient, sincronizar_parceiro: bool = True,
+                                 aprovacao=None):
+    # 1-3) Parceiro, criação e confirmação do pedido
+    pedido = cria_confirma_pedido(order_id, client, sincronizar_parceiro)
+
+    # 4) Fatura pedido no Sankhya
+    nota = fatura_pedido(order_id, pedido, client)
+
+    # 5-6) Invoice e envio para a VTEX
+    envia_invoice_vtex(order_id, nota, client, aprovacao)
+
+
+def processa_pedidos_agrupados(order_ids, client: SankhyaClient, workers: int, aprovacao=None) -> dict:
+    """
+    Processa o lote em etapas, agrupando as chamadas à Sankhya que aceitam vários
+    registros: parceiros em lote, pedidos em paralelo, faturamento e invoices em
+    lote e, por fim, o envio para a VTEX. Etapas já concluídas em execuções
+    anteriores são puladas.
+    """
+    try:
+        # 0) Pedidos já criados na Sankhya, com uma consulta de AD_NUNOTAORIG por lote
+        retoma_pedidos_existentes(order_ids, client, workers)
+
+        # 1) Parceiros de todos os pedidos ainda sem pedido criado, de uma vez
+        jobs = {order_id: job_store.obter(order_id) for order_id in order_ids}
+        sem_parceiro = [order_id for order_id, job in jobs.items()
+                        if not etapa_concluida(job, PARCEIRO_SINCRONIZADO)]
+        codparcs = {}
+        if sem_parceiro:
+            with medir_etapa(f"{PARCEIRO_SINCRONIZADO}_lote"):
+                codparcs = sincroniza_parceiros_lote(sem_parceiro, client, workers)
+        for order_id, codparc in codparcs.items():
+            if codparc:
+                job_store.avancar(order_id, PARCEIRO_SINCRONIZADO, codparc=codparc)
+
+        # 2-3) Cria e confirma os pedidos em paralelo
+        pedidos = {}
+
+        def _etapa_pedido(order_id):
+            sincronizado = bool(codparcs.get(order_id)) or etapa_concluida(jobs[order_id], PARCEIRO_SINCRONIZADO)
+            try:
+                pedidos[order_id] = cria_confirma_pedido(order_id, client, not sincronizado)
+            except Exception as e:
+                job_store.registrar_erro(order_id, str(e))
+                raise
+
+        resumo_pedidos = processa_lote(order_ids, _etapa_pedido, workers)
+        pedidos = {order_id: pedidos[order_id] for order_id in order_ids if order_id in pedidos}
+
+        # 4) Fatura em lote os pedidos confirmados que ainda não têm nota
+        faturados = {}
+        a_faturar = {}
+        retomados = {}
+        for order_id, pedido in pedidos.items():
+            job = job_store.obter(order_id)
+            if etapa_concluida(job, NOTA_FATURADA):
+                faturados[order_id] = job["nota"]
+            elif confirmado_em_execucao_anterior(job):
+                retomados[order_id] = pedido
+            else:
+                a_faturar[order_id] = pedido
+        if retomados:
+            # Confirmados em execução anterior: só fatura os que ainda não têm nota em TGFVAR
+            try:
+                ja_faturados = snk_fetch_notas_faturadas(list(retomados.values()), client)
+            except Exception as e:
+                logging.error(f"🚨 Erro ao verificar notas já faturadas: {e}")
+                ja_faturados = None
+            for order_id, pedido in retomados.items():
+                nota = (ja_faturados or {}).get(str(int(pedido)))
+                if nota:
+                    logging.info(f"♻️ Pedido {pedido} já faturado na nota {nota}")
+                    job_store.avancar(order_id, NOTA_FATURADA, nota=nota)
+                    faturados[order_id] = nota
+                elif ja_faturados is not None:
+                    a_faturar[order_id] = pedido
+                else:
+                    # Sem a confirmação de TGFVAR, faturar poderia gerar uma segunda nota
+                    job_store.registrar_erro(order_id, f"Não foi possível verificar o faturamento do pedido {pedido}")
+        notas = {}
+        if a_faturar:
+            with medir_etapa(f"{NOTA_FATURADA}_lote"):
+                notas = snk_faturar_notas(list(a_faturar.values()), client)
+        for order_id, pedido in a_faturar.items():
+            nota = notas.get(str(pedido))
+            if nota:
+                job_store.avancar(order_id, NOTA_FATURADA, nota=nota)
+                faturados[order_id] = nota
+            else:
+                job_store.registrar_erro(order_id, f"Pedido {pedido} não faturado")
+        falhas = dict(resumo_pedidos["falhas"])
+        falhas.update({order_id: f"Pedido {pedido} não faturado" for order_id, pedido in pedidos.items()
+                       if order_id not in faturados})
+
+        # 5) Busca as invoices de todas as notas de uma vez; o envio lê do job
+        sem_invoice = {order_id: nota for order_id, nota in faturados.items()
+                       if not etapa_concluida(job_store.obter(order_id), INVOICE_OBTIDA)}
+        if sem_invoice:
+            with medir_etapa(f"{INVOICE_OBTIDA}_lote"):
+                invoices = snk_fetch_invoices_data(list(sem_invoice.values()), client)
+            for order_id, nota in sem_invoice.items():
+                invoice = invoices[str(nota)]
+                # Com erro, o envio consulta a nota de novo individualmente
+                if "error" not in invoice:
+                    job_store.avancar(order_id, INVOICE_OBTIDA, invoice=invoice)
+
+        # 6) Envio para a VTEX
+        resumo_envio = processa_lote(list(faturados),
+                                     lambda order_id: envia_invoice_vtex(order_id, faturados[order_id], client,
+                                                                         aprovacao),
+                                     workers)
+        for order_id, erro in resumo_envio["falhas"].items():
+            job_store.registrar_erro(order_id, erro)
+        falhas.update(resumo_envio["falhas"])
+        return {"pedidos": len(order_ids), "falhas": falhas}
+    finally:
+        for order_id in order_ids:
+            order_cache.invalidar(order_id)
+
+
+def envia_aprovados(order_ids, client: SankhyaClient, workers: int) -> dict:
+    """Marca os pedidos como aprovados pelo operador e envia suas invoices para a VTEX."""
+    aprovados = fila_aprovacao.decidir(order_ids, APROVADO)
+    logging.info(f"👍 {len(aprovados)} pedidos aprovados pelo operador")
+
+    def _envia(order_id):
+        job = job_store.obter(order_id)
+        try:
+            envia_invoice_vtex(order_id, job["nota"], client, AprovacaoConcedida())
+        finally:
+            order_cache.invalidar(order_id)
+
+    return processa_lote(aprovados, _envia, workers)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Orquestrador de pedidos VTEX ↔ Sankhya")
+    parser.add_argument("order_ids", nargs="*",
+                        help="IDs de pedidos VTEX ('-' lê os IDs do stdin)")
+    parser.add_argument("-a", "--arquivo",
+                        help="Arquivo com um ID de pedido VTEX por linha")
+    parser.add_argument("-w", "--workers", type=int, default=4,
+                        help="Quantidade de pedidos processados em paralelo (padrão: 4)")
+    parser.add_argument("--limpar-cache-referencias", action="store_true",
+                        help="Descarta os códigos de Endereco/Bairro/Cidade guardados localmente")
+    parser.add_argument("--pre-carregar-referencias", action="store_true",
+                        help="Carrega todas as cidades e bairros em memória antes de processar os pedidos")
+    parser.add_argument("--agrupar", action="store_true",
+                        help="Agrupa as chamadas à Sankhya do lote em etapas com requisições de múltiplos registros")
+    parser.add_argument("--aprovacao", choices=sorted(POLITICAS),
+                        help="Política de aprovação do envio à VTEX (padrão: interativa para um único pedido "
+                             "em terminal, fila nos demais casos)")
+    parser.add_argument("--listar-aprovacoes", action="store_true",
+                        help="Lista as invoices aguardando aprovação")
+    parser.add_argument("--aprovar", action="store_true",
+                        help="Aprova e envia à VTEX os pedidos informados (ou todos os pendentes)")
+    parser.add_argument("--rejeitar", action="store_true",
+                        help="Rejeita os pedidos informados (ou todos os pendentes)")
+    return parser.parse_args(argv)
+
+
 if __name__ == '__main__':
-    # Criar instância autenticada do cliente
+    args = parse_args()
+    if args.limpar_cache_referencias:
+        reference_cache.invalidar()
+
+    order_ids = ler_order_ids(args.order_ids, args.arquivo)
+
+    if args.listar_aprovacoes:
+        for pendente in fila_aprovacao.pendentes():
+            print(f"{pendente['order_id']}\tnota {pendente['nota']}\t{pendente['motivo'] or ''}")
+        sys.exit(0)
+    if args.rejeitar:
+        rejeitados = fila_aprovacao.decidir(order_ids or [p["order_id"] for p in fila_aprovacao.pendentes()],
+                                            REJEITADO)
+        logging.info(f"👎 {len(rejeitados)} pedidos rejeitados")
+        sys.exit(0)
+    if args.aprovar:
+        resumo = envia_aprovados(order_ids or [p["order_id"] for p in fila_aprovacao.pendentes()],
+                                 SankhyaClient(), args.workers)
+        sys.exit(1 if resumo["falhas"] else 0)
+
+    if not order_ids and args.limpar_cache_referencias:
+        sys.exit(0)
+    if not order_ids:
+        logging.error("❌ Nenhum ID de pedido VTEX informado.")
+        sys.exit(2)
+
+    # Workers nunca esperam pelo terminal: sem escolha explícita, só um pedido interativo pergunta
+    politica = args.aprovacao or ("interativa" if len(order_ids) == 1 and sys.stdin.isatty() else "fila")
+    aprovacao = POLITICAS[politica]()
+
+    iniciar_exportador()
+
+    # Criar instância autenticada do cliente, compartilhada entre os workers
     client = SankhyaClient()
+    if args.pre_carregar_referencias:
+        reference_index.carregar(client)
+        reference_index.iniciar_atualizacao_periodica(client)
+
     # Cria pedido, confirma, fatura, envia para o vtex
-    vtex_order_id = '1533550503135-01'
-    processa_pedido_fatura_nota(vtex_order_id)
+    if args.agrupar:
+        resumo = processa_pedidos_agrupados(order_ids, client, args.workers, aprovacao)
+    else:
+        retoma_pedidos_existentes(order_ids, client, args.workers)
+        resumo = processa_lote(order_ids,
+                               lambda order_id: processa_pedido_fatura_nota(order_id, client, aprovacao=aprovacao),
+                               args.workers)
+    logging.info(f"🗃️ Cache de referências: {reference_cache.estatisticas()}")
+    logging.info(f"📦 Índice de produtos: {product_index.estatisticas()}")
+    logging.info(f"💾 Pedidos por etapa: {job_store.resumo()}")
+    pedidos_processados.incrementar(len(order_ids) - len(resumo["falhas"]), resultado="sucesso")
+    pedidos_processados.incrementar(len(resumo["falhas"]), resultado="falha")
+    gravar_arquivo_metricas()
+    telegram_dispatcher.fechar()
+    if replay.cassete is not None:
+        logging.info(f"📼 Cassete: {replay.cassete.resumo()}")
+        replay.desativar_cassete()
+    sys.exit(1 if resumo["falhas"] else 0)
@@ -0,0 +1,164 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+import requests
+
+from notifications.telegram import telegram_send_message
+
+# Janela em que itens da mesma categoria são agrupados numa única mensagem
+TELEGRAM_JANELA_DIGEST = float(os.getenv("TELEGRAM_JANELA_DIGEST", "60"))
+# Quantidade máxima de itens listados em um digest antes de resumir com "e mais N"
+TELEGRAM_DIGEST_MAX_ITENS = int(os.getenv("TELEGRAM_DIGEST_MAX_ITENS", "50"))
+
+NOTA_FATURADA = "nota_faturada"
+FALHA_FATURAMENTO = "falha_faturamento"
+INVOICE_ENVIADA = "invoice_enviada"
+
+TITULOS_DIGEST = {
+    NOTA_FATURADA: "✅ {total} notas faturadas",
+    FALHA_FATURAMENTO: "❌ {total} falhas de faturamento",
+    INVOICE_ENVIADA: "📤 {total} invoices enviadas para a VTEX",
+}
+
+# Formato usado quando a janela fecha com um único item
+MENSAGENS_UNICAS = {
+    NOTA_FATURADA: "✅ Nota {item} faturada com sucesso.",
+    FALHA_FATURAMENTO: "❌ Falha ao faturar {item}",
+    INVOICE_ENVIADA: "📤 Invoice enviada para a VTEX: {item}",
+}
+
+_FIM = object()
+
+
+def _descrever_janela(segundos):
+    if segundos == 60:
+        return "no último minuto"
+    if segundos % 60 == 0:
+        return f"nos últimos {int(segundos // 60)} minutos"
+    return f"nos últimos {segundos:g} segundos"
+
+
+# ------------------------------------------------------------------------------
+# 📨 Dispatcher assíncrono de notificações
+# ------------------------------------------------------------------------------
+class TelegramDispatcher:
+    """Envia notificações em uma thread própria, sem bloquear o pipeline.
+
+    Mensagens sem categoria são enviadas assim que o limite de taxa permite.
+    Mensagens com categoria são acumuladas e enviadas como um único digest
+    ao fim da janela (ex.: "✅ 42 notas faturadas no último minuto").
+    """
+
+    def __init__(self, janela=TELEGRAM_JANELA_DIGEST, enviar=telegram_send_message):
+        self.janela = janela
+        self._enviar = enviar
+        self._fila = queue.Queue()
+        self._digests = {}
+        self._prazo_digest = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _iniciar(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._executar, name="telegram-dispatcher", daemon=True)
+            self._thread.start()
+
+    def notificar(self, mensagem, categoria=None):
+        """Enfileira a mensagem e retorna imediatamente."""
+        self._iniciar()
+        self._fila.put((categoria, str(mensagem)))
+
+    def fechar(self, timeout=30):
+        """Envia tudo o que estiver pendente (inclusive digests abertos) e encerra a thread."""
+        with self._lock:
+            thread = self._thread
+        if not thread or not thread.is_alive():
+            return
+        self._fila.put(_FIM)
+        thread.join(timeout)
+        if thread.is_alive():
+            logging.warning("⚠️ Dispatcher do Telegram não terminou de enviar as notificações pendentes.")
+
+    def _executar(self):
+        while True:
+            espera = None
+            if self._prazo_digest is not None:
+                espera = max(0.0, self._prazo_digest - time.monotonic())
+            try:
+                item = self._fila.get(timeout=espera)
+            except queue.Empty:
+                self._enviar_digests()
+                continue
+
+            if item is _FIM:
+                self._drenar()
+                self._enviar_digests()
+                return
+
+            categoria, mensagem = item
+            if categoria is None:
+                self._enviar_mensagem(mensagem)
+            else:
+                self._digests.setdefault(categoria, []).append(mensagem)
+                if self._prazo_digest is None:
+                    self._prazo_digest = time.monotonic() + self.janela
+
+            if self._prazo_digest is not None and time.monotonic() >= self._prazo_digest:
+                self._enviar_digests()
+
+    def _drenar(self):
+        while True:
+            try:
+                item = self._fila.get_nowait()
+            except queue.Empty:
+                return
+            if item is _FIM:
+                continue
+            categoria, mensagem = item
+            if categoria is None:
+                self._enviar_mensagem(mensagem)
+            else:
+                self._digests.setdefault(categoria, []).append(mensagem)
+
+    def _enviar_digests(self):
+        digests, self._digests, self._prazo_digest = self._digests, {}, None
+        for categoria, itens in digests.items():
+            self._enviar_mensagem(self._formatar_digest(categoria, itens))
+
+    def _formatar_digest(self, categoria, itens):
+        if len(itens) == 1:
+            return MENSAGENS_UNICAS.get(categoria, f"{categoria}: {{item}}").format(item=itens[0])
+        titulo = TITULOS_DIGEST.get(categoria, f"{categoria}: {{total}} itens").format(total=len(itens))
+        listados = itens[:TELEGRAM_DIGEST_MAX_ITENS]
+        texto = f"{titulo} {_descrever_janela(self.janela)}: {', '.join(listados)}"
+        if len(itens) > len(listados):
+            texto += f" … e mais {len(itens) - len(listados)}"
+        return texto
+
+    def _enviar_mensagem(self, mensagem):
+        # Limite de taxa (RATE_LIMIT_TELEGRAM) e 429 com Retry-After ficam na camada de transporte
+        try:
+            response = self._enviar(mensagem)
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Ocorreu um erro ao enviar notificação: {e}")
+            return False
+
+        if response.status_code == 200:
+            logging.info("Notificação enviada com sucesso!")
+            return True
+        logging.warning(f"Falha ao enviar notificação: {response.status_code}")
+        return False
+
+
+telegram_dispatcher = TelegramDispatcher()
+atexit.register(telegram_dispatcher.fechar)
+
+
+def notificar(mensagem, categoria=None):
+    telegram_dispatcher.notificar(mensagem, categoria)
@@ -4,20 +4,19 @@ import requests
 import os
 from dotenv import load_dotenv
 
+from transport.session import http_post
+
 # Carregar variáveis de ambiente do arquivo .env
 load_dotenv()
 
-logging.basicConfig(
-    level=logging.INFO,  # ou DEBUG se quiser mais detalhes
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org").rstrip("/")
 
 
-# Função para enviar notificação para o Telegram
-def enviar_notificacao_telegram(mensagem):
+def telegram_send_message(mensagem):
+    """Envia a mensagem e devolve a resposta crua (o dispatcher confere o status)."""
     token = os.getenv('BOTTOKEN')  # Seu Token do Bot
     chat_id = os.getenv('CHATID')  # O chat_id do destinatário
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
+    url = f"{TELEGRAM_API_URL}/bot{token}/sendMessage"
 
     # Dados a serem enviados
     payload = {
@@ -25,15 +24,16 @@ def enviar_notificacao_telegram(mensagem):
         'text': mensagem,
         "parse_mode": "HTML"
     }
+    return http_post(url, data=payload)
 
+# Função para enviar notificação para o Telegram (síncrona)
+def enviar_notificacao_telegram(mensagem):
     # Enviar a requisição para o Telegram
     try:
-        response = requests.post(url, data=payload)
+        response = telegram_send_message(mensagem)
         if response.status_code == 200:
             logging.info("Notificação enviada com sucesso!")
         else:
             logging.warning(f"Falha ao enviar notificação: {response.status_code}")
     except requests.exceptions.RequestException as e:
         logging.error(f"Ocorreu um erro: {e}")
-
-
@@ -0,0 +1,132 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from contextlib import contextmanager
+
+# texto = formato legível (padrão); json = um objeto JSON por linha
+LOG_FORMATO = os.getenv("LOG_FORMATO", "texto")
+
+CAMPOS_CONTEXTO = ("order_id", "nunota")
+
+_contexto: contextvars.ContextVar[dict] = contextvars.ContextVar("contexto_log", default={})
+_listener = None
+
+
+# ------------------------------------------------------------------------------
+# 💤 Dump de payloads renderizado só quando o registro é emitido
+# ------------------------------------------------------------------------------
+class LazyJson:
+    """
+    Embrulha um objeto para logging: o json.dumps só roda se o nível estiver
+    habilitado. Uso: logging.debug("📤 Payload:\\n%s", LazyJson(payload)).
+    """
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self):
+        return json.dumps(self.obj, indent=2, ensure_ascii=False, default=str)
+
+
+# ------------------------------------------------------------------------------
+# 🏷️ Contexto do pedido (order_id, nunota) anexado a cada registro
+# ------------------------------------------------------------------------------
+@contextmanager
+def contexto_log(**campos):
+    token = _contexto.set({**_contexto.get(), **campos})
+    try:
+        yield
+    finally:
+        _contexto.reset(token)
+
+
+def atualizar_contexto_log(**campos):
+    """Acrescenta campos ao contexto aberto por contexto_log (ex.: a NUNOTA recém-criada)."""
+    _contexto.set({**_contexto.get(), **campos})
+
+
+class ContextoFilter(logging.Filter):
+    def filter(self, record):
+        contexto = _contexto.get()
+        for campo in CAMPOS_CONTEXTO:
+            if not hasattr(record, campo):
+                setattr(record, campo, contexto.get(campo))
+        partes = [f"{campo}={getattr(record, campo)}" for campo in CAMPOS_CONTEXTO if getattr(record, campo)]
+        record.contexto = f"[{' '.join(partes)}] " if partes else ""
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        registro = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        for campo in CAMPOS_CONTEXTO:
+            valor = getattr(record, campo, None)
+            if valor is not None:
+                registro[campo] = valor
+        if record.exc_info:
+            registro["exc"] = self.formatException(record.exc_info)
+        return json.dumps(registro, ensure_ascii=False, default=str)
+
+
+# ------------------------------------------------------------------------------
+# 🧵 Configuração: I/O de log fora das threads de trabalho
+# ------------------------------------------------------------------------------
+def _formatter(debug: bool) -> logging.Formatter:
+    if LOG_FORMATO == "json":
+        return JsonFormatter()
+    if debug:
+        return logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(filename)s:%(lineno)d - %(contexto)s%(message)s')
+    return logging.Formatter('%(asctime)s - %(levelname)s - %(contexto)s%(message)s')
+
+
+def configurar_logging():
+    """
+    Configura o logger raiz uma única vez: os workers apenas enfileiram os
+    registros (QueueHandler) e uma thread do QueueListener escreve no stderr.
+    APP_ENV=1 usa nível INFO; qualquer outro valor usa DEBUG.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    env = os.getenv('APP_ENV')
+    debug = env != '1'
+
+    saida = logging.StreamHandler(sys.stderr)
+    saida.setFormatter(_formatter(debug))
+
+    fila = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(fila)
+    handler.addFilter(ContextoFilter())
+
+    raiz = logging.getLogger()
+    for antigo in list(raiz.handlers):
+        raiz.removeHandler(antigo)
+    raiz.addHandler(handler)
+    raiz.setLevel(logging.DEBUG if debug else logging.INFO)
+
+    _listener = logging.handlers.QueueListener(fila, saida, respect_handler_level=True)
+    _listener.start()
+    atexit.register(encerrar_logging)
+    logging.debug(f"Valor da variável de ambiente APP_ENV: '{env}'")
+
+
+def encerrar_logging():
+    """Escreve os registros pendentes e para a thread do listener."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
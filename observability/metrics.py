@@ -0,0 +1,235 @@
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+# Porta do endpoint /metrics (0 = desligado)
+METRICS_PORTA = int(os.getenv("METRICS_PORTA", "0"))
+# Arquivo para o textfile collector do node_exporter, gravado ao fim da execução
+METRICS_ARQUIVO = os.getenv("METRICS_ARQUIVO", "")
+
+BUCKETS_LATENCIA = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BUCKETS_CHAMADAS = (1, 2, 3, 5, 8, 10, 15, 20, 30, 50, 100)
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatar_rotulos(nomes, valores, extra=None) -> str:
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+# ------------------------------------------------------------------------------
+# 📈 Métricas (contadores e histogramas) no formato texto do Prometheus
+# ------------------------------------------------------------------------------
+class Contador:
+    tipo = "counter"
+
+    def __init__(self, nome: str, ajuda: str, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, valor: float = 1, **rotulos):
+        chave = tuple(str(rotulos.get(nome, "")) for nome in self.rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def exportar(self):
+        with self._lock:
+            valores = dict(self._valores)
+        for chave, valor in sorted(valores.items()):
+            yield f"{self.nome}{_formatar_rotulos(self.rotulos, chave)} {valor:g}"
+
+
+class Histograma:
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, rotulos=(), buckets=BUCKETS_LATENCIA):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, **rotulos):
+        chave = tuple(str(rotulos.get(nome, "")) for nome in self.rotulos)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = {"buckets": [0] * len(self.buckets), "soma": 0.0, "total": 0}
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie["buckets"][i] += 1
+            serie["soma"] += valor
+            serie["total"] += 1
+
+    def series(self) -> dict:
+        """Cópia das séries: {valores dos rótulos: {"buckets", "soma", "total"}}."""
+        with self._lock:
+            return {chave: {**serie, "buckets": list(serie["buckets"])} for chave, serie in self._series.items()}
+
+    def exportar(self):
+        for chave, serie in sorted(self.series().items()):
+            for limite, quantidade in zip(self.buckets, serie["buckets"]):
+                rotulos = _formatar_rotulos(self.rotulos, chave, f'le="{limite:g}"')
+                yield f"{self.nome}_bucket{rotulos} {quantidade}"
+            rotulos = _formatar_rotulos(self.rotulos, chave, 'le="+Inf"')
+            yield f"{self.nome}_bucket{rotulos} {serie['total']}"
+            yield f"{self.nome}_sum{_formatar_rotulos(self.rotulos, chave)} {serie['soma']:.6f}"
+            yield f"{self.nome}_count{_formatar_rotulos(self.rotulos, chave)} {serie['total']}"
+
+
+class Registro:
+    def __init__(self):
+        self._metricas = []
+
+    def registrar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def exportar(self) -> str:
+        linhas = []
+        for metrica in self._metricas:
+            linhas.append(f"# HELP {metrica.nome} {metrica.ajuda}")
+            linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+            linhas.extend(metrica.exportar())
+        return "\n".join(linhas) + "\n"
+
+
+registro = Registro()
+
+sankhya_latencia = registro.registrar(Histograma(
+    "orq_sankhya_request_seconds", "Latência das chamadas à Sankhya por serviceName", ("service",)))
+sankhya_erros = registro.registrar(Contador(
+    "orq_sankhya_request_errors_total", "Chamadas à Sankhya que terminaram em erro", ("service",)))
+vtex_latencia = registro.registrar(Histograma(
+    "orq_vtex_request_seconds", "Latência das chamadas à VTEX por operação", ("operacao",)))
+vtex_erros = registro.registrar(Contador(
+    "orq_vtex_request_errors_total", "Chamadas à VTEX que terminaram em erro", ("operacao",)))
+http_retries = registro.registrar(Contador(
+    "orq_http_retries_total", "Novas tentativas feitas pela camada de resiliência", ("upstream", "motivo")))
+http_circuito_aberto = registro.registrar(Contador(
+    "orq_http_circuit_open_total", "Requisições recusadas com o circuito do upstream aberto", ("upstream",)))
+etapa_latencia = registro.registrar(Histograma(
+    "orq_stage_seconds", "Duração de cada etapa do pipeline", ("etapa",)))
+etapa_erros = registro.registrar(Contador(
+    "orq_stage_errors_total", "Etapas do pipeline que lançaram erro", ("etapa",)))
+pedidos_processados = registro.registrar(Contador(
+    "orq_orders_total", "Pedidos processados por resultado", ("resultado",)))
+chamadas_por_pedido = registro.registrar(Histograma(
+    "orq_http_calls_per_order", "Requisições HTTP feitas por pedido", buckets=BUCKETS_CHAMADAS))
+
+
+# ------------------------------------------------------------------------------
+# ⏱️ Instrumentação
+# ------------------------------------------------------------------------------
+@contextmanager
+def medir(histograma: Histograma, erros: Optional[Contador] = None, **rotulos):
+    """Observa a duração do bloco e conta como erro se ele lançar exceção."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        if erros is not None:
+            erros.incrementar(**rotulos)
+        raise
+    finally:
+        histograma.observar(time.perf_counter() - inicio, **rotulos)
+
+
+def medir_etapa(etapa: str):
+    return medir(etapa_latencia, etapa_erros, etapa=etapa)
+
+
+def instrumentar_vtex(operacao: str):
+    """
+    Decorator para as chamadas à VTEX, que sinalizam falha pelo retorno
+    (None ou dict com 'error') em vez de exceção.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with medir(vtex_latencia, vtex_erros, operacao=operacao):
+                resultado = func(*args, **kwargs)
+            if resultado is None or (isinstance(resultado, dict) and "error" in resultado):
+                vtex_erros.incrementar(operacao=operacao)
+            return resultado
+        return wrapper
+    return decorator
+
+
+_chamadas_pedido: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("chamadas_pedido", default=None)
+
+
+@contextmanager
+def contar_chamadas_pedido():
+    """Conta as requisições HTTP feitas dentro do bloco e observa o total ao sair."""
+    contador = [0]
+    token = _chamadas_pedido.set(contador)
+    try:
+        yield
+    finally:
+        _chamadas_pedido.reset(token)
+        chamadas_por_pedido.observar(contador[0])
+
+
+def registrar_chamada_http():
+    contador = _chamadas_pedido.get()
+    if contador is not None:
+        contador[0] += 1
+
+
+# ------------------------------------------------------------------------------
+# 📤 Exportação: endpoint /metrics e arquivo do textfile collector
+# ------------------------------------------------------------------------------
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        corpo = registro.exportar().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, format, *args):
+        logging.debug(f"📈 /metrics: {format % args}")
+
+
+_servidor = None
+
+
+def iniciar_exportador(porta: int = METRICS_PORTA):
+    """Sobe o endpoint /metrics em uma thread daemon, se a porta estiver configurada."""
+    global _servidor
+    if not porta or _servidor is not None:
+        return
+    _servidor = ThreadingHTTPServer(("", porta), _MetricsHandler)
+    threading.Thread(target=_servidor.serve_forever, name="metrics", daemon=True).start()
+    logging.info(f"📈 Métricas disponíveis em http://localhost:{porta}/metrics")
+
+
+def gravar_arquivo_metricas(caminho: str = METRICS_ARQUIVO):
+    """Grava as métricas de forma atômica para o textfile collector do node_exporter."""
+    if not caminho:
+        return
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        f.write(registro.exportar())
+    os.replace(temporario, caminho)
+    logging.info(f"📈 Métricas gravadas em {caminho}")
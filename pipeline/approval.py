@@ -0,0 +1,187 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+from transport.prazo import prazo_suspenso
+from utils import caminho_dados
+
+APROVADO = "aprovado"
+PENDENTE = "pendente"
+REJEITADO = "rejeitado"
+
+# Regras da aprovação automática
+APROVACAO_VALOR_MAXIMO = float(os.getenv("APROVACAO_VALOR_MAXIMO", "5000"))  # em reais
+APROVACAO_PAGAMENTOS = os.getenv("APROVACAO_PAGAMENTOS", "125,2,3,4,9")  # paymentSystem VTEX aceitos
+
+
+# ------------------------------------------------------------------------------
+# 🗳️ Fila persistente de aprovações
+# ------------------------------------------------------------------------------
+
+class FilaAprovacao:
+    """
+    Fila em SQLite das invoices aguardando aprovação de um operador. Os pedidos
+    entram como pendentes e são aprovados ou rejeitados em lote pela linha de comando.
+    """
+
+    def __init__(self, caminho: Optional[str] = None):
+        self._caminho = caminho
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _conexao(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self._caminho or caminho_dados("pedidos.sqlite3"),
+                                         check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS aprovacoes (
+                    order_id TEXT PRIMARY KEY,
+                    nota TEXT,
+                    motivo TEXT,
+                    status TEXT NOT NULL,
+                    atualizado_em REAL NOT NULL
+                )
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def enfileirar(self, order_id: str, nota: str, motivo: str = ""):
+        with self._lock:
+            conn = self._conexao()
+            conn.execute(
+                "INSERT OR REPLACE INTO aprovacoes (order_id, nota, motivo, status, atualizado_em) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (order_id, str(nota), motivo, PENDENTE, time.time())
+            )
+            conn.commit()
+        logging.info(f"🗳️ Invoice da nota {nota} do pedido {order_id} aguardando aprovação"
+                     + (f" ({motivo})" if motivo else ""))
+
+    def status(self, order_id: str) -> Optional[str]:
+        with self._lock:
+            linha = self._conexao().execute(
+                "SELECT status FROM aprovacoes WHERE order_id = ?", (order_id,)
+            ).fetchone()
+        return linha[0] if linha else None
+
+    def pendentes(self) -> List[dict]:
+        with self._lock:
+            linhas = self._conexao().execute(
+                "SELECT order_id, nota, motivo, atualizado_em FROM aprovacoes WHERE status = ? ORDER BY atualizado_em",
+                (PENDENTE,)
+            ).fetchall()
+        return [{"order_id": o, "nota": n, "motivo": m, "atualizado_em": t} for o, n, m, t in linhas]
+
+    def decidir(self, order_ids: List[str], status: str) -> List[str]:
+        """Aprova ou rejeita pedidos pendentes; retorna os que foram alterados."""
+        alterados = []
+        with self._lock:
+            conn = self._conexao()
+            for order_id in order_ids:
+                cursor = conn.execute(
+                    "UPDATE aprovacoes SET status = ?, atualizado_em = ? WHERE order_id = ? AND status = ?",
+                    (status, time.time(), order_id, PENDENTE)
+                )
+                if cursor.rowcount:
+                    alterados.append(order_id)
+            conn.commit()
+        return alterados
+
+
+fila_aprovacao = FilaAprovacao()
+
+
+# ------------------------------------------------------------------------------
+# ✅ Políticas de aprovação do envio da invoice à VTEX
+# ------------------------------------------------------------------------------
+
+class AprovacaoFila:
+    """Nenhum envio é feito sem operador: toda invoice vai para a fila."""
+
+    # Políticas que não olham o pedido VTEX dispensam a consulta dele antes de avaliar
+    usa_pedido_vtex = False
+
+    def __init__(self, fila: FilaAprovacao = None):
+        self.fila = fila or fila_aprovacao
+
+    def avaliar(self, order_id: str, nota: str, invoice: dict, pedido_vtex: dict) -> str:
+        # Decisões já tomadas pelo operador valem para os reprocessamentos
+        status = self.fila.status(order_id)
+        if status is not None:
+            return status
+        self.fila.enfileirar(order_id, nota)
+        return PENDENTE
+
+
+class AprovacaoAutomatica(AprovacaoFila):
+    """
+    Aprova sozinha as invoices que cumprem as regras (valor máximo, meio de pagamento
+    e NFe autorizada, com chave de acesso); as demais vão para a fila do operador.
+    """
+
+    usa_pedido_vtex = True
+
+    def __init__(self, valor_maximo: float = APROVACAO_VALOR_MAXIMO, pagamentos: str = APROVACAO_PAGAMENTOS,
+                 fila: FilaAprovacao = None):
+        super().__init__(fila)
+        self.valor_maximo = valor_maximo
+        self.pagamentos = {p.strip() for p in pagamentos.split(",") if p.strip()}
+
+    def _motivo_bloqueio(self, invoice: dict, pedido_vtex: dict) -> Optional[str]:
+        if "error" in invoice:
+            return f"invoice com erro: {invoice['error']}"
+        if not invoice.get("invoiceNumber") or not invoice.get("invoiceKey"):
+            return "NFe sem número ou chave de acesso"
+        valor = (pedido_vtex.get("value") or 0) / 100
+        if valor > self.valor_maximo:
+            return f"valor R$ {valor:.2f} acima do limite de R$ {self.valor_maximo:.2f}"
+        try:
+            pagamento = str(pedido_vtex["paymentData"]["transactions"][0]["payments"][0]["paymentSystem"])
+        except (KeyError, IndexError, TypeError):
+            pagamento = None
+        if pagamento not in self.pagamentos:
+            return f"meio de pagamento {pagamento} não aprovado automaticamente"
+        return None
+
+    def avaliar(self, order_id: str, nota: str, invoice: dict, pedido_vtex: dict) -> str:
+        status = self.fila.status(order_id)
+        if status is not None:
+            return status
+        motivo = self._motivo_bloqueio(invoice, pedido_vtex)
+        if motivo is None:
+            logging.info(f"🤖 Invoice da nota {nota} aprovada automaticamente para o pedido {order_id}")
+            return APROVADO
+        self.fila.enfileirar(order_id, nota, motivo)
+        return PENDENTE
+
+
+class AprovacaoInterativa:
+    """Pergunta ao usuário no terminal, um pedido por vez. Não usar com workers sem terminal."""
+
+    usa_pedido_vtex = False
+    _lock = threading.Lock()
+
+    def avaliar(self, order_id: str, nota: str, invoice: dict, pedido_vtex: dict) -> str:
+        # O operador pode demorar: a espera não consome o prazo do pedido
+        with prazo_suspenso(), self._lock:
+            resposta = input(f"Deseja enviar a invoice da nota {nota} para o pedido {order_id}? (s/n): ").strip().lower()
+        return APROVADO if resposta and resposta[0] == "s" else REJEITADO
+
+
+class AprovacaoConcedida:
+    """Usada no envio de pedidos já aprovados pelo operador."""
+
+    usa_pedido_vtex = False
+
+    def avaliar(self, order_id: str, nota: str, invoice: dict, pedido_vtex: dict) -> str:
+        return APROVADO
+
+
+POLITICAS = {
+    "interativa": AprovacaoInterativa,
+    "automatica": AprovacaoAutomatica,
+    "fila": AprovacaoFila,
+}
@@ -0,0 +1,201 @@
+import logging
+import math
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional
+
+from observability.logs import contexto_log
+from observability.metrics import contar_chamadas_pedido
+from sankhya_api.auth import SankhyaClient
+from sankhya_api.fetch import snk_fetch_codigos_parceiros, snk_fetch_pedidos_por_origem, snk_resolver_endereco
+from sankhya_api.product_index import product_index
+from sankhya_api.update import snk_salvar_parceiros_lote
+from transport.prazo import prazo_pedido
+from vtex_api.builders import vtex_customer_payload_data, vtex_order_items_data
+from vtex_api.fetch import vtex_fetch_order_data
+
+
+# ------------------------------------------------------------------------------
+# 📥 Leitura dos IDs de pedidos VTEX
+# ------------------------------------------------------------------------------
+
+def ler_order_ids(ids: Iterable[str], arquivo: Optional[str] = None) -> List[str]:
+    """
+    Junta os IDs de pedidos vindos dos argumentos, de um arquivo e/ou do stdin.
+    Um argumento '-' indica leitura do stdin. Linhas vazias, comentários (#)
+    e IDs repetidos são descartados, preservando a ordem de chegada.
+    """
+    brutos = []
+    for order_id in ids:
+        if order_id == "-":
+            brutos.extend(sys.stdin.read().split())
+        else:
+            brutos.append(order_id)
+
+    if arquivo:
+        with open(arquivo, encoding="utf-8") as f:
+            for linha in f:
+                linha = linha.split("#", 1)[0].strip()
+                if linha:
+                    brutos.append(linha)
+
+    vistos = set()
+    order_ids = []
+    for order_id in brutos:
+        order_id = order_id.strip()
+        if order_id and order_id not in vistos:
+            vistos.add(order_id)
+            order_ids.append(order_id)
+    return order_ids
+
+
+# ------------------------------------------------------------------------------
+# ⚙️ Execução em lote com pool de workers
+# ------------------------------------------------------------------------------
+
+def _percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = max(0, math.ceil(p / 100 * len(ordenados)) - 1)
+    return ordenados[indice]
+
+
+def processa_lote(order_ids: List[str], processar: Callable[[str], object], workers: int = 4) -> dict:
+    """
+    Executa `processar(order_id)` para cada pedido usando um pool limitado de threads.
+    Retorna um resumo com sucessos, falhas, pedidos/s e latências p50/p95 por pedido.
+    Cada pedido tem o prazo PEDIDO_PRAZO_SEGUNDOS para suas chamadas HTTP.
+    """
+    workers = max(1, min(workers, len(order_ids) or 1))
+    duracoes = []
+    falhas = {}
+
+    def _executa(order_id: str) -> float:
+        inicio = time.perf_counter()
+        with prazo_pedido(), contexto_log(order_id=order_id), contar_chamadas_pedido():
+            processar(order_id)
+        return time.perf_counter() - inicio
+
+    logging.info(f"🚚 Processando {len(order_ids)} pedidos com {workers} workers")
+    inicio_lote = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pedido") as executor:
+        futuros = {executor.submit(_executa, order_id): order_id for order_id in order_ids}
+        for futuro in as_completed(futuros):
+            order_id = futuros[futuro]
+            try:
+                duracoes.append(futuro.result())
+            except Exception as e:
+                logging.error(f"🚨 Falha ao processar pedido {order_id}: {e}", exc_info=True)
+                falhas[order_id] = str(e)
+
+    total = time.perf_counter() - inicio_lote
+    resumo = {
+        "pedidos": len(order_ids),
+        "sucessos": len(duracoes),
+        "falhas": falhas,
+        "duracao_total": total,
+        "pedidos_por_segundo": len(order_ids) / total if total > 0 else 0.0,
+        "p50": _percentil(duracoes, 50),
+        "p95": _percentil(duracoes, 95),
+    }
+    logging.info(
+        f"📊 Lote concluído: {resumo['sucessos']}/{resumo['pedidos']} pedidos em {total:.1f}s | "
+        f"{resumo['pedidos_por_segundo']:.2f} pedidos/s | "
+        f"p50={resumo['p50']:.2f}s p95={resumo['p95']:.2f}s"
+    )
+    for order_id, erro in falhas.items():
+        logging.warning(f"⚠️ Pedido {order_id} falhou: {erro}")
+    return resumo
+
+
+# ------------------------------------------------------------------------------
+# 👥 Etapa em lote: sincronização de parceiros
+# ------------------------------------------------------------------------------
+
+def sincroniza_parceiros_lote(order_ids: List[str], client: SankhyaClient, workers: int = 4) -> Dict[str, Optional[str]]:
+    """
+    Prepara os dados de cliente de todos os pedidos em paralelo, resolve os
+    CODPARC de todos os CPFs em uma consulta em lote e grava os parceiros com
+    DatasetSP.save de múltiplos registros.
+    Retorna {order_id: codparc}, com None para os pedidos que falharam.
+    """
+    def _prepara(order_id: str) -> dict:
+        vtex_dict = vtex_customer_payload_data(order_id)
+        return {
+            "order_id": order_id,
+            "vtex_dict": vtex_dict,
+            "endereco": snk_resolver_endereco(vtex_dict, client),
+        }
+
+    parceiros = []
+    falhas = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="parceiro") as executor:
+        futuros = {executor.submit(_prepara, order_id): order_id for order_id in order_ids}
+        for futuro in as_completed(futuros):
+            try:
+                parceiros.append(futuro.result())
+            except Exception as e:
+                logging.error(f"🚨 Erro ao preparar parceiro do pedido {futuros[futuro]}: {e}")
+                falhas[futuros[futuro]] = None
+
+    # Ordem da entrada, não a de conclusão: as consultas em lote ficam iguais entre execuções
+    posicao = {order_id: indice for indice, order_id in enumerate(order_ids)}
+    parceiros.sort(key=lambda parceiro: posicao[parceiro["order_id"]])
+    codparcs = snk_fetch_codigos_parceiros([parceiro["vtex_dict"].get("CGC_CPF") for parceiro in parceiros], client)
+    for parceiro in parceiros:
+        parceiro["codparc"] = codparcs.get(parceiro["vtex_dict"].get("CGC_CPF"))
+
+    return {**falhas, **snk_salvar_parceiros_lote(parceiros, client)}
+
+
+# ------------------------------------------------------------------------------
+# ♻️ Etapa em lote: pedidos já existentes na Sankhya
+# ------------------------------------------------------------------------------
+
+def verifica_pedidos_existentes(order_ids: List[str], client: SankhyaClient, workers: int = 4) -> Dict[str, dict]:
+    """
+    Busca os pedidos VTEX em paralelo e verifica, com uma consulta por lote de
+    AD_NUNOTAORIG, quais já foram criados na Sankhya.
+    Retorna {order_id: pedido} apenas para os que já existem.
+    """
+    origens = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="origem") as executor:
+        futuros = {executor.submit(vtex_fetch_order_data, order_id): order_id for order_id in order_ids}
+        for futuro in as_completed(futuros):
+            try:
+                origens[futuros[futuro]] = str(futuro.result()["sequence"])
+            except Exception as e:
+                logging.error(f"🚨 Erro ao buscar pedido VTEX {futuros[futuro]}: {e}")
+
+    existentes = snk_fetch_pedidos_por_origem([origens[order_id] for order_id in order_ids if order_id in origens],
+                                              client)
+    return {order_id: existentes[origem] for order_id, origem in origens.items() if origem in existentes}
+
+
+# ------------------------------------------------------------------------------
+# 📦 Etapa em lote: produtos dos itens
+# ------------------------------------------------------------------------------
+
+def carrega_produtos_lote(order_ids: List[str], client: SankhyaClient, workers: int = 4) -> Dict[str, Optional[dict]]:
+    """
+    Resolve de uma vez os RefIds de todos os itens dos pedidos, para que a
+    validação de cada pedido leia apenas o índice local de produtos.
+    Retorna {RefId: produto ou None}.
+    """
+    ref_ids = []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="produto") as executor:
+        futuros = [(order_id, executor.submit(vtex_fetch_order_data, order_id)) for order_id in order_ids]
+        for order_id, futuro in futuros:
+            try:
+                ref_ids.extend(item["CODPROD"] for item in vtex_order_items_data(futuro.result()))
+            except Exception as e:
+                logging.error(f"🚨 Erro ao ler itens do pedido VTEX {order_id}: {e}")
+
+    produtos = product_index.resolver(ref_ids, client)
+    sem_produto = [ref_id for ref_id, produto in produtos.items() if produto is None]
+    if sem_produto:
+        logging.warning(f"📦 {len(sem_produto)} RefIds sem produto na Sankhya: {', '.join(sem_produto)}")
+    return produtos
@@ -0,0 +1,113 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from utils import caminho_dados
+
+# Etapas do processamento de um pedido, na ordem em que são concluídas
+NOVO = "novo"
+PARCEIRO_SINCRONIZADO = "parceiro_sincronizado"
+PEDIDO_CRIADO = "pedido_criado"
+PEDIDO_CONFIRMADO = "pedido_confirmado"
+NOTA_FATURADA = "nota_faturada"
+INVOICE_OBTIDA = "invoice_obtida"
+ENVIADO_VTEX = "enviado_vtex"
+
+ETAPAS = [NOVO, PARCEIRO_SINCRONIZADO, PEDIDO_CRIADO, PEDIDO_CONFIRMADO, NOTA_FATURADA, INVOICE_OBTIDA,
+          ENVIADO_VTEX]
+
+_CAMPOS = ("codparc", "nunota", "nota", "invoice")
+
+
+def etapa_concluida(job: dict, etapa: str) -> bool:
+    return ETAPAS.index(job["etapa"]) >= ETAPAS.index(etapa)
+
+
+# ------------------------------------------------------------------------------
+# 💾 Registro durável das etapas de cada pedido
+# ------------------------------------------------------------------------------
+
+class JobStore:
+    """
+    Guarda em SQLite a etapa concluída de cada pedido VTEX e as saídas de cada
+    etapa (CODPARC, NUNOTA, nota, invoice). Um pedido reprocessado retoma a
+    partir da primeira etapa ainda não concluída.
+    """
+
+    def __init__(self, caminho: Optional[str] = None):
+        self._caminho = caminho
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _conexao(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self._caminho or caminho_dados("pedidos.sqlite3"),
+                                         check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS pedidos (
+                    order_id TEXT PRIMARY KEY,
+                    etapa TEXT NOT NULL,
+                    codparc TEXT,
+                    nunota TEXT,
+                    nota TEXT,
+                    invoice TEXT,
+                    erro TEXT,
+                    atualizado_em REAL NOT NULL
+                )
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def obter(self, order_id: str) -> dict:
+        with self._lock:
+            linha = self._conexao().execute("SELECT * FROM pedidos WHERE order_id = ?", (order_id,)).fetchone()
+        if linha is None:
+            return {"order_id": order_id, "etapa": NOVO, "codparc": None, "nunota": None, "nota": None,
+                    "invoice": None, "erro": None}
+        job = dict(linha)
+        job["invoice"] = json.loads(job["invoice"]) if job["invoice"] else None
+        return job
+
+    def avancar(self, order_id: str, etapa: str, **saidas) -> dict:
+        """Registra a etapa concluída e as saídas informadas, limpando o último erro."""
+        job = self.obter(order_id)
+        if ETAPAS.index(etapa) > ETAPAS.index(job["etapa"]):
+            job["etapa"] = etapa
+        job.update({campo: valor for campo, valor in saidas.items() if campo in _CAMPOS})
+        invoice = json.dumps(job["invoice"], ensure_ascii=False) if job["invoice"] is not None else None
+        with self._lock:
+            conn = self._conexao()
+            conn.execute(
+                "INSERT OR REPLACE INTO pedidos (order_id, etapa, codparc, nunota, nota, invoice, erro, atualizado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?, NULL, ?)",
+                (order_id, job["etapa"], job["codparc"], job["nunota"], job["nota"], invoice, time.time())
+            )
+            conn.commit()
+        logging.debug(f"💾 Pedido {order_id} → {job['etapa']}")
+        return job
+
+    def registrar_erro(self, order_id: str, erro: str):
+        job = self.obter(order_id)
+        with self._lock:
+            conn = self._conexao()
+            conn.execute(
+                "INSERT OR REPLACE INTO pedidos (order_id, etapa, codparc, nunota, nota, invoice, erro, atualizado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (order_id, job["etapa"], job["codparc"], job["nunota"], job["nota"],
+                 json.dumps(job["invoice"], ensure_ascii=False) if job["invoice"] is not None else None,
+                 erro, time.time())
+            )
+            conn.commit()
+
+    def resumo(self) -> dict:
+        """Quantidade de pedidos em cada etapa."""
+        with self._lock:
+            linhas = self._conexao().execute("SELECT etapa, COUNT(*) FROM pedidos GROUP BY etapa").fetchall()
+        return {etapa: quantidade for etapa, quantidade in linhas}
+
+
+job_store = JobStore()
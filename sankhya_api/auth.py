@@ -1,11 +1,14 @@
 import logging
 import os
-import time
 from typing import Optional, Any
 
 import requests
 from dotenv import load_dotenv
-from requests import RequestException, Timeout
+from requests import RequestException
+
+from observability.metrics import medir, sankhya_erros, sankhya_latencia
+from sankhya_api.token_cache import TokenManager
+from transport.session import HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, http_post, http_request
 
 load_dotenv()
 
@@ -13,50 +16,85 @@ TOKEN = os.getenv("SANKHYA_TOKEN")
 APPKEY = os.getenv("SANKHYA_APPKEY")
 USERNAME = os.getenv("SANKHYA_USERNAME")
 PASSWORD = os.getenv("SANKHYA_PASSWORD")
+# Permite apontar para outro gateway (ex.: o simulador de benchmark/)
+SANKHYA_BASE_URL = os.getenv("SANKHYA_BASE_URL", "https://api.sankhya.com.br").rstrip("/")
 
 # ------------------------------------------------------------------------------
 # 🔧 Configurações iniciais
 # ------------------------------------------------------------------------------
 
 
-BASE_URL = "https://api.sankhya.com.br/gateway/v1/mge/service.sbr"
+BASE_URL = f"{SANKHYA_BASE_URL}/gateway/v1/mge/service.sbr"
 HEADERS_BASE = {
     "Content-Type": "application/json"
 }
 
+# Serviços que criam registros: só são repetidos se a requisição não chegou à Sankhya
+SERVICOS_NAO_IDEMPOTENTES = ("CACSP.incluirNota", "SelecaoDocumentoSP.faturar", "DatasetSP.save")
+
 
 # ------------------------------------------------------------------------------
-# 🔐 Cliente Sankhya com autenticação única
+# 🔐 Cliente Sankhya com token compartilhado
 # ------------------------------------------------------------------------------
 
+def _sankhya_login():
+    login_url = f"{SANKHYA_BASE_URL}/login"
+    headers = {
+        "token": TOKEN,
+        "appkey": APPKEY,
+        "username": USERNAME,
+        "password": PASSWORD
+    }
+    try:
+        logging.info("🔐 Autenticando na API da Sankhya...")
+        resp = http_post(login_url, headers=headers)
+        resp.raise_for_status()
+        dados = resp.json()
+        token = dados.get("bearerToken")
+        if not token:
+            raise ValueError("Bearer token não encontrado na resposta.")
+        return token, dados.get("expires_in")
+    except requests.RequestException as e:
+        logging.error(f"❌ Erro ao autenticar: {e}")
+        raise
+
+
+# Token compartilhado por todos os clientes do processo (e, via arquivo, entre processos)
+token_manager = TokenManager(_sankhya_login)
+
+
 class SankhyaClient:
-    def __init__(self):
-        self.token = None
-        self.headers = None
-        self.timeout = 60
-        self.base_mge = "https://api.sankhya.com.br/gateway/v1/mge/service.sbr"
-        self.base_mgecom = "https://api.sankhya.com.br/gateway/v1/mgecom/service.sbr"
+    def __init__(self, tokens: TokenManager = None):
+        self.tokens = tokens or token_manager
+        self.timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        self.base_mge = f"{SANKHYA_BASE_URL}/gateway/v1/mge/service.sbr"
+        self.base_mgecom = f"{SANKHYA_BASE_URL}/gateway/v1/mgecom/service.sbr"
         self._autenticar()
 
     def _autenticar(self):
-        login_url = "https://api.sankhya.com.br/login"
-        headers = {
-            "token": TOKEN,
-            "appkey": APPKEY,
-            "username": USERNAME,
-            "password": PASSWORD
-        }
-        try:
-            logging.info("🔐 Autenticando na API da Sankhya...")
-            resp = requests.post(login_url, headers=headers)
-            resp.raise_for_status()
-            self.token = resp.json().get("bearerToken")
-            if not self.token:
-                raise ValueError("Bearer token não encontrado na resposta.")
-            self.headers = {**HEADERS_BASE, "Authorization": f"Bearer {self.token}"}
-        except requests.RequestException as e:
-            logging.error(f"❌ Erro ao autenticar: {e}")
-            raise
+        self.tokens.obter()
+        self.tokens.iniciar_renovacao_automatica()
+
+    @property
+    def token(self) -> str:
+        return self.tokens.obter()
+
+    @property
+    def headers(self) -> dict:
+        return {**HEADERS_BASE, "Authorization": f"Bearer {self.token}"}
+
+    def _request(self, method: str, url: str, payload: dict, timeout) -> requests.Response:
+        """Envia a requisição e, se o token for recusado (401), renova e tenta uma única vez mais."""
+        idempotente = payload.get("serviceName") not in SERVICOS_NAO_IDEMPOTENTES
+        token = self.token
+        headers = {**HEADERS_BASE, "Authorization": f"Bearer {token}"}
+        resp = http_request(method, url, idempotente=idempotente, headers=headers, json=payload, timeout=timeout)
+        if resp.status_code == 401:
+            logging.warning("🔑 Token da Sankhya recusado (401), renovando autenticação...")
+            self.tokens.invalidar(token)
+            resp = http_request(method, url, idempotente=idempotente, headers=self.headers, json=payload,
+                                timeout=timeout)
+        return resp
 
     def _build_url(self, service_name: str) -> str:
         if service_name.startswith(("CACSP.", "SelecaoDocumentoSP.")):
@@ -70,34 +108,17 @@ class SankhyaClient:
             raise ValueError("Payload precisa conter 'serviceName'")
 
         url = self._build_url(service_name)
-        logging.debug(f"🔗 GET Sankhya → {url} (timeout={self.timeout}s)")
-
-        max_retries = 5
-        for attempt in range(1, max_retries + 1):
-            try:
-                resp = requests.get(
-                    url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=self.timeout
-                )
+        logging.debug(f"🔗 GET Sankhya → {url} (timeout={HTTP_READ_TIMEOUT}s)")
+
+        # Retry, backoff e circuit breaker ficam em transport.resilience
+        try:
+            with medir(sankhya_latencia, sankhya_erros, service=service_name):
+                resp = self._request("GET", url, payload, self.timeout)
                 resp.raise_for_status()
                 return resp.json()
-
-            except Timeout:
-                logging.warning(f"⏱️ Timeout na tentativa {attempt}/{max_retries} para {service_name}")
-                if attempt == max_retries:
-                    logging.error(f"❌ Timeout após {max_retries} tentativas.")
-                    raise
-                # backoff exponencial e continua o loop
-                time.sleep(2 ** (attempt - 1))
-
-            except RequestException as e:
-                logging.error(f"🚨 Erro na requisição: {e}")
-                raise
-
-        # Se, por algum motivo, sair do loop sem retornar nem lançar, devolve None
-        return None
+        except RequestException as e:
+            logging.error(f"🚨 Erro na requisição {service_name}: {e}")
+            raise
 
     def post(self, payload: dict) -> dict:
         service_name = payload.get("serviceName")
@@ -105,6 +126,7 @@ class SankhyaClient:
             raise ValueError("Payload precisa conter 'serviceName'")
         url = self._build_url(service_name)
         logging.debug(f"🔗 POST Sankhya → {url}")
-        resp = requests.post(url, headers=self.headers, json=payload, timeout=60)
-        resp.raise_for_status()
-        return resp.json()
+        with medir(sankhya_latencia, sankhya_erros, service=service_name):
+            resp = self._request("POST", url, payload, self.timeout)
+            resp.raise_for_status()
+            return resp.json()
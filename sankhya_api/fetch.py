@@ -1,56 +1,22 @@
 import json
 import logging
-from typing import Optional
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import requests
 
+from observability.logs import LazyJson
 from sankhya_api.auth import SankhyaClient
+from sankhya_api.order_index import order_index
+from sankhya_api.partner_index import normalizar_cpf, partner_index
+from sankhya_api.refcache import reference_cache
+from sankhya_api.refindex import reference_index, snk_load_all_records
 
-from sankhya_api.utils import extrair_prefixo_sufixo_logradouro, buscar_abreviacoes
-
-
-ABREVIACOES = {
-    "R": "Rua",
-    "R.": "Rua",
-    "RUA": "Rua",
-    "Av": "Avenida",
-    "Av.": "Avenida",
-    "A": "Avenida",
-    "Trav": "Travessa",
-    "Trav.": "Travessa",
-    "TV.": "Travessa",
-    "TV": "Travessa",
-    "TVs": "Travessa",
-    "TVS": "Travessa",
-    "Al": "Alameda",
-    "ALA": "Alameda",
-    "ALAMEDA": "Alameda",
-    "Al.": "Alameda",
-    "Pç": "Praça",
-    "Pç.": "Praça",
-    "Rod": "Rodovia",
-    "Rod.": "Rodovia",
-    "Est": "Estrada",
-    "Est.": "Estrada",
-    "Jd": "Jardim",
-    "Jd.": "Jardim",
-    "Vl": "Vila",
-    "Vl.": "Vila",
-    "Baln": "Balneário",
-    "Baln.": "Balneário",
-    "Conj": "Conjunto",
-    "Conj.": "Conjunto",
-    "Res": "Residencial",
-    "Res.": "Residencial",
-    "Cond": "Condomínio",
-    "Cond.": "Condomínio",
-    "Pq": "Parque",
-    "Pq.": "Parque",
-    "St": "Setor",
-    "St.": "Setor",
-    "Lot": "Loteamento",
-    "Lot.": "Loteamento"
-}
+from sankhya_api.normalize import abreviacoes_de
+from sankhya_api.utils import extrair_prefixo_sufixo_logradouro, lista_sql
+
+# Quantidade máxima de valores por critério IN (...) nas consultas em lote
+TAMANHO_LOTE_CONSULTA = int(os.getenv("SNK_TAMANHO_LOTE_CONSULTA", "50"))
 
 
 # ------------------------------------------------------------------------------
@@ -58,6 +24,11 @@ ABREVIACOES = {
 # ------------------------------------------------------------------------------
 
 def snk_fetch_codigo_parceiro(cpf: str, client: SankhyaClient) -> Optional[str]:
+    codigo = partner_index.get(cpf)
+    if codigo:
+        logging.info(f"✅ Parceiro {cpf} encontrado no índice local. Código: {codigo}")
+        return codigo
+
     payload = {
         "serviceName": "CRUDServiceProvider.loadRecords",
         "requestBody": {
@@ -87,10 +58,11 @@ def snk_fetch_codigo_parceiro(cpf: str, client: SankhyaClient) -> Optional[str]:
         logging.info(f"🔎 Consultando parceiro com CPF: {cpf}")
         data = client.get(payload)
         entity = data.get("responseBody", {}).get("entities", {}).get("entity")
-        logging.debug(json.dumps(entity, indent=2, ensure_ascii=False))
+        logging.debug("%s", LazyJson(entity))
         if entity and "f1" in entity:
             codigo = entity["f1"]["$"]
             logging.info(f"✅ Parceiro encontrado. Código: {codigo}")
+            partner_index.set(cpf, codigo)
             return codigo
         else:
             logging.warning("⚠️ Parceiro não encontrado.")
@@ -101,13 +73,58 @@ def snk_fetch_codigo_parceiro(cpf: str, client: SankhyaClient) -> Optional[str]:
         return None
 
 
+def snk_fetch_codigos_parceiros(cpfs: List[str], client: SankhyaClient,
+                                tamanho_lote: int = TAMANHO_LOTE_CONSULTA,
+                                levantar_erros: bool = False) -> Dict[str, Optional[str]]:
+    """
+    Consulta o CODPARC de vários CPFs com loadRecords de critério CGC_CPF IN (...),
+    em lotes de até `tamanho_lote` CPFs. CPFs já presentes no índice local não são
+    consultados. Retorna {cpf: codparc}, com None para os não encontrados.
+    Com `levantar_erros`, falhas de consulta são relançadas em vez de virarem None.
+    """
+    resultado = {}
+    pendentes = {}
+    for cpf in cpfs:
+        if not cpf or cpf in resultado:
+            continue
+        resultado[cpf] = partner_index.get(cpf)
+        if not resultado[cpf]:
+            pendentes.setdefault(normalizar_cpf(cpf), []).append(cpf)
+    pendentes.pop("", None)
+
+    chaves = list(pendentes)
+    logging.info(f"🔎 Consultando {len(chaves)} parceiros em lote ({len(cpfs) - len(chaves)} já conhecidos)")
+    for inicio in range(0, len(chaves), tamanho_lote):
+        lote = chaves[inicio:inicio + tamanho_lote]
+        criterio = f"CGC_CPF IN ({lista_sql(lote)})"
+        try:
+            for codparc, cgc_cpf in snk_load_all_records("Parceiro", "CODPARC,CGC_CPF", client, criterio):
+                for cpf in pendentes.get(normalizar_cpf(cgc_cpf), []):
+                    # Mantém o primeiro parceiro encontrado, como na consulta individual
+                    if codparc and not resultado.get(cpf):
+                        resultado[cpf] = codparc
+                        partner_index.set(cpf, codparc)
+        except requests.RequestException as e:
+            logging.error(f"❌ Erro ao buscar parceiros em lote: {e}")
+            if levantar_erros:
+                raise
+
+    encontrados = sum(1 for codparc in resultado.values() if codparc)
+    logging.info(f"✅ {encontrados}/{len(resultado)} parceiros encontrados")
+    return resultado
+
+
 # ------------------------------------------------------------------------------
 # 🔎 Consulta de códigos do endereço com dados vindos do vtex
 # ------------------------------------------------------------------------------
 
 def snk_fetch_codend(endereco: str, client: SankhyaClient) -> Optional[str]:
+    codend = reference_cache.get("Endereco", endereco)
+    if codend:
+        return codend
+
     endereco_prefixo, endereco_sufixo = extrair_prefixo_sufixo_logradouro(endereco)
-    abreviacoes_possiveis = buscar_abreviacoes(endereco_prefixo, ABREVIACOES)
+    abreviacoes_possiveis = abreviacoes_de(endereco_prefixo)
 
     payload = {
         "serviceName": "CRUDServiceProvider.loadRecords",
@@ -134,7 +151,7 @@ def snk_fetch_codend(endereco: str, client: SankhyaClient) -> Optional[str]:
         logging.info(f"🔎 Consultando endereço: {endereco}")
         data = client.get(payload)
         entity = data.get("responseBody", {}).get("entities", {}).get("entity")
-        logging.debug(json.dumps(entity, indent=2, ensure_ascii=False))
+        logging.debug("%s", LazyJson(entity))
 
         if not entity or not isinstance(entity, list):
             logging.warning("⚠️ Nenhum resultado retornado da API.")
@@ -147,6 +164,7 @@ def snk_fetch_codend(endereco: str, client: SankhyaClient) -> Optional[str]:
 
         if codend:
             logging.info(f"✅ Codend encontrado: {codend}")
+            reference_cache.set("Endereco", endereco, codend)
         else:
             logging.warning("⚠️ Nenhum codend compatível com o prefixo foi encontrado.")
 
@@ -157,7 +175,16 @@ def snk_fetch_codend(endereco: str, client: SankhyaClient) -> Optional[str]:
         return None
 
 
-def snk_fetch_codbai(bairro: str, client: SankhyaClient) -> Optional[str]:
+def snk_fetch_codbai(bairro: str, client: SankhyaClient, codcid: Optional[str] = None) -> Optional[str]:
+    if reference_index.carregado:
+        codbai = reference_index.codbai(bairro, codcid)
+        if codbai:
+            return codbai
+
+    codbai = reference_cache.get("Bairro", bairro)
+    if codbai:
+        return codbai
+
     payload = {
         "serviceName": "CRUDServiceProvider.loadRecords",
         "requestBody": {
@@ -183,7 +210,7 @@ def snk_fetch_codbai(bairro: str, client: SankhyaClient) -> Optional[str]:
         logging.info(f"🔎 Consultando bairro: {bairro}")
         data = client.get(payload)
         entity = data.get("responseBody", {}).get("entities", {}).get("entity")
-        logging.debug(json.dumps(entity, indent=2, ensure_ascii=False))
+        logging.debug("%s", LazyJson(entity))
 
         if not entity:
             logging.warning("⚠️ Nenhum resultado retornado da API.")
@@ -200,6 +227,7 @@ def snk_fetch_codbai(bairro: str, client: SankhyaClient) -> Optional[str]:
 
         if codbai:
             logging.info(f"✅ CodBai encontrado: {codbai}")
+            reference_cache.set("Bairro", bairro, codbai)
         else:
             logging.warning("⚠️ Nenhum CodBai foi encontrado.")
 
@@ -211,6 +239,15 @@ def snk_fetch_codbai(bairro: str, client: SankhyaClient) -> Optional[str]:
 
 
 def snk_fetch_codcid(cidade: str, client: SankhyaClient) -> Optional[str]:
+    if reference_index.carregado:
+        codcid = reference_index.codcid(cidade)
+        if codcid:
+            return codcid
+
+    codcid = reference_cache.get("Cidade", cidade)
+    if codcid:
+        return codcid
+
     payload = {
         "serviceName": "CRUDServiceProvider.loadRecords",
         "requestBody": {
@@ -236,7 +273,7 @@ def snk_fetch_codcid(cidade: str, client: SankhyaClient) -> Optional[str]:
         logging.info(f"🔎 Consultando cidade: {cidade}")
         data = client.get(payload)
         entity = data.get("responseBody", {}).get("entities", {}).get("entity")
-        logging.debug(json.dumps(entity, indent=2, ensure_ascii=False))
+        logging.debug("%s", LazyJson(entity))
 
         if not entity:
             logging.warning("⚠️ Nenhum resultado retornado da API.")
@@ -253,6 +290,7 @@ def snk_fetch_codcid(cidade: str, client: SankhyaClient) -> Optional[str]:
 
         if codcid:
             logging.info(f"✅ CodCid encontrado: {codcid}")
+            reference_cache.set("Cidade", cidade, codcid)
         else:
             logging.warning("⚠️ Nenhum CodCid foi encontrado.")
 
@@ -263,6 +301,66 @@ def snk_fetch_codcid(cidade: str, client: SankhyaClient) -> Optional[str]:
         return None
 
 
+# ------------------------------------------------------------------------------
+# 🏠 Resolução única do endereço do parceiro
+# ------------------------------------------------------------------------------
+
+def snk_resolver_endereco(vtex_dict: dict, client: SankhyaClient) -> dict:
+    """
+    Resolve CODEND, CODBAI e CODCID do endereço VTEX uma única vez, para ser
+    reaproveitado pelos saves de dados básicos e de entrega do mesmo parceiro.
+    """
+    codcid = snk_fetch_codcid(vtex_dict['CIDADE'], client)
+    return {
+        "CODEND": snk_fetch_codend(vtex_dict['ENDERECO'], client),
+        "CODBAI": snk_fetch_codbai(vtex_dict['BAIRRO'], client, codcid),
+        "CODCID": codcid,
+    }
+
+
+# ------------------------------------------------------------------------------
+# 🗄️ Consultas SQL via DbExplorerSP
+# ------------------------------------------------------------------------------
+
+def snk_execute_query(sql: str, client: SankhyaClient) -> list:
+    """Executa uma consulta com DbExplorerSP.executeQuery e retorna as linhas (lista de listas)."""
+    payload = {
+        "serviceName": "DbExplorerSP.executeQuery",
+        "requestBody": {
+            "sql": sql
+        }
+    }
+    logging.info(f"🔎 Executando SQL no Sankhya: {sql}")
+    resp = client.get(payload)
+    return resp.get("responseBody", {}).get("rows") or []
+
+
+def snk_fetch_pedidos_por_origem(origens: List[str], client: SankhyaClient,
+                                 tamanho_lote: int = TAMANHO_LOTE_CONSULTA) -> Dict[str, dict]:
+    """
+    Verifica em uma consulta por lote quais AD_NUNOTAORIG já têm pedido na Sankhya,
+    trazendo NUNOTA, STATUSNOTA e a nota faturada (TGFVAR). Origens já verificadas
+    são lidas do índice local. Retorna {origem: pedido} apenas para as existentes.
+    """
+    pendentes = [str(origem) for origem in dict.fromkeys(origens) if origem and not order_index.consultada(origem)]
+    for inicio in range(0, len(pendentes), tamanho_lote):
+        lote = pendentes[inicio:inicio + tamanho_lote]
+        sql = ("SELECT CAB.AD_NUNOTAORIG, CAB.NUNOTA, CAB.STATUSNOTA, "
+               "(SELECT MAX(VAR.NUNOTA) FROM TGFVAR VAR WHERE VAR.NUNOTAORIG = CAB.NUNOTA) "
+               f"FROM TGFCAB CAB WHERE CAB.TIPMOV = 'P' AND CAB.AD_NUNOTAORIG IN ({lista_sql(lote)})")
+        try:
+            for origem, nunota, statusnota, nota in snk_execute_query(sql, client):
+                order_index.set(origem, nunota, statusnota, nota)
+            order_index.marcar_consultadas(lote)
+        except Exception as e:
+            logging.error(f"🚨 Erro ao verificar pedidos existentes: {e}")
+
+    existentes = {str(origem): order_index.get(origem) for origem in origens if order_index.get(origem)}
+    if existentes:
+        logging.info(f"♻️ {len(existentes)} pedidos já existentes na Sankhya: {', '.join(existentes)}")
+    return existentes
+
+
 def snk_fetch_invoice_data(nota: str, client: SankhyaClient):
     sql = f"SELECT sankhya.CC_VTEX_INVOICE({nota})"
     payload = {
@@ -272,15 +370,60 @@ def snk_fetch_invoice_data(nota: str, client: SankhyaClient):
         }
     }
 
-    logging.debug("🚀 Payload de executeQuery:\n" + json.dumps(payload, indent=2, ensure_ascii=False))
+    logging.debug("🚀 Payload de executeQuery:\n%s", LazyJson(payload))
 
     try:
         logging.info(f"🔎 Executando SQL no Sankhya: {sql}")
         resp = client.get(payload)
         xml = resp["responseBody"]["rows"][0][0]
-        logging.debug("🔍 Resposta completa da API Sankhya:\n" +
-                      json.dumps(xml, indent=2, ensure_ascii=False))
+        logging.debug("🔍 Resposta completa da API Sankhya:\n%s", LazyJson(xml))
         return json.loads(xml)
     except Exception as e:
         logging.error(f"🚨 Erro ao executar DbExplorerSP.executeQuery: {e}")
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+
+def snk_iter_invoices_data(notas: List[str], client: SankhyaClient,
+                           tamanho_lote: int = TAMANHO_LOTE_CONSULTA) -> Iterator[Tuple[str, dict]]:
+    """
+    Gera (nota, invoice) para várias notas, executando CC_VTEX_INVOICE em uma única
+    consulta por lote. Cada linha só é convertida em dict quando consumida; quem
+    chama guarda a invoice no job (INVOICE_OBTIDA) para não consultá-la de novo.
+    """
+    pendentes = []
+    for nota in dict.fromkeys(str(nota) for nota in notas):
+        if nota.isdigit():
+            pendentes.append(nota)
+        else:
+            # Uma nota vazia ou não numérica não pode derrubar o lote inteiro
+            logging.error(f"🚨 Nota inválida para buscar invoice: {nota!r}")
+            yield nota, {"error": f"Nota inválida: {nota!r}"}
+
+    for inicio in range(0, len(pendentes), tamanho_lote):
+        lote = pendentes[inicio:inicio + tamanho_lote]
+        sql = ("SELECT CAB.NUNOTA, sankhya.CC_VTEX_INVOICE(CAB.NUNOTA) FROM TGFCAB CAB "
+               f"WHERE CAB.NUNOTA IN ({', '.join(str(int(nota)) for nota in lote)})")
+        try:
+            rows = snk_execute_query(sql, client)
+        except Exception as e:
+            logging.error(f"🚨 Erro ao buscar invoices em lote: {e}")
+            rows = []
+
+        for nunota, xml in rows:
+            nota = str(nunota)
+            try:
+                invoice = json.loads(xml)
+            except (TypeError, ValueError) as e:
+                logging.error(f"🚨 Invoice inválida para a nota {nota}: {e}")
+                yield nota, {"error": str(e)}
+                continue
+            yield nota, invoice
+
+
+def snk_fetch_invoices_data(notas: List[str], client: SankhyaClient) -> Dict[str, dict]:
+    """Retorna {nota: invoice} para várias notas; notas sem retorno ficam com {"error": ...}."""
+    invoices = dict(snk_iter_invoices_data(notas, client))
+    for nota in notas:
+        invoices.setdefault(str(nota), {"error": f"Invoice da nota {nota} não retornada pela Sankhya"})
+    logging.info(f"✅ {sum(1 for i in invoices.values() if 'error' not in i)}/{len(invoices)} invoices obtidas")
+    return invoices
\ No newline at end of file
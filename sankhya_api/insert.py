@@ -1,9 +1,10 @@
-import json
 import logging
 from datetime import datetime
 
+from observability.logs import LazyJson
 from sankhya_api.auth import SankhyaClient
-from sankhya_api.fetch import snk_fetch_codigo_parceiro
+from sankhya_api.fetch import snk_fetch_codigo_parceiro, snk_resolver_endereco
+from sankhya_api.order_index import order_index
 from sankhya_api.update import snk_atualizar_dados_basicos_parceiro, snk_atualizar_dados_entrega_parceiro, \
     snk_incluir_dados_basicos_parceiro, snk_incluir_dados_entrega_parceiro
 from vtex_api.builders import vtex_order_payload_data
@@ -16,7 +17,7 @@ from vtex_api.builders import vtex_order_payload_data
 def snk_cadastra_atualiza_parceiro(vtex_dict: dict, client: SankhyaClient):
     """
        Cadastra ou atualiza um parceiro no Sankhya a partir do dicionário VTEX.
-       Retorna True em caso de sucesso, False em caso de erro.
+       Retorna True apenas se os dois saves (dados básicos e entrega) tiverem sucesso.
        """
     try:
         cpf = vtex_dict.get("CGC_CPF")
@@ -26,12 +27,16 @@ def snk_cadastra_atualiza_parceiro(vtex_dict: dict, client: SankhyaClient):
 
         # Busca código do parceiro existente
         codparc = snk_fetch_codigo_parceiro(cpf, client)
+        # Endereço resolvido uma única vez para os dois saves
+        endereco = snk_resolver_endereco(vtex_dict, client)
 
         if codparc:
             logging.debug("ℹ️ Começando atualização de parceiro")
             atualizacoes = {
-                "atualização de dados básicos": snk_atualizar_dados_basicos_parceiro(codparc, vtex_dict, client),
-                "atualização de endereço de entrega": snk_atualizar_dados_entrega_parceiro(codparc, vtex_dict, client)
+                "atualização de dados básicos": snk_atualizar_dados_basicos_parceiro(codparc, vtex_dict, client,
+                                                                                     endereco),
+                "atualização de endereço de entrega": snk_atualizar_dados_entrega_parceiro(codparc, vtex_dict, client,
+                                                                                           endereco)
             }
 
             # Log de resultados de cada atualização
@@ -43,9 +48,12 @@ def snk_cadastra_atualiza_parceiro(vtex_dict: dict, client: SankhyaClient):
         else:
             logging.debug("ℹ️ Nenhum parceiro encontrado, iniciando inclusão")
 
+            # O CODPARC gerado na inclusão é repassado ao save de entrega, sem nova consulta
+            codparc = snk_incluir_dados_basicos_parceiro(cpf, vtex_dict, client, endereco)
             atualizacoes = {
-                "inserção de dados básicos": snk_incluir_dados_basicos_parceiro(cpf, vtex_dict, client),
-                "inserção de endereço de entrega": snk_incluir_dados_entrega_parceiro(vtex_dict, client),
+                "inserção de dados básicos": codparc,
+                "inserção de endereço de entrega": bool(codparc) and snk_incluir_dados_entrega_parceiro(
+                    vtex_dict, client, codparc, endereco),
             }
 
             # Log de resultados de cada atualização
@@ -55,7 +63,7 @@ def snk_cadastra_atualiza_parceiro(vtex_dict: dict, client: SankhyaClient):
                 else:
                     logging.error(f"❌ Falha ao atualizar {descricao}.")
 
-        return True
+        return all(atualizacoes.values())
 
     except Exception as e:
         # Log com stack trace para facilitar debug
@@ -65,7 +73,7 @@ def snk_cadastra_atualiza_parceiro(vtex_dict: dict, client: SankhyaClient):
 
 def snk_cadastra_pedido_snk(vtex_order_id: str, client: SankhyaClient):
     logging.debug('🚀 Iniciando cadastro de novo pedido')
-    order_data = vtex_order_payload_data(vtex_order_id)
+    order_data = vtex_order_payload_data(vtex_order_id, client)
 
     nota = {
         "cabecalho": {
@@ -82,23 +90,25 @@ def snk_cadastra_pedido_snk(vtex_order_id: str, client: SankhyaClient):
             "TIPMOV": {"$": "P"},
             "CODNAT": {"$": "1010100"},
             "AD_ENTREGA": {"$": "S"},
-            "CIF_FOB": {"$": "C"}
+            "CIF_FOB": {"$": "C"},
+            "VLRFRETE": {"$": f"{order_data['VLRFRETE']}"}
         },
         "itens": {
             "INFORMARPRECO": True,
             "item": [
                 {
                     "NUNOTA": {"$": ""},
-                    "CODPROD": {"$": f"{order_data['CODPROD']}"},
-                    "QTDNEG": {"$":  f"{order_data['QTDNEG']}"},
+                    "CODPROD": {"$": item['CODPROD']},
+                    "QTDNEG": {"$": item['QTDNEG']},
                     "CODLOCALORIG": {"$": f"{order_data['CODLOCALORIG']}"},
                     "AD_MONTAGEM": {"$": "S"},
                     "AD_ENTREGAR": {"$": "S"},
                     "AD_EMPRESASAIDA": {"$": "7"},
-                    "VLRUNIT": {"$": f"{order_data['VLRUNIT']}"},
-                    "VLRTOT": {"$": f"{order_data['VLRTOT']}"},
-                    "PERCDESC": {"$": "0"}
+                    "VLRUNIT": {"$": item['VLRUNIT']},
+                    "VLRTOT": {"$": item['VLRTOT']},
+                    "VLRDESC": {"$": item['VLRDESC']}
                 }
+                for item in order_data['ITENS']
             ]
         }
     }
@@ -109,16 +119,15 @@ def snk_cadastra_pedido_snk(vtex_order_id: str, client: SankhyaClient):
             "nota": nota
         }
     }
-    logging.debug(f"📤 Payload para criação do pedido no Sankhya")
-    logging.debug(json.dumps(payload, indent=2, ensure_ascii=False))
+    logging.debug("📤 Payload para criação do pedido no Sankhya\n%s", LazyJson(payload))
 
     try:
         logging.info("🔎 Enviando Pedido ao Sankhya…")
         resp = client.get(payload)  # Sankhya exige GET com body para este serviço
-        logging.debug("🔍 Resposta completa da API Sankhya:\n" +
-                      json.dumps(resp, indent=2, ensure_ascii=False))
+        logging.debug("🔍 Resposta completa da API Sankhya:\n%s", LazyJson(resp))
         nunota = resp["responseBody"]["pk"]["NUNOTA"]['$']
         logging.debug(f"ℹ️ Nunota: {nunota}")
+        order_index.set(order_data['AD_NUNOTAORIG'], nunota)
         status = resp.get("status")
         msg = resp.get("statusMessage", "")
 
@@ -0,0 +1,153 @@
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+# Tipos de logradouro reconhecidos no início do endereço (inclusive os de mais de uma palavra)
+PREFIXOS_LOGRADOURO = (
+    "Rua", "R", "R.", "Avenida", "Av", "Av.", "Travessa", "Trav", "Trav.", "Alameda", "Al", "Al.",
+    "Praça", "Pç", "Pç.", "Rodovia", "Estrada", "Via", "Viela", "Vila", "Largo", "Passeio", "Beco",
+    "Caminho", "Servidão", "Boulevard", "Blvd", "Marginal", "Esplanada", "Balneário", "Colônia",
+    "Conjunto", "Distrito", "Estação", "Favela", "Feira", "Jardim", "Jd", "Jd.", "Ladeira",
+    "Loteamento", "Morro", "Núcleo", "Parque", "Passagem", "Passarela", "Ponte", "Porto", "Projeção",
+    "Quadra", "Ramal", "Recanto", "Residencial", "Setor", "Sítio", "Trecho", "Trevo", "Vale",
+    "Vereda", "Zona", "Complexo", "Condomínio", "Área", "Anel Rodoviário", "Desvio", "Contorno",
+    "Reta", "Rodoanel", "Terminal", "Estradinha", "Alto", "Aclive", "Declive", "Encosta", "Vinculo",
+    "Fazenda", "Outeiro"
+)
+
+# Abreviação usada no TIPO do Endereco da Sankhya → tipo de logradouro por extenso
+ABREVIACOES = {
+    "R": "Rua",
+    "R.": "Rua",
+    "RUA": "Rua",
+    "Av": "Avenida",
+    "Av.": "Avenida",
+    "A": "Avenida",
+    "Trav": "Travessa",
+    "Trav.": "Travessa",
+    "TV.": "Travessa",
+    "TV": "Travessa",
+    "TVs": "Travessa",
+    "TVS": "Travessa",
+    "Al": "Alameda",
+    "ALA": "Alameda",
+    "ALAMEDA": "Alameda",
+    "Al.": "Alameda",
+    "Pç": "Praça",
+    "Pç.": "Praça",
+    "Rod": "Rodovia",
+    "Rod.": "Rodovia",
+    "Est": "Estrada",
+    "Est.": "Estrada",
+    "Jd": "Jardim",
+    "Jd.": "Jardim",
+    "Vl": "Vila",
+    "Vl.": "Vila",
+    "Baln": "Balneário",
+    "Baln.": "Balneário",
+    "Conj": "Conjunto",
+    "Conj.": "Conjunto",
+    "Res": "Residencial",
+    "Res.": "Residencial",
+    "Cond": "Condomínio",
+    "Cond.": "Condomínio",
+    "Pq": "Parque",
+    "Pq.": "Parque",
+    "St": "Setor",
+    "St.": "Setor",
+    "Lot": "Loteamento",
+    "Lot.": "Loteamento"
+}
+
+# Abreviações que não marcam prefixo no endereço digitado ("A" aparece em nomes: "A Rua Nova")
+ABREVIACOES_SO_TIPO = ("A",)
+
+
+# ------------------------------------------------------------------------------
+# 🔤 Acentos e chave de comparação
+# ------------------------------------------------------------------------------
+
+@lru_cache(maxsize=65536)
+def remover_acentos(texto: str) -> str:
+    if texto.isascii():
+        return texto
+    nfkd = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in nfkd if not unicodedata.combining(c))
+
+
+def dobrar(texto: str) -> str:
+    """Forma de comparação: sem acentos e maiúscula. Ex: 'Praça' → 'PRACA'"""
+    return remover_acentos(texto).upper()
+
+
+# ------------------------------------------------------------------------------
+# 🌳 Índices pré-compilados (montados uma vez na importação)
+# ------------------------------------------------------------------------------
+_FIM = ""
+
+
+def _compilar_prefixos() -> dict:
+    """Trie por palavra (dobrada) → tipo por extenso, para achar o prefixo mais longo."""
+    trie = {}
+    canonicos = {dobrar(abreviacao): nome for abreviacao, nome in ABREVIACOES.items()
+                 if abreviacao not in ABREVIACOES_SO_TIPO}
+    prefixos = {prefixo: canonicos.get(dobrar(prefixo), prefixo) for prefixo in PREFIXOS_LOGRADOURO}
+    prefixos.update({abreviacao: nome for abreviacao, nome in ABREVIACOES.items()
+                     if abreviacao not in ABREVIACOES_SO_TIPO})
+    for prefixo, nome in prefixos.items():
+        no = trie
+        for palavra in prefixo.split():
+            no = no.setdefault(dobrar(palavra), {})
+        no[_FIM] = nome
+    return trie
+
+
+def _compilar_abreviacoes() -> Dict[str, Tuple[str, ...]]:
+    """Índice reverso: tipo por extenso (dobrado) → abreviações, na ordem de ABREVIACOES."""
+    reverso = {}
+    for abreviacao, nome in ABREVIACOES.items():
+        reverso.setdefault(dobrar(nome), []).append(abreviacao)
+    return {nome: tuple(abreviacoes) for nome, abreviacoes in reverso.items()}
+
+
+_TRIE_PREFIXOS = _compilar_prefixos()
+_ABREVIACOES_POR_NOME = _compilar_abreviacoes()
+
+
+# ------------------------------------------------------------------------------
+# 🏠 Normalização de logradouros
+# ------------------------------------------------------------------------------
+
+def abreviacoes_de(nome_completo: str) -> Tuple[str, ...]:
+    """Abreviações do tipo de logradouro. Ex: 'AVENIDA' → ('Av', 'Av.', 'A')"""
+    return _ABREVIACOES_POR_NOME.get(dobrar(nome_completo or ""), ())
+
+
+def _prefixo_mais_longo(palavras: list) -> Tuple[Optional[str], int]:
+    no, encontrado, tamanho = _TRIE_PREFIXOS, None, 0
+    for indice, palavra in enumerate(palavras):
+        no = no.get(dobrar(palavra))
+        if no is None:
+            break
+        if _FIM in no:
+            encontrado, tamanho = no[_FIM], indice + 1
+    return encontrado, tamanho
+
+
+@lru_cache(maxsize=65536)
+def normalizar_logradouro(logradouro: str) -> Tuple[str, str]:
+    """
+    Separa o tipo do logradouro, por extenso e em maiúsculas, do nome sem acentos.
+    Ex: 'Av. Nazaré' → ('AVENIDA', 'NAZARE'); 'Anel Rodoviário BR 316' → ('ANEL RODOVIÁRIO', 'BR 316')
+    """
+    palavras = (logradouro or "").split()
+    if not palavras:
+        return "", ""
+    prefixo, tamanho = _prefixo_mais_longo(palavras)
+    sufixo = dobrar(" ".join(palavras[tamanho:]))
+    return (prefixo.upper() if prefixo else ""), sufixo
+
+
+def normalizar_logradouros(logradouros: Iterable[str]) -> Dict[str, Tuple[str, str]]:
+    """Normaliza um lote de endereços (ex.: backfill de parceiros), uma vez por endereço distinto."""
+    return {logradouro: normalizar_logradouro(logradouro) for logradouro in dict.fromkeys(logradouros)}
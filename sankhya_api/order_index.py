@@ -0,0 +1,39 @@
+import threading
+from typing import Dict, Iterable, Optional, Set
+
+
+# ------------------------------------------------------------------------------
+# 🗂️ Índice AD_NUNOTAORIG → pedido já criado na Sankhya
+# ------------------------------------------------------------------------------
+
+class OrderIndex:
+    """
+    Índice em memória dos pedidos já existentes na Sankhya por AD_NUNOTAORIG
+    (sequence do pedido VTEX), com NUNOTA, STATUSNOTA e a nota faturada, se houver.
+    Também guarda quais origens já foram consultadas, para distinguir "não existe"
+    de "ainda não verificado".
+    """
+
+    def __init__(self):
+        self._pedidos: Dict[str, dict] = {}
+        self._consultadas: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def get(self, origem: str) -> Optional[dict]:
+        return self._pedidos.get(str(origem))
+
+    def set(self, origem: str, nunota: str, statusnota: str = "A", nota: Optional[str] = None):
+        with self._lock:
+            self._pedidos[str(origem)] = {"NUNOTA": str(nunota), "STATUSNOTA": statusnota,
+                                          "NOTA": str(nota) if nota else None}
+            self._consultadas.add(str(origem))
+
+    def consultada(self, origem: str) -> bool:
+        return str(origem) in self._consultadas
+
+    def marcar_consultadas(self, origens: Iterable[str]):
+        with self._lock:
+            self._consultadas.update(str(origem) for origem in origens)
+
+
+order_index = OrderIndex()
@@ -0,0 +1,89 @@
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, Optional
+
+from utils import caminho_dados
+
+# "1" grava o índice em disco para ser reaproveitado entre execuções
+PARTNER_INDEX_PERSISTENTE = os.getenv("SNK_PARTNER_INDEX_PERSISTENTE", "0") == "1"
+
+
+def normalizar_cpf(cpf: str) -> str:
+    """Mantém apenas os dígitos do CPF/CNPJ. Ex: '123.456.789-00' → '12345678900'"""
+    return re.sub(r"\D", "", cpf or "")
+
+
+# ------------------------------------------------------------------------------
+# 🗂️ Índice CPF → CODPARC
+# ------------------------------------------------------------------------------
+
+class PartnerIndex:
+    """
+    Índice em memória de CGC_CPF → CODPARC, preenchido pelas consultas e pelas
+    inclusões de parceiros. Com persistência ativa, cada entrada nova é anexada a
+    um arquivo JSON Lines, recarregado na primeira consulta da próxima execução.
+    """
+
+    def __init__(self, caminho: Optional[str] = None, persistente: bool = PARTNER_INDEX_PERSISTENTE):
+        self._caminho = caminho
+        self._persistente = persistente
+        self._codigos: Dict[str, str] = {}
+        self._carregado = False
+        self._lock = threading.Lock()
+
+    def _arquivo(self) -> str:
+        return self._caminho or caminho_dados("parceiros.jsonl")
+
+    def _carregar(self):
+        if self._carregado:
+            return
+        with self._lock:
+            if self._carregado:
+                return
+            if self._persistente and os.path.exists(self._arquivo()):
+                with open(self._arquivo(), encoding="utf-8") as f:
+                    for linha in f:
+                        try:
+                            registro = json.loads(linha)
+                            self._codigos[registro["cpf"]] = registro["codparc"]
+                        except (ValueError, KeyError):
+                            continue
+                logging.debug(f"🗂️ {len(self._codigos)} parceiros carregados do índice local")
+            self._carregado = True
+
+    def get(self, cpf: str) -> Optional[str]:
+        self._carregar()
+        return self._codigos.get(normalizar_cpf(cpf))
+
+    def set(self, cpf: str, codparc: str):
+        chave = normalizar_cpf(cpf)
+        if not (chave and codparc):
+            return
+        self._carregar()
+        codparc = str(codparc)
+        with self._lock:
+            if self._codigos.get(chave) == codparc:
+                return
+            self._codigos[chave] = codparc
+            if self._persistente:
+                with open(self._arquivo(), "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"cpf": chave, "codparc": codparc}) + "\n")
+
+    def invalidar(self, cpf: Optional[str] = None):
+        self._carregar()
+        with self._lock:
+            if cpf is None:
+                self._codigos.clear()
+            else:
+                self._codigos.pop(normalizar_cpf(cpf), None)
+            if self._persistente:
+                # Regrava o arquivo apenas com as entradas que restaram
+                with open(self._arquivo(), "w", encoding="utf-8") as f:
+                    for chave, codparc in self._codigos.items():
+                        f.write(json.dumps({"cpf": chave, "codparc": codparc}) + "\n")
+
+
+partner_index = PartnerIndex()
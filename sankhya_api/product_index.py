@@ -0,0 +1,166 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from sankhya_api.auth import SankhyaClient
+from sankhya_api.fetch import TAMANHO_LOTE_CONSULTA
+from sankhya_api.refindex import snk_load_all_records
+from sankhya_api.utils import lista_sql
+
+# Campo de Produto que guarda o RefId da VTEX (CODPROD quando o RefId já é o código Sankhya)
+PRODUTO_CAMPO_REFID = os.getenv("SNK_PRODUTO_CAMPO_REFID", "CODPROD")
+# Validade das entradas do índice, inclusive dos RefIds não encontrados (s)
+PRODUCT_INDEX_TTL = int(os.getenv("SNK_PRODUCT_INDEX_TTL", "3600"))
+# "1" confere o estoque do local de origem (CODLOCALORIG) antes de incluir o pedido
+VERIFICAR_ESTOQUE = os.getenv("SNK_VERIFICAR_ESTOQUE", "0") == "1"
+
+
+class ProdutoInvalido(ValueError):
+    """Algum item do pedido não tem produto ativo (ou estoque) na Sankhya."""
+
+
+# ------------------------------------------------------------------------------
+# 📦 Índice RefId → CODPROD
+# ------------------------------------------------------------------------------
+
+class ProductIndex:
+    """
+    Índice em memória de RefId VTEX → produto Sankhya (CODPROD e ATIVO), carregado
+    em lote com loadRecords paginado apenas para os RefIds pedidos. RefIds sem
+    produto também ficam guardados, para que um SKU inválido não gere nova consulta
+    a cada pedido. Entradas expiram após SNK_PRODUCT_INDEX_TTL segundos.
+    """
+
+    def __init__(self, campo_refid: str = PRODUTO_CAMPO_REFID, ttl: int = PRODUCT_INDEX_TTL):
+        self.campo_refid = campo_refid
+        self._ttl = ttl
+        self._produtos: Dict[str, tuple] = {}
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def _valido(self, ref_id: str, agora: float) -> bool:
+        entrada = self._produtos.get(ref_id)
+        return entrada is not None and agora - entrada[1] < self._ttl
+
+    def _carregar(self, ref_ids: List[str], client: SankhyaClient):
+        campos = "CODPROD,ATIVO" + (f",{self.campo_refid}" if self.campo_refid != "CODPROD" else "")
+        for inicio in range(0, len(ref_ids), TAMANHO_LOTE_CONSULTA):
+            lote = ref_ids[inicio:inicio + TAMANHO_LOTE_CONSULTA]
+            encontrados = {}
+            criterio = f"{self.campo_refid} IN ({lista_sql(lote)})"
+            for registro in snk_load_all_records("Produto", campos, client, criterio):
+                codprod, ativo = registro[0], registro[1]
+                ref_id = registro[2] if self.campo_refid != "CODPROD" else codprod
+                if codprod and ref_id:
+                    # Mais de um produto com o mesmo RefId: prefere o ativo
+                    atual = encontrados.get(str(ref_id))
+                    if atual is None or (atual["ATIVO"] != "S" and ativo == "S"):
+                        encontrados[str(ref_id)] = {"CODPROD": str(codprod), "ATIVO": ativo}
+
+            # snk_load_all_records lança CargaFalhou em status de erro: uma carga que falhou
+            # nunca chega aqui e não guarda os RefIds do lote como inexistentes
+            agora = time.time()
+            with self._lock:
+                for ref_id in lote:
+                    self._produtos[ref_id] = (encontrados.get(ref_id), agora)
+            logging.debug(f"📦 {len(encontrados)}/{len(lote)} produtos carregados da Sankhya")
+
+    def resolver(self, ref_ids: Iterable[str], client: SankhyaClient) -> Dict[str, Optional[dict]]:
+        """
+        Retorna {RefId: {"CODPROD", "ATIVO"} ou None}, consultando a Sankhya em lote
+        apenas os RefIds ausentes ou expirados.
+        """
+        ref_ids = [str(ref_id) for ref_id in dict.fromkeys(ref_ids) if ref_id]
+        agora = time.time()
+        with self._lock:
+            pendentes = [ref_id for ref_id in ref_ids if not self._valido(ref_id, agora)]
+            self._hits += len(ref_ids) - len(pendentes)
+            self._misses += len(pendentes)
+        if pendentes:
+            self._carregar(pendentes, client)
+        with self._lock:
+            return {ref_id: (self._produtos.get(ref_id) or (None,))[0] for ref_id in ref_ids}
+
+    def invalidar(self, ref_id: Optional[str] = None):
+        with self._lock:
+            if ref_id is None:
+                self._produtos.clear()
+            else:
+                self._produtos.pop(str(ref_id), None)
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "produtos": len(self._produtos),
+                "hits": self._hits,
+                "misses": self._misses,
+                "taxa_acerto": round(self._hits / total, 3) if total else 0.0,
+            }
+
+
+product_index = ProductIndex()
+
+
+# ------------------------------------------------------------------------------
+# 🏬 Estoque do local de origem
+# ------------------------------------------------------------------------------
+
+def snk_fetch_estoque(codprods: List[str], codlocal: str, client: SankhyaClient,
+                      codemp: Optional[str] = None) -> Dict[str, float]:
+    """Saldo disponível (ESTOQUE - RESERVADO) de cada CODPROD no local, somando lotes/controles."""
+    saldos = {str(codprod): 0.0 for codprod in codprods}
+    for inicio in range(0, len(codprods), TAMANHO_LOTE_CONSULTA):
+        lote = codprods[inicio:inicio + TAMANHO_LOTE_CONSULTA]
+        criterio = f"CODLOCAL = {codlocal} AND CODPROD IN ({lista_sql(lote)})"
+        if codemp:
+            criterio += f" AND CODEMP = {codemp}"
+        for codprod, estoque, reservado in snk_load_all_records("Estoque", "CODPROD,ESTOQUE,RESERVADO", client,
+                                                                 criterio):
+            try:
+                saldos[str(codprod)] = saldos.get(str(codprod), 0.0) + float(estoque or 0) - float(reservado or 0)
+            except ValueError:
+                continue
+    return saldos
+
+
+# ------------------------------------------------------------------------------
+# ✅ Validação dos itens antes do CACSP.incluirNota
+# ------------------------------------------------------------------------------
+
+def snk_validar_itens_pedido(itens: List[dict], client: SankhyaClient, codlocal: Optional[str] = None,
+                             codemp: Optional[str] = None, verificar_estoque: bool = VERIFICAR_ESTOQUE) -> List[dict]:
+    """
+    Troca o RefId de cada item (CODPROD vindo da VTEX) pelo CODPROD da Sankhya e
+    confere, sem chamar o incluirNota, se todos os produtos existem e estão ativos
+    e, opcionalmente, se há estoque no local de origem.
+    Lança ProdutoInvalido com todos os problemas encontrados no pedido.
+    """
+    produtos = product_index.resolver([item["CODPROD"] for item in itens], client)
+    problemas = []
+    resolvidos = []
+    for item in itens:
+        produto = produtos.get(str(item["CODPROD"]))
+        if produto is None:
+            problemas.append(f"RefId {item['CODPROD']} sem produto na Sankhya")
+        elif produto["ATIVO"] != "S":
+            problemas.append(f"produto {produto['CODPROD']} (RefId {item['CODPROD']}) inativo")
+        else:
+            resolvidos.append({**item, "CODPROD": produto["CODPROD"]})
+
+    if not problemas and verificar_estoque and codlocal:
+        quantidades = {}
+        for item in resolvidos:
+            quantidades[item["CODPROD"]] = quantidades.get(item["CODPROD"], 0.0) + float(item["QTDNEG"])
+        saldos = snk_fetch_estoque(list(quantidades), codlocal, client, codemp)
+        for codprod, quantidade in quantidades.items():
+            if saldos.get(codprod, 0.0) < quantidade:
+                problemas.append(f"produto {codprod} sem estoque no local {codlocal} "
+                                 f"(disponível {saldos.get(codprod, 0.0):g}, pedido {quantidade:g})")
+
+    if problemas:
+        raise ProdutoInvalido("; ".join(problemas))
+    return resolvidos
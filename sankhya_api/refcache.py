@@ -0,0 +1,102 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from sankhya_api.normalize import remover_acentos
+from utils import caminho_dados
+
+# Validade dos códigos de Endereco/Bairro/Cidade guardados localmente (padrão: 7 dias)
+REFCACHE_TTL = int(os.getenv("SNK_REFCACHE_TTL", str(7 * 24 * 3600)))
+
+
+def normalizar_chave(nome: str) -> str:
+    """Chave de cache: sem acentos, maiúscula e com espaços simples. Ex: ' São  Brás ' → 'SAO BRAS'"""
+    return " ".join(remover_acentos(nome or "").upper().split())
+
+
+# ------------------------------------------------------------------------------
+# 🗃️ Cache local de dados de referência (Endereco, Bairro, Cidade)
+# ------------------------------------------------------------------------------
+
+class ReferenceCache:
+    """
+    Cache persistente em SQLite de códigos de referência da Sankhya, indexado por
+    entidade e nome normalizado. Entradas vencidas (TTL) são ignoradas e
+    sobrescritas na próxima consulta à API.
+    """
+
+    def __init__(self, caminho: Optional[str] = None, ttl: int = REFCACHE_TTL):
+        self._caminho = caminho
+        self._ttl = ttl
+        self._conn = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _conexao(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self._caminho or caminho_dados("referencias.sqlite3"),
+                                         check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS referencias (
+                    entidade TEXT NOT NULL,
+                    chave TEXT NOT NULL,
+                    codigo TEXT NOT NULL,
+                    atualizado_em REAL NOT NULL,
+                    PRIMARY KEY (entidade, chave)
+                )
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def get(self, entidade: str, nome: str) -> Optional[str]:
+        chave = normalizar_chave(nome)
+        with self._lock:
+            linha = self._conexao().execute(
+                "SELECT codigo, atualizado_em FROM referencias WHERE entidade = ? AND chave = ?",
+                (entidade, chave)
+            ).fetchone()
+            if linha and time.time() - linha[1] < self._ttl:
+                self.hits += 1
+                logging.debug(f"🗃️ {entidade} '{chave}' lido do cache local: {linha[0]}")
+                return linha[0]
+            self.misses += 1
+            return None
+
+    def set(self, entidade: str, nome: str, codigo: str):
+        if not codigo:
+            return
+        with self._lock:
+            conn = self._conexao()
+            conn.execute(
+                "INSERT OR REPLACE INTO referencias (entidade, chave, codigo, atualizado_em) VALUES (?, ?, ?, ?)",
+                (entidade, normalizar_chave(nome), str(codigo), time.time())
+            )
+            conn.commit()
+
+    def invalidar(self, entidade: Optional[str] = None, nome: Optional[str] = None):
+        """Remove entradas do cache: tudo, uma entidade inteira ou um único nome."""
+        sql, params = "DELETE FROM referencias", ()
+        if entidade and nome:
+            sql, params = sql + " WHERE entidade = ? AND chave = ?", (entidade, normalizar_chave(nome))
+        elif entidade:
+            sql, params = sql + " WHERE entidade = ?", (entidade,)
+        with self._lock:
+            conn = self._conexao()
+            removidas = conn.execute(sql, params).rowcount
+            conn.commit()
+        logging.info(f"🧹 {removidas} entradas removidas do cache de referências")
+
+    def estatisticas(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "taxa_acerto": self.hits / total if total else 0.0,
+        }
+
+
+reference_cache = ReferenceCache()
@@ -0,0 +1,143 @@
+import logging
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import requests
+
+from sankhya_api.auth import SankhyaClient
+from sankhya_api.refcache import normalizar_chave
+
+# Campo da entidade Bairro com o código da cidade, quando existir na base (ex: CODCID)
+BAIRRO_CAMPO_CIDADE = os.getenv("SNK_BAIRRO_CAMPO_CIDADE", "")
+# Intervalo da atualização em segundo plano do índice (padrão: 6 horas)
+REFINDEX_INTERVALO = int(os.getenv("SNK_REFINDEX_INTERVALO", str(6 * 3600)))
+
+
+class CargaFalhou(requests.RequestException):
+    """O loadRecords respondeu com status de erro (HTTP 200 sem responseBody)."""
+
+
+# ------------------------------------------------------------------------------
+# 📚 Carga paginada de entidades de referência
+# ------------------------------------------------------------------------------
+
+def snk_load_all_records(entidade: str, campos: str, client: SankhyaClient, criterio: str = None):
+    """
+    Percorre todas as páginas de CRUDServiceProvider.loadRecords da entidade,
+    devolvendo cada registro como lista de valores na ordem de `campos`.
+    Lança CargaFalhou se alguma página voltar com status de erro, para que uma
+    falha não seja lida como "nenhum registro".
+    """
+    pagina = 0
+    quantidade_campos = len(campos.split(","))
+    while True:
+        data_set = {
+            "rootEntity": entidade,
+            "includePresentationFields": "N",
+            "offsetPage": str(pagina),
+            "entity": {
+                "fieldset": {
+                    "list": campos
+                }
+            }
+        }
+        if criterio:
+            data_set["criteria"] = {"expression": {"$": criterio}}
+
+        data = client.get({
+            "serviceName": "CRUDServiceProvider.loadRecords",
+            "requestBody": {"dataSet": data_set}
+        })
+        status = data.get("status")
+        msg = data.get("statusMessage")
+        if "responseBody" not in data or not (status == "0" or (status == "1" and not msg)):
+            raise CargaFalhou(f"Erro ao carregar {entidade} (página {pagina}): status={status} {msg or ''}".rstrip())
+        entities = data.get("responseBody", {}).get("entities", {}) or {}
+        entity = entities.get("entity") or []
+        if isinstance(entity, dict):
+            entity = [entity]
+
+        for item in entity:
+            yield [item.get(f"f{i}", {}).get("$") for i in range(quantidade_campos)]
+
+        if str(entities.get("hasMoreResult", "false")).lower() != "true":
+            break
+        pagina += 1
+
+
+# ------------------------------------------------------------------------------
+# 📚 Índice em memória de Cidades e Bairros
+# ------------------------------------------------------------------------------
+
+class ReferenceIndex:
+    """
+    Índice em memória de Cidade e Bairro (nome normalizado → código), carregado de
+    uma só vez da Sankhya. Bairros também são indexados por cidade quando a base
+    informa o campo SNK_BAIRRO_CAMPO_CIDADE.
+    """
+
+    def __init__(self):
+        self._cidades: Dict[str, str] = {}
+        self._bairros: Dict[str, str] = {}
+        self._bairros_por_cidade: Dict[Tuple[str, str], str] = {}
+        self._atualizacao = None
+        self._parar = threading.Event()
+        self.carregado = False
+
+    def carregar(self, client: SankhyaClient):
+        logging.info("📚 Carregando índice de cidades e bairros da Sankhya...")
+        cidades = {}
+        for codcid, nomecid in snk_load_all_records("Cidade", "CODCID,NOMECID", client):
+            if codcid and nomecid:
+                cidades.setdefault(normalizar_chave(nomecid), codcid)
+
+        campos_bairro = "CODBAI,NOMEBAI" + (f",{BAIRRO_CAMPO_CIDADE}" if BAIRRO_CAMPO_CIDADE else "")
+        bairros, bairros_por_cidade = {}, {}
+        for registro in snk_load_all_records("Bairro", campos_bairro, client):
+            codbai, nomebai = registro[0], registro[1]
+            if not (codbai and nomebai):
+                continue
+            chave = normalizar_chave(nomebai)
+            bairros.setdefault(chave, codbai)
+            if BAIRRO_CAMPO_CIDADE and registro[2]:
+                bairros_por_cidade.setdefault((str(registro[2]), chave), codbai)
+
+        # Troca os dicionários de uma vez, sem bloquear quem está consultando
+        self._cidades, self._bairros, self._bairros_por_cidade = cidades, bairros, bairros_por_cidade
+        self.carregado = True
+        logging.info(f"✅ Índice carregado: {len(cidades)} cidades, {len(bairros)} bairros")
+
+    def codcid(self, nome: str) -> Optional[str]:
+        return self._cidades.get(normalizar_chave(nome))
+
+    def codbai(self, nome: str, codcid: Optional[str] = None) -> Optional[str]:
+        chave = normalizar_chave(nome)
+        if codcid:
+            codbai = self._bairros_por_cidade.get((str(codcid), chave))
+            if codbai:
+                return codbai
+        return self._bairros.get(chave)
+
+    def iniciar_atualizacao_periodica(self, client: SankhyaClient, intervalo: int = REFINDEX_INTERVALO):
+        """Recarrega o índice em segundo plano a cada `intervalo` segundos."""
+        if self._atualizacao and self._atualizacao.is_alive():
+            return
+        self._parar.clear()
+
+        def _loop():
+            while not self._parar.wait(intervalo):
+                try:
+                    self.carregar(client)
+                except Exception as e:
+                    logging.error(f"❌ Erro ao atualizar índice de cidades e bairros: {e}")
+
+        self._atualizacao = threading.Thread(target=_loop, name="sankhya-refindex", daemon=True)
+        self._atualizacao.start()
+
+    def parar_atualizacao(self):
+        self._parar.set()
+        self._atualizacao = None
+
+
+reference_index = ReferenceIndex()
@@ -0,0 +1,131 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional, Tuple
+
+from utils import caminho_dados
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos, apenas entre threads
+    fcntl = None
+
+# Validade assumida do bearer token quando o /login não informa expiração
+TOKEN_TTL = int(os.getenv("SANKHYA_TOKEN_TTL", "1800"))
+# Antecedência com que o token é renovado antes de expirar
+TOKEN_MARGEM = int(os.getenv("SANKHYA_TOKEN_MARGEM", "120"))
+
+
+# ------------------------------------------------------------------------------
+# 🔑 Gerenciador do bearer token da Sankhya
+# ------------------------------------------------------------------------------
+
+class TokenManager:
+    """
+    Mantém o bearer token da Sankhya em memória e em um arquivo local com sua
+    expiração, para que threads e processos reaproveitem o mesmo login.
+    O token é renovado `margem` segundos antes de expirar.
+    """
+
+    def __init__(self, login: Callable[[], Tuple[str, Optional[float]]], caminho: Optional[str] = None,
+                 ttl: int = TOKEN_TTL, margem: int = TOKEN_MARGEM):
+        self._login = login
+        self._caminho = caminho or caminho_dados("sankhya_token.json")
+        self._ttl = ttl
+        self._margem = margem
+        self._token = None
+        self._expira_em = 0.0
+        self._lock = threading.Lock()
+        self._renovacao = None
+
+    def _valido(self, expira_em: float) -> bool:
+        return time.time() < expira_em - self._margem
+
+    @contextmanager
+    def _trava_arquivo(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self._caminho + ".lock", "w") as trava:
+            fcntl.flock(trava, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(trava, fcntl.LOCK_UN)
+
+    def _ler_arquivo(self) -> Tuple[Optional[str], float]:
+        try:
+            with open(self._caminho, encoding="utf-8") as f:
+                dados = json.load(f)
+            return dados.get("token"), float(dados.get("expira_em", 0))
+        except (OSError, ValueError):
+            return None, 0.0
+
+    def _gravar_arquivo(self, token: str, expira_em: float):
+        temporario = f"{self._caminho}.{os.getpid()}.tmp"
+        # Só o dono lê o bearer token; o modo vale desde a criação, antes de qualquer escrita
+        descritor = os.open(temporario, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descritor, "w", encoding="utf-8") as f:
+            json.dump({"token": token, "expira_em": expira_em}, f)
+        os.replace(temporario, self._caminho)
+
+    def _renovar(self):
+        with self._trava_arquivo():
+            # Outro processo pode ter renovado enquanto esperávamos a trava
+            token, expira_em = self._ler_arquivo()
+            if token and token != self._token and self._valido(expira_em):
+                logging.debug("🔑 Token da Sankhya reaproveitado do cache local")
+            else:
+                token, validade = self._login()
+                expira_em = time.time() + (validade or self._ttl)
+                self._gravar_arquivo(token, expira_em)
+            self._token, self._expira_em = token, expira_em
+
+    def obter(self) -> str:
+        token, expira_em = self._token, self._expira_em
+        if token and self._valido(expira_em):
+            return token
+
+        with self._lock:
+            if not (self._token and self._valido(self._expira_em)):
+                token, expira_em = self._ler_arquivo()
+                if token and self._valido(expira_em):
+                    logging.debug("🔑 Token da Sankhya lido do cache local")
+                    self._token, self._expira_em = token, expira_em
+                else:
+                    self._renovar()
+            return self._token
+
+    def invalidar(self, token: str):
+        """Descarta o token recusado pela API (401), se ainda for o atual."""
+        with self._lock:
+            if self._token == token:
+                self._token, self._expira_em = None, 0.0
+                with self._trava_arquivo():
+                    if self._ler_arquivo()[0] == token:
+                        try:
+                            os.remove(self._caminho)
+                        except OSError:
+                            pass
+
+    def iniciar_renovacao_automatica(self):
+        """Renova o token em segundo plano antes de expirar, fora do caminho das requisições."""
+        if self._renovacao and self._renovacao.is_alive():
+            return
+
+        def _loop():
+            while True:
+                espera = self._expira_em - self._margem - time.time()
+                time.sleep(max(espera, 5))
+                try:
+                    with self._lock:
+                        if not self._valido(self._expira_em):
+                            self._renovar()
+                except Exception as e:
+                    logging.error(f"❌ Erro ao renovar token da Sankhya: {e}")
+
+        self._renovacao = threading.Thread(target=_loop, name="sankhya-token", daemon=True)
+        self._renovacao.start()
@@ -1,30 +1,103 @@
-import json
 import logging
+import os
 from datetime import datetime
-from typing import Dict
+from typing import Callable, Dict, Optional
 
 import requests
 
-from notifications.telegram import enviar_notificacao_telegram
+from observability.logs import LazyJson
+from notifications.dispatcher import FALHA_FATURAMENTO, NOTA_FATURADA, notificar
 from sankhya_api.auth import SankhyaClient
-from sankhya_api.fetch import snk_fetch_codend, snk_fetch_codbai, snk_fetch_codcid, snk_fetch_codigo_parceiro
+from sankhya_api.fetch import snk_execute_query, snk_fetch_codigo_parceiro, snk_fetch_codigos_parceiros, \
+    snk_resolver_endereco
+from sankhya_api.partner_index import normalizar_cpf, partner_index
 from sankhya_api.utils import limpar_telefone, limpar_cep
 
+# Quantidade máxima de registros por DatasetSP.save nas gravações em lote
+TAMANHO_LOTE_SAVE = int(os.getenv("SNK_TAMANHO_LOTE_SAVE", "50"))
+# Quantidade máxima de pedidos por chamada de SelecaoDocumentoSP.faturar
+TAMANHO_LOTE_FATURAMENTO = int(os.getenv("SNK_TAMANHO_LOTE_FATURAMENTO", "20"))
+
+
+# ------------------------------------------------------------------------------
+# 🧱 Campos e valores dos registros de parceiro
+# ------------------------------------------------------------------------------
+
+CAMPOS_PARCEIRO = [
+    # dados basicos
+    "CODPARC",
+    "NOMEPARC",
+    "RAZAOSOCIAL",
+    "TELEFONE",
+    "TIPPESSOA",
+    "CLIENTE",
+    # dados de entrega
+    "CEP",
+    "COMPLEMENTO",
+    "NUMEND",
+    "CODEND",
+    "CODBAI",
+    "CODCID",
+    # fiscal
+    "CSTIPIENT",
+    "CSTIPISAI",
+    "CLASSIFICMS"
+]
+
+CAMPOS_COMPLEMENTO = [
+    "CODPARC",
+    "CODENDENTREGA",
+    "NUMENTREGA",
+    "COMPLENTREGA",
+    "CODBAIENTREGA",
+    "CODCIDENTREGA",
+    "CEPENTREGA",
+    "LOGISTICA"
+]
+
+
+def _valores_parceiro(vtex_dict: dict, endereco: dict) -> dict:
+    return {
+        # dados basicos
+        "1": vtex_dict['NOMEPARC'],
+        "2": vtex_dict['NOMEPARC'],
+        "3": limpar_telefone(vtex_dict['TELEFONE']),
+        "4": "F",
+        "5": "S",
+        # dados de entrega
+        "6": limpar_cep(vtex_dict['CEP']),
+        "7": vtex_dict['COMPLEMENTO'],
+        "8": vtex_dict['NUMEND'],
+        "9": endereco['CODEND'],
+        "10": endereco['CODBAI'],
+        "11": endereco['CODCID'],
+        # fiscal
+        "12": 49,
+        "13": 99,
+        "14": "C"
+    }
+
+
+def _valores_complemento(vtex_dict: dict, endereco: dict) -> dict:
+    return {
+        "1": endereco['CODEND'],
+        "2": vtex_dict['NUMEND'],
+        "3": vtex_dict['COMPLEMENTO'],
+        "4": endereco['CODBAI'],
+        "5": endereco['CODCID'],
+        "6": limpar_cep(vtex_dict['CEP']),
+        "7": vtex_dict['COMPLEMENTO']
+    }
+
 
 # ------------------------------------------------------------------------------
 # 📝 Atualização de dados básicos do parceiro
 # ------------------------------------------------------------------------------
 
-def snk_atualizar_dados_basicos_parceiro(codparc: str, vtex_dict, client: SankhyaClient) -> bool:
+def snk_atualizar_dados_basicos_parceiro(codparc: str, vtex_dict, client: SankhyaClient,
+                                         endereco: dict = None) -> bool:
     logging.info("🚀 Iniciando atualização de dados básicos")
-    nomeparc = vtex_dict['NOMEPARC']
-    telefone = vtex_dict['TELEFONE']
-    cep = vtex_dict['CEP']
-    complemento = vtex_dict['COMPLEMENTO']
-    numend = vtex_dict['NUMEND']
-    codend = snk_fetch_codend(vtex_dict['ENDERECO'], client)
-    codbai = snk_fetch_codbai(vtex_dict['BAIRRO'], client)
-    codcid = snk_fetch_codcid(vtex_dict['CIDADE'], client)
+    endereco = endereco or snk_resolver_endereco(vtex_dict, client)
 
     if not codparc:
         logging.error("O código do parceiro (codparc) é obrigatório.")
@@ -34,62 +107,22 @@ def snk_atualizar_dados_basicos_parceiro(codparc: str, vtex_dict, client: Sankhy
         "serviceName": "DatasetSP.save",
         "requestBody": {
             "entityName": "Parceiro",
-            "fields": [
-                # dados basicos
-                "CODPARC",
-                "NOMEPARC",
-                "RAZAOSOCIAL",
-                "TELEFONE",
-                "TIPPESSOA",
-                "CLIENTE",
-                # dados de entrega
-                "CEP",
-                "COMPLEMENTO",
-                "NUMEND",
-                "CODEND",
-                "CODBAI",
-                "CODCID",
-                # fiscal
-                "CSTIPIENT",
-                "CSTIPISAI",
-                "CLASSIFICMS"
-
-            ],
+            "fields": CAMPOS_PARCEIRO,
             "records": [
                 {
                     "pk": {"CODPARC": codparc},
-                    "values": {
-                        # dados basicos
-                        "1": nomeparc,
-                        "2": nomeparc,
-                        "3": limpar_telefone(telefone),
-                        "4": "F",
-                        "5": "S",
-                        # dados de entrega
-                        "6": limpar_cep(cep),
-                        "7": complemento,
-                        "8": numend,
-                        "9": codend,
-                        "10": codbai,
-                        "11": codcid,
-                        # fiscal
-                        "12": 49,
-                        "13": 99,
-                        "14": "C"
-                    }
+                    "values": _valores_parceiro(vtex_dict, endereco)
                 }
             ]
         }
     }
 
-    logging.debug("📤 Payload dos dados básicos de cadastro enviado:")
-    logging.debug(json.dumps(payload, indent=2, ensure_ascii=False))
+    logging.debug("📤 Payload dos dados básicos de cadastro enviado:\n%s", LazyJson(payload))
 
     try:
         response = client.post(payload)
 
-        logging.debug("📥 Resposta da API:")
-        logging.debug(json.dumps(response, indent=2, ensure_ascii=False))
+        logging.debug("📥 Resposta da API:\n%s", LazyJson(response))
 
         status = response.get("status")
         status_message = response.get("statusMessage", "")
@@ -111,14 +144,10 @@ def snk_atualizar_dados_basicos_parceiro(codparc: str, vtex_dict, client: Sankhy
 # 📝 Atualização de dados de endereço de entrega
 # ------------------------------------------------------------------------------
 
-def snk_atualizar_dados_entrega_parceiro(codparc: str, vtex_dict, client: SankhyaClient) -> bool:
+def snk_atualizar_dados_entrega_parceiro(codparc: str, vtex_dict, client: SankhyaClient,
+                                         endereco: dict = None) -> bool:
     logging.info("🚀 Iniciando atualização do endereço de entrega")
-    cep = vtex_dict['CEP']
-    complemento = vtex_dict['COMPLEMENTO']
-    numend = vtex_dict['NUMEND']
-    codend = snk_fetch_codend(vtex_dict['ENDERECO'], client)
-    codbai = snk_fetch_codbai(vtex_dict['BAIRRO'], client)
-    codcid = snk_fetch_codcid(vtex_dict['CIDADE'], client)
+    endereco = endereco or snk_resolver_endereco(vtex_dict, client)
 
     if not codparc:
         logging.error("O código do parceiro (codparc) é obrigatório.")
@@ -128,43 +157,22 @@ def snk_atualizar_dados_entrega_parceiro(codparc: str, vtex_dict, client: Sankhy
         "serviceName": "DatasetSP.save",
         "requestBody": {
             "entityName": "ComplementoParc",
-            "fields": [
-                "CODPARC",
-                "CODENDENTREGA",
-                "NUMENTREGA",
-                "COMPLENTREGA",
-                "CODBAIENTREGA",
-                "CODCIDENTREGA",
-                "CEPENTREGA",
-                "LOGISTICA"
-
-            ],
+            "fields": CAMPOS_COMPLEMENTO,
             "records": [
                 {
                     "pk": {"CODPARC": codparc},
-                    "values": {
-                        # dados basicos
-                        "1": codend,
-                        "2": numend,
-                        "3": complemento,
-                        "4": codbai,
-                        "5": codcid,
-                        "6": limpar_cep(cep),
-                        "7": complemento
-                    }
+                    "values": _valores_complemento(vtex_dict, endereco)
                 }
             ]
         }
     }
 
-    logging.debug("📤 Payload do endereço de entrega enviado:")
-    logging.debug(json.dumps(payload, indent=2, ensure_ascii=False))
+    logging.debug("📤 Payload do endereço de entrega enviado:\n%s", LazyJson(payload))
 
     try:
         response = client.post(payload)
 
-        logging.debug("📥 Resposta da API:")
-        logging.debug(json.dumps(response, indent=2, ensure_ascii=False))
+        logging.debug("📥 Resposta da API:\n%s", LazyJson(response))
 
         status = response.get("status")
         status_message = response.get("statusMessage", "")
@@ -186,109 +194,65 @@ def snk_atualizar_dados_entrega_parceiro(codparc: str, vtex_dict, client: Sankhy
 # 📝 Inclusão de dados básicos do parceiro
 # ------------------------------------------------------------------------------
 
-def snk_incluir_dados_basicos_parceiro(cpf: str, vtex_dict, client: SankhyaClient) -> bool:
+def snk_incluir_dados_basicos_parceiro(cpf: str, vtex_dict, client: SankhyaClient,
+                                       endereco: dict = None) -> Optional[str]:
+    """
+    Inclui o parceiro e retorna o CODPARC gerado pela Sankhya, ou None em caso de falha.
+    """
     logging.info("🚀 Iniciando inclusão de dados básicos")
-    nomeparc = vtex_dict['NOMEPARC']
-    telefone = vtex_dict['TELEFONE']
-    cep = vtex_dict['CEP']
-    complemento = vtex_dict['COMPLEMENTO']
-    numend = vtex_dict['NUMEND']
-    codend = snk_fetch_codend(vtex_dict['ENDERECO'], client)
-    codbai = snk_fetch_codbai(vtex_dict['BAIRRO'], client)
-    codcid = snk_fetch_codcid(vtex_dict['CIDADE'], client)
+    endereco = endereco or snk_resolver_endereco(vtex_dict, client)
 
     payload = {
         "serviceName": "DatasetSP.save",
         "requestBody": {
             "entityName": "Parceiro",
-            "fields": [
-                # dados basicos
-                "CODPARC",
-                "NOMEPARC",
-                "RAZAOSOCIAL",
-                "TELEFONE",
-                "TIPPESSOA",
-                "CLIENTE",
-                # dados de entrega
-                "CEP",
-                "COMPLEMENTO",
-                "NUMEND",
-                "CODEND",
-                "CODBAI",
-                "CODCID",
-                # fiscal
-                "CSTIPIENT",
-                "CSTIPISAI",
-                "CLASSIFICMS",
-                "CGC_CPF"
-
-            ],
+            "fields": CAMPOS_PARCEIRO + ["CGC_CPF"],
             "records": [
                 {
-                    "values": {
-                        # dados basicos
-                        "1": nomeparc,
-                        "2": nomeparc,
-                        "3": limpar_telefone(telefone),
-                        "4": "F",
-                        "5": "S",
-                        # dados de entrega
-                        "6": limpar_cep(cep),
-                        "7": complemento,
-                        "8": numend,
-                        "9": codend,
-                        "10": codbai,
-                        "11": codcid,
-                        # fiscal
-                        "12": 49,
-                        "13": 99,
-                        "14": "C",
-                        "15": cpf
-                    }
+                    "values": {**_valores_parceiro(vtex_dict, endereco), "15": cpf}
                 }
             ]
         }
     }
 
-    logging.debug("📤 Payload dos dados básicos de cadastro enviado:")
-    logging.debug(json.dumps(payload, indent=2, ensure_ascii=False))
+    logging.debug("📤 Payload dos dados básicos de cadastro enviado:\n%s", LazyJson(payload))
 
     try:
         response = client.post(payload)
 
-        logging.debug("📥 Resposta da API:")
-        logging.debug(json.dumps(response, indent=2, ensure_ascii=False))
+        logging.debug("📥 Resposta da API:\n%s", LazyJson(response))
 
         status = response.get("status")
         status_message = response.get("statusMessage", "")
 
         if status == "0" or (status == "1" and not status_message):
             logging.info("✅ Inclusão dos dados básicos bem-sucedida.")
-            return True
+            # O save devolve os valores gravados na ordem de "fields"; CODPARC é o primeiro
+            resultado = response.get("responseBody", {}).get("result") or [[None]]
+            codparc = resultado[0][0] or snk_fetch_codigo_parceiro(cpf, client)
+            logging.debug(f"ℹ️ Codparc incluído: {codparc}")
+            partner_index.set(cpf, codparc)
+            return codparc
         else:
             logging.warning(
                 f"⚠️ API retornou status diferente de sucesso: {status} | Msg: {status_message or 'sem mensagem'}")
-            return False
+            return None
 
     except requests.RequestException as e:
         logging.error(f"❌ Erro na requisição: {e}")
-        return False
+        return None
 
 
 # ------------------------------------------------------------------------------
 # 📝 Atualização de dados de endereço de entrega
 # ------------------------------------------------------------------------------
 
-def snk_incluir_dados_entrega_parceiro(vtex_dict, client: SankhyaClient) -> bool:
+def snk_incluir_dados_entrega_parceiro(vtex_dict, client: SankhyaClient, codparc: str = None,
+                                       endereco: dict = None) -> bool:
     logging.info("🚀 Iniciando inclusão do endereço de entrega")
-    cep = vtex_dict['CEP']
-    complemento = vtex_dict['COMPLEMENTO']
-    numend = vtex_dict['NUMEND']
-    codend = snk_fetch_codend(vtex_dict['ENDERECO'], client)
-    codbai = snk_fetch_codbai(vtex_dict['BAIRRO'], client)
-    codcid = snk_fetch_codcid(vtex_dict['CIDADE'], client)
-    cpf = vtex_dict.get("CGC_CPF")
-    codparc = snk_fetch_codigo_parceiro(cpf, client)
+    endereco = endereco or snk_resolver_endereco(vtex_dict, client)
+    if not codparc:
+        codparc = snk_fetch_codigo_parceiro(vtex_dict.get("CGC_CPF"), client)
 
     if not codparc:
         logging.error("❌ O código do parceiro (codparc) é obrigatório.")
@@ -298,43 +262,22 @@ def snk_incluir_dados_entrega_parceiro(vtex_dict, client: SankhyaClient) -> bool
         "serviceName": "DatasetSP.save",
         "requestBody": {
             "entityName": "ComplementoParc",
-            "fields": [
-                "CODPARC",
-                "CODENDENTREGA",
-                "NUMENTREGA",
-                "COMPLENTREGA",
-                "CODBAIENTREGA",
-                "CODCIDENTREGA",
-                "CEPENTREGA",
-                "LOGISTICA"
-
-            ],
+            "fields": CAMPOS_COMPLEMENTO,
             "records": [
                 {
                     "pk": {"CODPARC": codparc},
-                    "values": {
-                        # dados basicos
-                        "1": codend,
-                        "2": numend,
-                        "3": complemento,
-                        "4": codbai,
-                        "5": codcid,
-                        "6": limpar_cep(cep),
-                        "7": complemento
-                    }
+                    "values": _valores_complemento(vtex_dict, endereco)
                 }
             ]
         }
     }
 
-    logging.debug("📤 Payload do endereço de entrega enviado:")
-    logging.debug(json.dumps(payload, indent=2, ensure_ascii=False))
+    logging.debug("📤 Payload do endereço de entrega enviado:\n%s", LazyJson(payload))
 
     try:
         response = client.post(payload)
 
-        logging.debug("📥 Resposta da API:")
-        logging.debug(json.dumps(response, indent=2, ensure_ascii=False))
+        logging.debug("📥 Resposta da API:\n%s", LazyJson(response))
 
         status = response.get("status")
         status_message = response.get("statusMessage", "")
@@ -352,6 +295,155 @@ def snk_incluir_dados_entrega_parceiro(vtex_dict, client: SankhyaClient) -> bool
         return False
 
 
+# ------------------------------------------------------------------------------
+# 📦 Gravação de parceiros em lote
+# ------------------------------------------------------------------------------
+
+def _snk_save_registros(entidade: str, campos: list, registros: list, client: SankhyaClient) -> Optional[list]:
+    """
+    Grava vários registros em um único DatasetSP.save. Retorna as linhas de
+    "result" alinhadas aos registros, ou None se a Sankhya recusar o save.
+    Erros de transporte são relançados: o save pode ter sido aplicado do outro lado.
+    """
+    payload = {
+        "serviceName": "DatasetSP.save",
+        "requestBody": {
+            "entityName": entidade,
+            "fields": campos,
+            "records": registros
+        }
+    }
+
+    logging.debug(f"📤 Payload de {entidade} em lote ({len(registros)} registros):\n%s", LazyJson(payload))
+
+    try:
+        response = client.post(payload)
+
+        logging.debug("📥 Resposta da API:\n%s", LazyJson(response))
+
+        status = response.get("status")
+        status_message = response.get("statusMessage", "")
+
+        if status == "0" or (status == "1" and not status_message):
+            resultado = response.get("responseBody", {}).get("result") or []
+            if len(resultado) != len(registros):
+                # Sem linhas alinhadas não há como saber os valores gravados de cada registro
+                return [[] for _ in registros]
+            return resultado
+        else:
+            logging.warning(
+                f"⚠️ API retornou status diferente de sucesso: {status} | Msg: {status_message or 'sem mensagem'}")
+            return None
+
+    except requests.RequestException as e:
+        logging.error(f"❌ Erro na requisição: {e}")
+        raise
+
+
+def _snk_save_em_lotes(entidade: str, campos: list, registros: list, client: SankhyaClient,
+                       tamanho_lote: int, reconciliar: Optional[Callable[[list], list]] = None) -> list:
+    """
+    Divide os registros em saves de até `tamanho_lote`. Se a Sankhya recusar um
+    lote (status de erro), seus registros são regravados um a um para isolar o
+    que causou o erro. Após erro de transporte o lote não é repetido: `reconciliar`
+    (quando informado) verifica o que já foi gravado e devolve as linhas do lote.
+    Retorna uma linha de resultado (ou None em caso de falha) por registro.
+    """
+    def _apos_erro_transporte(lote: list) -> list:
+        return reconciliar(lote) if reconciliar else [None] * len(lote)
+
+    resultados = []
+    for inicio in range(0, len(registros), tamanho_lote):
+        lote = registros[inicio:inicio + tamanho_lote]
+        try:
+            linhas = _snk_save_registros(entidade, campos, lote, client)
+        except requests.RequestException:
+            resultados.extend(_apos_erro_transporte(lote))
+            continue
+        if linhas is None and len(lote) > 1:
+            logging.warning(f"⚠️ Lote de {entidade} recusado, gravando {len(lote)} registros individualmente")
+            linhas = []
+            for registro in lote:
+                try:
+                    linhas.append((_snk_save_registros(entidade, campos, [registro], client) or [None])[0])
+                except requests.RequestException:
+                    linhas.extend(_apos_erro_transporte([registro]))
+        resultados.extend(linhas if linhas is not None else [None])
+    return resultados
+
+
+def snk_salvar_parceiros_lote(parceiros: list, client: SankhyaClient,
+                              tamanho_lote: int = TAMANHO_LOTE_SAVE) -> Dict[str, Optional[str]]:
+    """
+    Inclui/atualiza Parceiro e ComplementoParc de vários pedidos em saves com
+    múltiplos registros. Cada item de `parceiros` tem order_id, vtex_dict,
+    endereco e codparc (None quando o parceiro ainda não existe).
+    Retorna {order_id: codparc}, com None para os pedidos cujo parceiro falhou.
+    """
+    # Um registro por CPF, mesmo que o cliente tenha vários pedidos no lote
+    por_cpf = {}
+    for parceiro in parceiros:
+        por_cpf.setdefault(normalizar_cpf(parceiro['vtex_dict'].get('CGC_CPF')), parceiro)
+    por_cpf.pop("", None)
+    codparcs = {cpf: parceiro.get('codparc') for cpf, parceiro in por_cpf.items()}
+
+    inclusoes = [(cpf, parceiro) for cpf, parceiro in por_cpf.items() if not parceiro.get('codparc')]
+    atualizacoes = [(cpf, parceiro) for cpf, parceiro in por_cpf.items() if parceiro.get('codparc')]
+    logging.info(f"🚀 Gravando parceiros em lote: {len(inclusoes)} inclusões, {len(atualizacoes)} atualizações")
+
+    campos_inclusao = CAMPOS_PARCEIRO + ["CGC_CPF"]
+
+    def _reconciliar_inclusoes(lote: list) -> list:
+        """Após erro de transporte, inclui apenas os CPFs do lote que a Sankhya ainda não tem."""
+        cpfs = [registro["values"]["15"] for registro in lote]
+        try:
+            existentes = snk_fetch_codigos_parceiros(cpfs, client, levantar_erros=True)
+        except requests.RequestException as e:
+            logging.error(f"❌ Não foi possível verificar os parceiros de um lote interrompido: {e}")
+            return [None] * len(lote)
+        faltantes = [registro for registro, cpf in zip(lote, cpfs) if not existentes.get(cpf)]
+        logging.warning(f"⚠️ Lote de Parceiro interrompido: {len(lote) - len(faltantes)} já gravados, "
+                        f"incluindo {len(faltantes)} restantes")
+        linhas_faltantes = iter(_snk_save_em_lotes("Parceiro", campos_inclusao, faltantes, client, tamanho_lote))
+        return [[existentes[cpf]] if existentes.get(cpf) else next(linhas_faltantes) for cpf in cpfs]
+
+    registros = [{"values": {**_valores_parceiro(parceiro['vtex_dict'], parceiro['endereco']),
+                             "15": parceiro['vtex_dict']['CGC_CPF']}}
+                 for _, parceiro in inclusoes]
+    linhas = _snk_save_em_lotes("Parceiro", campos_inclusao, registros, client, tamanho_lote,
+                                reconciliar=_reconciliar_inclusoes)
+    for (cpf, parceiro), linha in zip(inclusoes, linhas):
+        codparc = None
+        if linha is not None:
+            # CODPARC é o primeiro campo do save
+            codparc = (linha[0] if linha else None) or snk_fetch_codigo_parceiro(cpf, client)
+            partner_index.set(cpf, codparc)
+        codparcs[cpf] = codparc
+
+    registros = [{"pk": {"CODPARC": parceiro['codparc']},
+                  "values": _valores_parceiro(parceiro['vtex_dict'], parceiro['endereco'])}
+                 for _, parceiro in atualizacoes]
+    linhas = _snk_save_em_lotes("Parceiro", CAMPOS_PARCEIRO, registros, client, tamanho_lote)
+    for (cpf, _), linha in zip(atualizacoes, linhas):
+        if linha is None:
+            codparcs[cpf] = None
+
+    gravados = [(cpf, parceiro) for cpf, parceiro in por_cpf.items() if codparcs[cpf]]
+    registros = [{"pk": {"CODPARC": codparcs[cpf]},
+                  "values": _valores_complemento(parceiro['vtex_dict'], parceiro['endereco'])}
+                 for cpf, parceiro in gravados]
+    linhas = _snk_save_em_lotes("ComplementoParc", CAMPOS_COMPLEMENTO, registros, client, tamanho_lote)
+    for (cpf, _), linha in zip(gravados, linhas):
+        if linha is None:
+            codparcs[cpf] = None
+
+    resultado = {parceiro['order_id']: codparcs.get(normalizar_cpf(parceiro['vtex_dict'].get('CGC_CPF')))
+                 for parceiro in parceiros}
+    sucessos = sum(1 for codparc in resultado.values() if codparc)
+    logging.info(f"✅ Parceiros gravados em lote: {sucessos}/{len(resultado)} pedidos")
+    return resultado
+
+
 def snk_confirmar_nota(nunota: str, client: SankhyaClient) -> Dict:
     logging.debug(f"🚀 Iniciando confirmação de nota fiscal {nunota}")
     payload = {
@@ -366,8 +458,7 @@ def snk_confirmar_nota(nunota: str, client: SankhyaClient) -> Dict:
     try:
         logging.info("🔎 Enviando confirmação de nota ao Sankhya…")
         resp = client.get(payload)  # GET com corpo JSON, como no curl
-        logging.debug("🔍 Resposta completa da API Sankhya:\n" +
-                      json.dumps(resp, indent=2, ensure_ascii=False))
+        logging.debug("🔍 Resposta completa da API Sankhya:\n%s", LazyJson(resp))
 
         status = resp.get("status")
         msg = resp.get("statusMessage", "")
@@ -384,10 +475,10 @@ def snk_confirmar_nota(nunota: str, client: SankhyaClient) -> Dict:
         return {"error": str(e)}
 
 
-def snk_faturar_nota(nunota: int, client: SankhyaClient):
+def _payload_faturamento(nunotas: list, uma_nota_para_cada: bool = False) -> dict:
     dt_faturamento = datetime.now().strftime("%d/%m/%Y")
 
-    payload = {
+    return {
         "serviceName": "SelecaoDocumentoSP.faturar",
         "requestBody": {
             "notas": {
@@ -396,10 +487,10 @@ def snk_faturar_nota(nunota: int, client: SankhyaClient):
                 "tipoFaturamento": "FaturamentoDireto",
                 "dataValidada": True,
                 "notasComMoeda": {},
-                "nota": [{"$": nunota}],
+                "nota": [{"$": nunota} for nunota in nunotas],
                 "codLocalDestino": "",
                 "faturarTodosItens": True,
-                "umaNotaParaCada": "false",
+                "umaNotaParaCada": "true" if uma_nota_para_cada else "false",
                 "ehWizardFaturamento": True,
                 "dtFixaVenc": "",
                 "ehPedidoWeb": False,
@@ -409,26 +500,131 @@ def snk_faturar_nota(nunota: int, client: SankhyaClient):
         }
     }
 
-    logging.debug("🚀 Payload de faturamento:\n" + json.dumps(payload, indent=2, ensure_ascii=False))
+
+def snk_faturar_nota(nunota: int, client: SankhyaClient):
+    payload = _payload_faturamento([nunota])
+
+    logging.debug("🚀 Payload de faturamento:\n%s", LazyJson(payload))
 
     try:
         logging.info(f"🔎 Faturando nota {nunota}…")
         resp = client.get(payload)
-        logging.debug("🔍 Resposta da API Sankhya:\n" +
-                      json.dumps(resp, indent=2, ensure_ascii=False))
+        logging.debug("🔍 Resposta da API Sankhya:\n%s", LazyJson(resp))
         nunota = resp["responseBody"]["notas"]["nota"]["$"]
         status = resp.get("status")
         msg = resp.get("statusMessage", "")
         if status == "0" or (status == "1" and not msg):
             logging.info(f"✅ Nota {nunota} faturada com sucesso.")
-            enviar_notificacao_telegram("✅ Nota {nunota} faturada com sucesso.")
+            notificar(nunota, categoria=NOTA_FATURADA)
 
         else:
             logging.error(f"❌ Falha ao faturar nota {nunota}: status={status} | msg={msg or 'sem mensagem'}")
-            enviar_notificacao_telegram(f"❌ Falha ao faturar nota {nunota}: status={status} | msg={msg or 'sem mensagem'}")
+            notificar(f"{nunota} (status={status} | msg={msg or 'sem mensagem'})", categoria=FALHA_FATURAMENTO)
 
         return nunota
 
     except Exception as e:
         logging.error(f"🚨 Erro ao faturar nota {nunota}: {e}")
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+
+# ------------------------------------------------------------------------------
+# 🧾 Faturamento de vários pedidos por chamada
+# ------------------------------------------------------------------------------
+
+def _notas_faturadas(resp: dict) -> list:
+    notas = resp.get("responseBody", {}).get("notas", {}).get("nota") or []
+    return notas if isinstance(notas, list) else [notas]
+
+
+def _snk_mapear_faturamento(pedidos: list, client: SankhyaClient) -> Dict[str, str]:
+    """Busca em TGFVAR a nota gerada a partir de cada pedido já faturado."""
+    lista = ", ".join(str(int(pedido)) for pedido in pedidos)
+    rows = snk_execute_query(
+        f"SELECT DISTINCT VAR.NUNOTAORIG, VAR.NUNOTA FROM TGFVAR VAR WHERE VAR.NUNOTAORIG IN ({lista})",
+        client
+    )
+    return {str(origem): str(nota) for origem, nota in rows}
+
+
+def snk_fetch_notas_faturadas(pedidos: list, client: SankhyaClient,
+                              tamanho_lote: int = TAMANHO_LOTE_FATURAMENTO) -> Dict[str, str]:
+    """
+    Notas já geradas a partir dos pedidos (TGFVAR), para não faturá-los de novo ao
+    retomar. Retorna {pedido: nota} apenas para os pedidos já faturados.
+    """
+    notas = {}
+    for inicio in range(0, len(pedidos), tamanho_lote):
+        notas.update(_snk_mapear_faturamento(pedidos[inicio:inicio + tamanho_lote], client))
+    return notas
+
+
+def snk_fetch_nota_faturada(pedido, client: SankhyaClient) -> Optional[str]:
+    """Nota já gerada a partir do pedido (TGFVAR), para não faturá-lo de novo ao retomar."""
+    return snk_fetch_notas_faturadas([pedido], client).get(str(int(pedido)))
+
+
+def _snk_faturar_lote(pedidos: list, client: SankhyaClient) -> Dict[str, Optional[str]]:
+    payload = _payload_faturamento(pedidos, uma_nota_para_cada=True)
+    logging.debug("🚀 Payload de faturamento em lote:\n%s", LazyJson(payload))
+
+    try:
+        logging.info(f"🔎 Faturando {len(pedidos)} pedidos: {', '.join(map(str, pedidos))}")
+        resp = client.get(payload)
+        logging.debug("🔍 Resposta da API Sankhya:\n%s", LazyJson(resp))
+        status = resp.get("status")
+        msg = resp.get("statusMessage", "")
+        sucesso = status == "0" or (status == "1" and not msg)
+        if not sucesso:
+            logging.error(f"❌ Falha ao faturar lote: status={status} | msg={msg or 'sem mensagem'}")
+    except Exception as e:
+        logging.error(f"🚨 Erro ao faturar lote: {e}")
+        resp, sucesso = {}, False
+
+    notas = _notas_faturadas(resp)
+    if sucesso and len(pedidos) == 1 and len(notas) == 1:
+        return {str(pedidos[0]): notas[0]["$"]}
+    if sucesso and notas and all("NUNOTAORIG" in nota for nota in notas):
+        mapa = {str(nota["NUNOTAORIG"]): nota["$"] for nota in notas}
+    else:
+        # A resposta não informa a origem de cada nota (ou o lote falhou no meio):
+        # a ligação pedido → nota é lida da tabela de variações
+        mapa = _snk_mapear_faturamento(pedidos, client)
+    return {str(pedido): mapa.get(str(pedido)) for pedido in pedidos}
+
+
+def snk_faturar_notas(pedidos: list, client: SankhyaClient,
+                      tamanho_lote: int = TAMANHO_LOTE_FATURAMENTO) -> Dict[str, Optional[str]]:
+    """
+    Fatura vários pedidos (NUNOTA) com SelecaoDocumentoSP.faturar e umaNotaParaCada,
+    em lotes de até `tamanho_lote`. Pedidos de um lote que falhou e não chegaram a
+    ser faturados são refaturados individualmente.
+    Retorna {pedido: nota}, com None para os pedidos que não foram faturados.
+    """
+    resultado = {}
+    for inicio in range(0, len(pedidos), tamanho_lote):
+        lote = pedidos[inicio:inicio + tamanho_lote]
+        try:
+            notas = _snk_faturar_lote(lote, client)
+        except Exception as e:
+            # Sem saber o que foi faturado, não é seguro refaturar: os pedidos ficam para conferência
+            logging.error(f"🚨 Não foi possível confirmar o faturamento dos pedidos {lote}: {e}")
+            resultado.update({str(pedido): None for pedido in lote})
+            continue
+        pendentes = [pedido for pedido in lote if not notas.get(str(pedido))]
+        if pendentes and len(lote) > 1:
+            logging.warning(f"⚠️ {len(pendentes)} pedidos do lote não faturados, tentando individualmente")
+            for pedido in pendentes:
+                try:
+                    notas.update(_snk_faturar_lote([pedido], client))
+                except Exception as e:
+                    logging.error(f"🚨 Não foi possível confirmar o faturamento do pedido {pedido}: {e}")
+        resultado.update(notas)
+
+    faturadas = [nota for nota in resultado.values() if nota]
+    falhas = [pedido for pedido, nota in resultado.items() if not nota]
+    for nota in faturadas:
+        notificar(nota, categoria=NOTA_FATURADA)
+    for pedido in falhas:
+        notificar(f"pedido {pedido}", categoria=FALHA_FATURAMENTO)
+    return resultado
@@ -1,10 +1,7 @@
 import logging
-import unicodedata
+from typing import Iterable
 
-
-def remover_acentos(texto: str) -> str:
-    nfkd = unicodedata.normalize('NFKD', texto)
-    return ''.join(c for c in nfkd if not unicodedata.combining(c))
+from sankhya_api.normalize import ABREVIACOES, abreviacoes_de, normalizar_logradouro
 
 
 def limpar_telefone(telefone: str) -> str:
@@ -21,45 +18,25 @@ def limpar_cep(cep: str) -> str:
     return cep.replace('-', '') if cep else ''
 
 
-def buscar_abreviacoes(nome_completo: str, dicionario: dict) -> list[str]:
-    return [abreviacao for abreviacao, nome in dicionario.items() if nome.upper() == nome_completo.upper()]
-
-
-def extrair_prefixo_sufixo_logradouro(logradouro: str) -> list[str]:
+def lista_sql(valores: Iterable) -> str:
     """
-    Divide um logradouro em prefixo e nome. Ex:
-    'Travessa Campos Sales' → ['Travessa', 'Campos Sales']
+    Monta a lista de um critério IN (...) com os valores entre aspas simples.
+    Ex: ['123', "D'Ávila"] → "'123', 'D''Ávila'"
     """
-    if not logradouro:
-        return ["", ""]
-
-    prefixos = [
-        "Rua", "R", "R.", "Avenida", "Av", "Av.", "Travessa", "Trav", "Trav.", "Alameda", "Al", "Al.",
-        "Praça", "Pç", "Pç.", "Rodovia", "Estrada", "Via", "Viela", "Vila", "Largo", "Passeio", "Beco",
-        "Caminho", "Servidão", "Boulevard", "Blvd", "Marginal", "Esplanada", "Balneário", "Colônia",
-        "Conjunto", "Distrito", "Estação", "Favela", "Feira", "Jardim", "Jd", "Jd.", "Ladeira",
-        "Loteamento", "Morro", "Núcleo", "Parque", "Passagem", "Passarela", "Ponte", "Porto", "Projeção",
-        "Quadra", "Ramal", "Recanto", "Residencial", "Setor", "Sítio", "Trav", "Trecho", "Trevo", "Vale",
-        "Vereda", "Vila", "Zona", "Complexo", "Condomínio", "Área", "Anel Rodoviário", "Desvio", "Contorno",
-        "Reta", "Rodoanel", "Terminal", "Estradinha", "Alto", "Aclive", "Declive", "Encosta", "Vinculo",
-        "Fazenda", "Outeiro"
-    ]
+    return ", ".join("'{}'".format(str(valor).replace("'", "''")) for valor in valores)
 
-    partes = logradouro.strip().split()
-    if not partes:
-        return ["", ""]
 
-    primeira = partes[0].capitalize()
+def buscar_abreviacoes(nome_completo: str, dicionario: dict = ABREVIACOES) -> list[str]:
+    if dicionario is ABREVIACOES:
+        return list(abreviacoes_de(nome_completo))
+    return [abreviacao for abreviacao, nome in dicionario.items() if nome.upper() == nome_completo.upper()]
 
-    if primeira in prefixos:
-        prefixo = primeira.upper()
-        sufixo_acentuado = " ".join(partes[1:]).strip().upper()
-        sufixo = remover_acentos(sufixo_acentuado)
-    else:
-        prefixo = ""
-        sufixo_acentuado = logradouro.strip().upper()
-        sufixo = remover_acentos(sufixo_acentuado)
 
+def extrair_prefixo_sufixo_logradouro(logradouro: str) -> list[str]:
+    """
+    Divide um logradouro em tipo (por extenso) e nome, via sankhya_api.normalize. Ex:
+    'Travessa Campos Sales' → ['TRAVESSA', 'CAMPOS SALES']; 'Av. Nazaré' → ['AVENIDA', 'NAZARE']
+    """
+    prefixo, sufixo = normalizar_logradouro(logradouro or "")
     logging.debug(f"ℹ️ Prefixo: {prefixo}, Sufixo: {sufixo}")
-
     return [prefixo, sufixo]
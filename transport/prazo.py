@@ -0,0 +1,59 @@
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import requests
+
+# Tempo máximo de um pedido inteiro, incluindo esperas de retry e do limite de taxa
+# (a espera pela aprovação de um operador não conta)
+PEDIDO_PRAZO_SEGUNDOS = float(os.getenv("PEDIDO_PRAZO_SEGUNDOS", "300"))
+
+
+class PrazoEsgotado(requests.RequestException):
+    """O prazo do pedido acabou antes de a requisição ser concluída."""
+
+
+# ------------------------------------------------------------------------------
+# ⏳ Prazo por pedido
+# ------------------------------------------------------------------------------
+_prazo: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("prazo_pedido", default=None)
+
+
+@contextmanager
+def prazo_pedido(segundos: float = PEDIDO_PRAZO_SEGUNDOS):
+    """Limita o tempo total das chamadas HTTP feitas dentro do bloco (0 = sem prazo)."""
+    if not segundos or segundos <= 0:
+        yield
+        return
+    limite = time.monotonic() + segundos
+    atual = _prazo.get()
+    token = _prazo.set(limite if atual is None else min(atual, limite))
+    try:
+        yield
+    finally:
+        _prazo.reset(token)
+
+
+def tempo_restante() -> Optional[float]:
+    limite = _prazo.get()
+    if limite is None:
+        return None
+    return limite - time.monotonic()
+
+
+@contextmanager
+def prazo_suspenso():
+    """Pausa o prazo do pedido durante o bloco (ex.: resposta de um operador); o tempo parado não conta."""
+    limite = _prazo.get()
+    if limite is None:
+        yield
+        return
+    inicio = time.monotonic()
+    token = _prazo.set(None)
+    try:
+        yield
+    finally:
+        _prazo.reset(token)
+        _prazo.set(limite + time.monotonic() - inicio)
@@ -0,0 +1,166 @@
+import logging
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from transport.prazo import PrazoEsgotado, tempo_restante
+
+# Requisições por segundo permitidas por upstream (0 = sem limite)
+RATE_LIMIT_SANKHYA_MGE = float(os.getenv("RATE_LIMIT_SANKHYA_MGE", "10"))
+RATE_LIMIT_SANKHYA_MGECOM = float(os.getenv("RATE_LIMIT_SANKHYA_MGECOM", "5"))
+RATE_LIMIT_VTEX_OMS = float(os.getenv("RATE_LIMIT_VTEX_OMS", "20"))
+RATE_LIMIT_TELEGRAM = float(os.getenv("RATE_LIMIT_TELEGRAM", "1"))
+# Fração da taxa mantida após um 429/503 e piso relativo à taxa configurada
+RATE_LIMIT_FATOR_REDUCAO = float(os.getenv("RATE_LIMIT_FATOR_REDUCAO", "0.5"))
+RATE_LIMIT_PISO = float(os.getenv("RATE_LIMIT_PISO", "0.1"))
+# Segundos sem throttling para a taxa voltar ao valor configurado
+RATE_LIMIT_RECUPERACAO = float(os.getenv("RATE_LIMIT_RECUPERACAO", "30"))
+
+SANKHYA_MGE = "sankhya_mge"
+SANKHYA_MGECOM = "sankhya_mgecom"
+VTEX_OMS = "vtex_oms"
+TELEGRAM = "telegram"
+
+LIMITES = {
+    SANKHYA_MGE: RATE_LIMIT_SANKHYA_MGE,
+    SANKHYA_MGECOM: RATE_LIMIT_SANKHYA_MGECOM,
+    VTEX_OMS: RATE_LIMIT_VTEX_OMS,
+    TELEGRAM: RATE_LIMIT_TELEGRAM,
+}
+
+STATUS_THROTTLING = (429, 503)
+
+
+def chave_upstream(url: str) -> str:
+    """Agrupa a URL no upstream que compartilha o mesmo limite de taxa."""
+    partes = urlsplit(url)
+    host = partes.hostname or ""
+    if "telegram" in host or partes.path.startswith("/bot"):
+        return TELEGRAM
+    if "vtex" in host or partes.path.startswith("/api/oms/"):
+        return VTEX_OMS
+    if "/mgecom/" in partes.path:
+        return SANKHYA_MGECOM
+    if "sankhya" in host or "/mge/" in partes.path or partes.path == "/login":
+        return SANKHYA_MGE
+    return host
+
+
+def segundos_retry_after(response: requests.Response) -> Optional[float]:
+    valor = response.headers.get("Retry-After")
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# ------------------------------------------------------------------------------
+# 🪣 Token bucket adaptativo
+# ------------------------------------------------------------------------------
+class AdaptiveTokenBucket:
+    """Token bucket que reduz a taxa ao receber 429/503 e volta gradualmente ao configurado."""
+
+    def __init__(self, nome: str, taxa: float, capacidade: Optional[float] = None):
+        self.nome = nome
+        self.taxa_maxima = taxa
+        self.taxa = taxa
+        self.capacidade = capacidade or max(1.0, taxa)
+        self._tokens = self.capacidade
+        self._atualizado = time.monotonic()
+        self._bloqueado_ate = 0.0
+        self._ultima_reducao = float("-inf")
+        self._lock = threading.Lock()
+
+    def _repor(self, agora: float):
+        decorrido = agora - self._atualizado
+        self._atualizado = agora
+        self._tokens = min(self.capacidade, self._tokens + decorrido * self.taxa)
+        # Recuperação aditiva: chega à taxa configurada após RATE_LIMIT_RECUPERACAO sem throttling
+        if self.taxa < self.taxa_maxima and RATE_LIMIT_RECUPERACAO > 0:
+            self.taxa = min(self.taxa_maxima, self.taxa + decorrido * self.taxa_maxima / RATE_LIMIT_RECUPERACAO)
+
+    def adquirir(self):
+        """Espera um token; lança PrazoEsgotado se o prazo do pedido acabar antes."""
+        while True:
+            restante = tempo_restante()
+            if restante is not None and restante <= 0:
+                raise PrazoEsgotado(f"Prazo do pedido esgotado aguardando o limite de taxa de {self.nome}")
+            with self._lock:
+                agora = time.monotonic()
+                self._repor(agora)
+                if agora < self._bloqueado_ate:
+                    espera = self._bloqueado_ate - agora
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    espera = (1 - self._tokens) / self.taxa
+            # Nunca dorme além do prazo: a próxima volta lança PrazoEsgotado se ele acabou
+            time.sleep(espera if restante is None else min(espera, restante))
+
+    def penalizar(self, retry_after: Optional[float] = None):
+        with self._lock:
+            agora = time.monotonic()
+            self._repor(agora)
+            if retry_after:
+                self._bloqueado_ate = max(self._bloqueado_ate, agora + retry_after)
+            # Respostas da mesma rajada (requisições já em voo) contam como um único sinal
+            if agora - self._ultima_reducao < max(retry_after or 0.0, 1.0):
+                return
+            self._ultima_reducao = agora
+            self.taxa = max(self.taxa_maxima * RATE_LIMIT_PISO, self.taxa * RATE_LIMIT_FATOR_REDUCAO)
+            self._tokens = min(self._tokens, 0.0)
+        logging.warning(
+            f"🐢 {self.nome} sinalizou limite de taxa; reduzindo para {self.taxa:.2f} req/s"
+            + (f" e pausando {retry_after:.1f}s" if retry_after else "")
+        )
+
+
+# ------------------------------------------------------------------------------
+# 🚦 Limitador por upstream compartilhado entre os workers
+# ------------------------------------------------------------------------------
+class RateLimiter:
+    def __init__(self, limites=None):
+        self.limites = dict(LIMITES if limites is None else limites)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, url: str) -> Optional[AdaptiveTokenBucket]:
+        chave = chave_upstream(url)
+        taxa = self.limites.get(chave, 0)
+        if taxa <= 0:
+            return None
+        bucket = self._buckets.get(chave)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.setdefault(chave, AdaptiveTokenBucket(chave, taxa))
+        return bucket
+
+    def adquirir(self, url: str):
+        bucket = self._bucket(url)
+        if bucket:
+            bucket.adquirir()
+
+    def registrar_resposta(self, url: str, response: requests.Response):
+        if response.status_code not in STATUS_THROTTLING:
+            return
+        bucket = self._bucket(url)
+        if bucket:
+            bucket.penalizar(segundos_retry_after(response))
+
+    def taxas(self) -> dict:
+        return {chave: round(bucket.taxa, 2) for chave, bucket in self._buckets.items()}
+
+
+rate_limiter = RateLimiter()
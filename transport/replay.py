@@ -0,0 +1,252 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from transport.ratelimit import TELEGRAM, chave_upstream
+
+# gravar = envia normalmente e guarda cada troca; reproduzir = responde do cassete, sem rede
+HTTP_CASSETTE_MODO = os.getenv("HTTP_CASSETTE_MODO", "")
+HTTP_CASSETTE = os.getenv("HTTP_CASSETTE", "")
+# zero = respostas imediatas (perfil de CPU); gravados = espera a duração original de cada chamada
+HTTP_CASSETTE_TEMPOS = os.getenv("HTTP_CASSETTE_TEMPOS", "zero")
+
+MODO_GRAVAR = "gravar"
+MODO_REPRODUZIR = "reproduzir"
+TEMPOS_ZERO = "zero"
+TEMPOS_GRAVADOS = "gravados"
+
+VERSAO_CASSETE = 1
+OCULTO = "***"
+
+HEADERS_SENSIVEIS = ("token", "appkey", "username", "password", "authorization", "cookie", "set-cookie",
+                     "x-vtex-api-appkey", "x-vtex-api-apptoken")
+CAMPOS_SENSIVEIS = ("bearerToken", "access_token", "refresh_token")
+# Upstreams cujo corpo não entra na chave (o texto das notificações varia com o horário do lote)
+UPSTREAMS_SEM_CORPO = (TELEGRAM,)
+
+_BOT_TOKEN = re.compile(r"/bot[^/]+/")
+_DATA = re.compile(r"\b\d{2}/\d{2}/\d{4}\b")
+
+
+class InteracaoNaoGravada(requests.RequestException):
+    """A requisição não existe no cassete em reprodução."""
+
+
+# ------------------------------------------------------------------------------
+# 🧽 Remoção de credenciais e chave de busca das interações
+# ------------------------------------------------------------------------------
+def _ocultar_url(url: str) -> str:
+    return _BOT_TOKEN.sub(f"/bot{OCULTO}/", url)
+
+
+def _ocultar_headers(headers) -> dict:
+    return {nome: OCULTO if nome.lower() in HEADERS_SENSIVEIS else valor for nome, valor in (headers or {}).items()}
+
+
+def _ocultar_campos(obj):
+    if isinstance(obj, dict):
+        return {chave: OCULTO if chave in CAMPOS_SENSIVEIS else _ocultar_campos(valor) for chave, valor in obj.items()}
+    if isinstance(obj, list):
+        return [_ocultar_campos(item) for item in obj]
+    return obj
+
+
+def _texto(corpo) -> str:
+    if corpo is None:
+        return ""
+    if isinstance(corpo, bytes):
+        return corpo.decode("utf-8", errors="replace")
+    return corpo
+
+
+def _ocultar_corpo(texto: str) -> str:
+    try:
+        return json.dumps(_ocultar_campos(json.loads(texto)), ensure_ascii=False)
+    except ValueError:
+        return texto
+
+
+def _corpo_normalizado(texto: str) -> str:
+    """JSON em ordem canônica e datas trocadas por um marcador (DTNEG, DTFATUR...)."""
+    try:
+        texto = json.dumps(json.loads(texto), sort_keys=True, ensure_ascii=False)
+    except ValueError:
+        pass
+    return _DATA.sub("<data>", texto)
+
+
+def chave_interacao(method: str, url: str, corpo) -> str:
+    """
+    Identifica a requisição sem depender do host (o cassete pode ser reproduzido
+    contra outra conta/base URL) nem de credenciais e datas do dia.
+    """
+    partes = urlsplit(_ocultar_url(url))
+    alvo = partes.path + (f"?{partes.query}" if partes.query else "")
+    texto = "" if chave_upstream(url) in UPSTREAMS_SEM_CORPO else _corpo_normalizado(_texto(corpo))
+    resumo = hashlib.sha1(texto.encode("utf-8")).hexdigest()[:16]
+    return f"{method.upper()} {alvo} {resumo}"
+
+
+# ------------------------------------------------------------------------------
+# 📼 Cassete: gravação e reprodução das trocas HTTP
+# ------------------------------------------------------------------------------
+class Cassete:
+    """
+    Arquivo JSON com as trocas HTTP de uma execução. Na reprodução, requisições
+    com a mesma chave são respondidas na ordem em que foram gravadas; esgotadas,
+    a última resposta daquela chave é repetida. Erros de rede não são gravados.
+    """
+
+    def __init__(self, caminho: str, modo: str, tempos: str = TEMPOS_ZERO):
+        if modo not in (MODO_GRAVAR, MODO_REPRODUZIR):
+            raise ValueError(f"Modo de cassete inválido: {modo!r} (use {MODO_GRAVAR} ou {MODO_REPRODUZIR})")
+        self.caminho = caminho
+        self.modo = modo
+        self.tempos = tempos
+        self._interacoes = []
+        self._pendentes = {}
+        self._ultimas = {}
+        self._reproduzidas = 0
+        self._nao_encontradas = 0
+        self._alterado = False
+        self._lock = threading.Lock()
+        if modo == MODO_REPRODUZIR:
+            self._carregar()
+
+    @property
+    def gravando(self) -> bool:
+        return self.modo == MODO_GRAVAR
+
+    @property
+    def reproduzindo(self) -> bool:
+        return self.modo == MODO_REPRODUZIR
+
+    def _carregar(self):
+        with open(self.caminho, encoding="utf-8") as f:
+            dados = json.load(f)
+        self._interacoes = dados.get("interacoes", [])
+        for interacao in self._interacoes:
+            self._pendentes.setdefault(interacao["chave"], deque()).append(interacao)
+        logging.info(f"📼 Cassete {self.caminho} carregado: {len(self._interacoes)} interações "
+                     f"(tempos: {self.tempos})")
+
+    def gravar(self, response: requests.Response, duracao: float):
+        requisicao = response.request
+        corpo = _texto(requisicao.body)
+        interacao = {
+            "chave": chave_interacao(requisicao.method, requisicao.url, corpo),
+            "upstream": chave_upstream(requisicao.url),
+            "duracao": round(duracao, 6),
+            "requisicao": {
+                "method": requisicao.method,
+                "url": _ocultar_url(requisicao.url),
+                "headers": _ocultar_headers(requisicao.headers),
+                "corpo": _ocultar_corpo(corpo),
+            },
+            "resposta": {
+                "status": response.status_code,
+                "reason": response.reason,
+                "headers": _ocultar_headers(response.headers),
+                "corpo": _ocultar_corpo(response.text),
+            },
+        }
+        with self._lock:
+            self._interacoes.append(interacao)
+            self._alterado = True
+
+    def reproduzir(self, method: str, url: str, **kwargs) -> requests.Response:
+        preparada = requests.Request(method, url, headers=kwargs.get("headers"), json=kwargs.get("json"),
+                                     data=kwargs.get("data"), params=kwargs.get("params")).prepare()
+        chave = chave_interacao(method, preparada.url, preparada.body)
+        with self._lock:
+            fila = self._pendentes.get(chave)
+            if fila:
+                interacao = self._ultimas[chave] = fila.popleft()
+            else:
+                interacao = self._ultimas.get(chave)
+            if interacao is None:
+                self._nao_encontradas += 1
+            else:
+                self._reproduzidas += 1
+        if interacao is None:
+            logging.error(f"📼 Requisição fora do cassete: {chave}")
+            raise InteracaoNaoGravada(f"Requisição não gravada no cassete {self.caminho}: {chave}")
+
+        if self.tempos == TEMPOS_GRAVADOS:
+            time.sleep(interacao["duracao"])
+        return self._resposta(interacao, preparada)
+
+    @staticmethod
+    def _resposta(interacao: dict, preparada: requests.PreparedRequest) -> requests.Response:
+        gravada = interacao["resposta"]
+        response = requests.Response()
+        response.status_code = gravada["status"]
+        response.reason = gravada.get("reason")
+        response.headers = CaseInsensitiveDict(gravada.get("headers") or {})
+        response._content = gravada["corpo"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = preparada.url
+        response.request = preparada
+        response.elapsed = timedelta(seconds=interacao["duracao"])
+        return response
+
+    def salvar(self):
+        """Grava o cassete de forma atômica (só no modo gravar e se houver novas interações)."""
+        with self._lock:
+            if not self.gravando or not self._alterado:
+                return
+            dados = {"versao": VERSAO_CASSETE, "interacoes": list(self._interacoes)}
+            self._alterado = False
+        temporario = f"{self.caminho}.{os.getpid()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(dados, f, ensure_ascii=False, indent=1)
+        os.replace(temporario, self.caminho)
+        logging.info(f"📼 Cassete gravado em {self.caminho}: {len(dados['interacoes'])} interações")
+
+    def resumo(self) -> dict:
+        with self._lock:
+            if self.gravando:
+                return {"modo": self.modo, "gravadas": len(self._interacoes)}
+            return {
+                "modo": self.modo,
+                "reproduzidas": self._reproduzidas,
+                "nao_encontradas": self._nao_encontradas,
+                "nao_usadas": sum(len(fila) for fila in self._pendentes.values()),
+            }
+
+
+cassete: Optional[Cassete] = None
+
+
+def ativar_cassete(caminho: str, modo: str, tempos: str = TEMPOS_ZERO) -> Cassete:
+    """Liga a gravação/reprodução para todas as chamadas feitas por transport.session."""
+    global cassete
+    if not caminho:
+        raise ValueError("Informe o arquivo do cassete (HTTP_CASSETTE)")
+    cassete = Cassete(caminho, modo, tempos)
+    if cassete.gravando:
+        atexit.register(cassete.salvar)
+    return cassete
+
+
+def desativar_cassete():
+    global cassete
+    if cassete is not None:
+        cassete.salvar()
+        cassete = None
+
+
+if HTTP_CASSETTE_MODO:
+    ativar_cassete(HTTP_CASSETTE, HTTP_CASSETTE_MODO, HTTP_CASSETTE_TEMPOS)
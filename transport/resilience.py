@@ -0,0 +1,174 @@
+import logging
+import os
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+import requests
+
+from observability.metrics import http_circuito_aberto, http_retries
+from transport.prazo import PrazoEsgotado, tempo_restante
+from transport.ratelimit import chave_upstream, segundos_retry_after
+
+RETRY_MAX_TENTATIVAS = int(os.getenv("RETRY_MAX_TENTATIVAS", "4"))
+RETRY_BACKOFF_BASE = float(os.getenv("RETRY_BACKOFF_BASE", "0.5"))
+RETRY_BACKOFF_MAX = float(os.getenv("RETRY_BACKOFF_MAX", "20"))
+# Falhas consecutivas (conexão, timeout, 5xx) que abrem o circuito do upstream
+CIRCUIT_LIMIAR_FALHAS = int(os.getenv("CIRCUIT_LIMIAR_FALHAS", "5"))
+# Segundos com o circuito aberto antes de deixar passar uma requisição de teste
+CIRCUIT_TEMPO_ABERTO = float(os.getenv("CIRCUIT_TEMPO_ABERTO", "30"))
+
+METODOS_IDEMPOTENTES = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+class CircuitoAberto(requests.RequestException):
+    """O upstream está indisponível; a requisição nem foi enviada."""
+
+
+# ------------------------------------------------------------------------------
+# ⏳ Prazo por pedido (transport.prazo)
+# ------------------------------------------------------------------------------
+def _timeout_com_prazo(timeout, restante: Optional[float]):
+    if restante is None:
+        return timeout
+    if isinstance(timeout, tuple):
+        return tuple(min(t, restante) for t in timeout)
+    return min(timeout, restante) if timeout else restante
+
+
+# ------------------------------------------------------------------------------
+# 🔌 Circuit breaker por upstream
+# ------------------------------------------------------------------------------
+class CircuitBreaker:
+    def __init__(self, nome: str, limiar: int = CIRCUIT_LIMIAR_FALHAS, tempo_aberto: float = CIRCUIT_TEMPO_ABERTO):
+        self.nome = nome
+        self.limiar = limiar
+        self.tempo_aberto = tempo_aberto
+        self._falhas = 0
+        self._aberto_ate = None
+        self._teste_em_andamento = False
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        with self._lock:
+            if self._aberto_ate is None:
+                return
+            if time.monotonic() < self._aberto_ate or self._teste_em_andamento:
+                raise CircuitoAberto(f"Circuito de {self.nome} aberto; upstream indisponível")
+            # Meio-aberto: deixa uma única requisição testar o upstream
+            self._teste_em_andamento = True
+
+    def registrar_sucesso(self):
+        with self._lock:
+            if self._aberto_ate is not None:
+                logging.info(f"🔌 Circuito de {self.nome} fechado; upstream respondendo novamente.")
+            self._falhas = 0
+            self._aberto_ate = None
+            self._teste_em_andamento = False
+
+    def cancelar_teste(self):
+        with self._lock:
+            self._teste_em_andamento = False
+
+    def registrar_falha(self):
+        with self._lock:
+            self._falhas += 1
+            if self._teste_em_andamento or self._falhas >= self.limiar:
+                if self._aberto_ate is None or self._teste_em_andamento:
+                    logging.error(f"🔌 Circuito de {self.nome} aberto por {self.tempo_aberto:.0f}s "
+                                  f"após {self._falhas} falhas consecutivas.")
+                self._aberto_ate = time.monotonic() + self.tempo_aberto
+                self._teste_em_andamento = False
+
+
+_circuitos = {}
+_circuitos_lock = threading.Lock()
+
+
+def circuito(url: str) -> CircuitBreaker:
+    chave = chave_upstream(url)
+    breaker = _circuitos.get(chave)
+    if breaker is None:
+        with _circuitos_lock:
+            breaker = _circuitos.setdefault(chave, CircuitBreaker(chave))
+    return breaker
+
+
+# ------------------------------------------------------------------------------
+# 🔁 Retry com backoff e jitter
+# ------------------------------------------------------------------------------
+def _backoff(tentativa: int, retry_after: Optional[float] = None) -> float:
+    espera = random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** (tentativa - 1)))
+    return max(espera, retry_after or 0)
+
+
+def _pode_repetir(erro: Optional[Exception], status: Optional[int], idempotente: bool) -> bool:
+    """
+    Serviços não idempotentes (ex.: CACSP.incluirNota) só são repetidos quando
+    há certeza de que o upstream não processou a requisição: falha ao conectar
+    ou 429. Timeout de leitura e 5xx podem ter sido aplicados do outro lado.
+    """
+    if erro is not None:
+        if isinstance(erro, requests.exceptions.ConnectTimeout):
+            return True
+        return idempotente
+    if status == 429:
+        return True
+    return idempotente and status is not None and status >= 500
+
+
+def executar_com_resiliencia(
+    enviar: Callable[..., requests.Response],
+    url: str,
+    idempotente: bool,
+    timeout=None,
+    max_tentativas: int = RETRY_MAX_TENTATIVAS,
+) -> requests.Response:
+    """
+    Executa `enviar(timeout=...)` aplicando circuit breaker, retry e o prazo do pedido.
+    Devolve a última resposta obtida (inclusive 4xx/5xx) ou relança o último erro de rede.
+    """
+    breaker = circuito(url)
+    for tentativa in range(1, max_tentativas + 1):
+        restante = tempo_restante()
+        if restante is not None and restante <= 0:
+            raise PrazoEsgotado(f"Prazo do pedido esgotado antes de chamar {url}")
+        try:
+            breaker.permitir()
+        except CircuitoAberto:
+            http_circuito_aberto.incrementar(upstream=breaker.nome)
+            raise
+
+        erro, response, retry_after = None, None, None
+        try:
+            response = enviar(timeout=_timeout_com_prazo(timeout, restante))
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            erro = e
+            breaker.registrar_falha()
+        except Exception:
+            breaker.cancelar_teste()
+            raise
+        else:
+            if response.status_code >= 500:
+                breaker.registrar_falha()
+            else:
+                breaker.registrar_sucesso()
+            if response.status_code == 429:
+                retry_after = segundos_retry_after(response)
+
+        status = response.status_code if response is not None else None
+        if (erro is None and status < 500 and status != 429) or tentativa == max_tentativas \
+                or not _pode_repetir(erro, status, idempotente):
+            if erro is not None:
+                raise erro
+            return response
+
+        espera = _backoff(tentativa, retry_after)
+        restante = tempo_restante()
+        if restante is not None and espera >= restante:
+            raise PrazoEsgotado(f"Prazo do pedido não comporta nova tentativa para {url}") from erro
+        motivo = erro.__class__.__name__ if erro is not None else f"HTTP {status}"
+        http_retries.incrementar(upstream=breaker.nome, motivo=motivo)
+        logging.warning(f"🔁 {motivo} em {chave_upstream(url)}; tentativa {tentativa + 1}/{max_tentativas} em {espera:.1f}s")
+        time.sleep(espera)
@@ -0,0 +1,94 @@
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from observability.metrics import registrar_chamada_http
+from transport import replay
+from transport.ratelimit import rate_limiter
+from transport.resilience import METODOS_IDEMPOTENTES, executar_com_resiliencia
+
+# Quantidade de hosts com pool mantido (Sankhya, VTEX, Telegram...)
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+# Conexões keep-alive por host; deve acompanhar o número de workers
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+
+
+# ------------------------------------------------------------------------------
+# 🌐 Sessão HTTP compartilhada com pools keep-alive por host
+# ------------------------------------------------------------------------------
+
+_session: Optional[requests.Session] = None
+_lock = threading.Lock()
+
+
+def _criar_sessao() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS,
+                          pool_maxsize=HTTP_POOL_MAXSIZE,
+                          pool_block=False)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    logging.debug(f"🌐 Sessão HTTP criada (hosts={HTTP_POOL_CONNECTIONS}, conexões/host={HTTP_POOL_MAXSIZE})")
+    return session
+
+
+def get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = _criar_sessao()
+    return _session
+
+
+def http_request(method: str, url: str, idempotente: Optional[bool] = None, **kwargs) -> requests.Response:
+    """
+    Envia a requisição pela sessão compartilhada, reaproveitando conexões TCP/TLS
+    já abertas com o host. Aplica o timeout padrão quando não informado,
+    respeita o limite de taxa do upstream (ver transport.ratelimit) e repete
+    falhas transitórias conforme transport.resilience. Quando `idempotente`
+    não é informado, é deduzido do método HTTP. Com um cassete ativo
+    (transport.replay), grava a troca ou responde dela sem acessar a rede.
+    """
+    timeout = kwargs.pop("timeout", (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+    if idempotente is None:
+        idempotente = method.upper() in METODOS_IDEMPOTENTES
+
+    def _enviar(timeout):
+        cassete = replay.cassete
+        if cassete is not None and cassete.reproduzindo:
+            registrar_chamada_http()
+            return cassete.reproduzir(method, url, **kwargs)
+        rate_limiter.adquirir(url)
+        registrar_chamada_http()
+        inicio = time.perf_counter()
+        response = get_session().request(method, url, timeout=timeout, **kwargs)
+        if cassete is not None:
+            cassete.gravar(response, time.perf_counter() - inicio)
+        rate_limiter.registrar_resposta(url, response)
+        return response
+
+    return executar_com_resiliencia(_enviar, url, idempotente, timeout=timeout)
+
+
+def http_get(url: str, **kwargs) -> requests.Response:
+    return http_request("GET", url, **kwargs)
+
+
+def http_post(url: str, **kwargs) -> requests.Response:
+    return http_request("POST", url, **kwargs)
+
+
+def close_session():
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -1,14 +1,11 @@
-import logging
 import os
 
 
-def configure_logging():
-    env = os.getenv('APP_ENV')
-
-    if env == '1':
-        logging.basicConfig(level=logging.INFO,
-                            format='%(asctime)s - %(levelname)s - %(message)s')
-    else:
-        logging.basicConfig(level=logging.DEBUG,
-                            format='%(asctime)s - %(levelname)s - %(name)s - %(filename)s:%(lineno)d - %(message)s')
-    logging.debug(f"Valor da variável de ambiente APP_ENV: '{env}'")
+def caminho_dados(nome: str) -> str:
+    """
+    Caminho de um arquivo de dados locais (caches, índices) dentro de ORQ_DATA_DIR.
+    O diretório é criado na primeira chamada.
+    """
+    diretorio = os.getenv('ORQ_DATA_DIR', '.dados')
+    os.makedirs(diretorio, exist_ok=True)
+    return os.path.join(diretorio, nome)
@@ -1,11 +1,12 @@
-import json
 from datetime import datetime
 
 from dotenv import load_dotenv
 import logging
 
+from observability.logs import LazyJson
 from sankhya_api.auth import SankhyaClient
 from sankhya_api.fetch import snk_fetch_codigo_parceiro
+from sankhya_api.product_index import snk_validar_itens_pedido
 from vtex_api.fetch import vtex_fetch_order_data, vtex_fetch_customer_data
 from vtex_api.utils import vtex_payment_system
 
@@ -29,9 +30,52 @@ def vtex_customer_payload_data(vtex_order_id):
     return cadastro_cliente
 
 
-def vtex_order_payload_data(vtex_order_id):
-    # Criar instância autenticada do cliente
-    client = SankhyaClient()
+def _reais(centavos) -> float:
+    return round((centavos or 0) / 100, 2)
+
+
+def vtex_order_items_data(data: dict) -> list:
+    """
+    Converte cada item do pedido VTEX em uma linha do pedido Sankhya: CODPROD pelo
+    RefId (itemMetadata, casado pelo id do SKU), quantidade, preço unitário de
+    tabela e, em VLRDESC, os descontos da linha (promoções e cupons já rateados pela VTEX).
+    """
+    ref_ids = {meta.get("Id"): meta.get("RefId") for meta in data.get("itemMetadata", {}).get("Items", [])}
+    itens = []
+    for item in data["items"]:
+        quantidade = item["quantity"]
+        definicao = item.get("priceDefinition") or {}
+        precos_venda = definicao.get("sellingPrices") or [{"value": item.get("sellingPrice"), "quantity": quantidade}]
+        total_venda = definicao.get("total")
+        if total_venda is None:
+            total_venda = sum(preco["value"] * preco["quantity"] for preco in precos_venda)
+        preco_unitario = item.get("price") or precos_venda[0]["value"]
+        total_bruto = preco_unitario * quantidade
+
+        codprod = ref_ids.get(item.get("id")) or item.get("refId")
+        if not codprod:
+            raise ValueError(f"Item {item.get('id')} do pedido {data.get('orderId')} sem RefId")
+
+        itens.append({
+            "CODPROD": f"{codprod}",
+            "QTDNEG": f"{quantidade}",
+            "VLRUNIT": f"{_reais(preco_unitario)}",
+            "VLRTOT": f"{_reais(total_bruto)}",
+            "VLRDESC": f"{_reais(max(0, total_bruto - total_venda))}",
+        })
+    return itens
+
+
+def vtex_order_frete(data: dict) -> str:
+    """Valor do frete do pedido (totals "Shipping"), em reais, para o VLRFRETE do cabeçalho."""
+    frete = next((total.get("value") for total in data.get("totals") or [] if total.get("id") == "Shipping"), 0)
+    return f"{_reais(frete)}"
+
+
+def vtex_order_payload_data(vtex_order_id, client: SankhyaClient = None):
+    # Reaproveita o cliente do chamador; só autentica um novo se não for informado
+    if client is None:
+        client = SankhyaClient()
 
     data = vtex_fetch_order_data(vtex_order_id)
     data_atual = datetime.now().strftime("%d/%m/%Y")
@@ -40,11 +84,6 @@ def vtex_order_payload_data(vtex_order_id):
     cpf = vtex_dict.get("CGC_CPF")
     codparc = snk_fetch_codigo_parceiro(cpf, client)
 
-    vlrunitcents = data['items'][0]['priceDefinition']['sellingPrices'][0]['value']
-    vlrunitreais = vlrunitcents/100
-    vlrtotcents = data['value']
-    vlrtotreais = vlrtotcents/100
-
     payment_system = data['paymentData']['transactions'][0]['payments'][0]['paymentSystem']
 
     codtipvenda = vtex_payment_system(payment_system)
@@ -64,16 +103,16 @@ def vtex_order_payload_data(vtex_order_id):
         "CODNAT": "1010100",
         "AD_ENTREGA": "S",
         "CIF_FOB": "C",
+        "VLRFRETE": vtex_order_frete(data),
         "INFORMARPRECO": "S",
-        # Melhorar o codigo para quando o pedido tiver mais de um produto
-        "CODPROD": f"{data['itemMetadata']['Items'][0]['RefId']}",
-        "QTDNEG": f"{data['items'][0]['quantity']}",
         "CODLOCALORIG": "188",
         "AD_MONTAGEM": "S",
         "AD_ENTREGAR": "S",
-        "VLRUNIT": f"{vlrunitreais}",
-        "VLRTOT": f"{vlrtotreais}"
-        # "PERCDESC": "⚠️ registrar o desconto"
+        # Todos os itens do pedido VTEX vão no mesmo pedido Sankhya
+        "ITENS": vtex_order_items_data(data)
     }
-    logging.debug(json.dumps(order_data, indent=2, ensure_ascii=False))
+    # SKUs sem produto ativo (ou sem estoque) falham aqui, sem chamar o incluirNota
+    order_data["ITENS"] = snk_validar_itens_pedido(order_data["ITENS"], client, order_data["CODLOCALORIG"],
+                                                   order_data["CODEMP"])
+    logging.debug("%s", LazyJson(order_data))
     return order_data
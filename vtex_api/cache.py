@@ -0,0 +1,51 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+
+# ------------------------------------------------------------------------------
+# 🗃️ Cache de documentos de pedido VTEX
+# ------------------------------------------------------------------------------
+
+class OrderDocumentCache:
+    """
+    Guarda o documento de /api/oms/pvt/orders/{id} já buscado, para que fetch e
+    builders leiam o mesmo payload durante a execução. Buscas concorrentes do
+    mesmo pedido aguardam a primeira, evitando chamadas duplicadas à VTEX.
+    """
+
+    def __init__(self):
+        self._documentos: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _lock_do_pedido(self, order_id: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(order_id, threading.Lock())
+
+    def get_or_fetch(self, order_id: str, loader: Callable[[str], Optional[Any]]) -> Optional[Any]:
+        documento = self._documentos.get(order_id)
+        if documento is not None:
+            logging.debug(f"🗃️ Pedido {order_id} lido do cache")
+            return documento
+
+        with self._lock_do_pedido(order_id):
+            documento = self._documentos.get(order_id)
+            if documento is None:
+                documento = loader(order_id)
+                # Falhas não são guardadas, para que a próxima chamada tente de novo
+                if documento is not None:
+                    self._documentos[order_id] = documento
+            return documento
+
+    def invalidar(self, order_id: Optional[str] = None):
+        with self._lock:
+            if order_id is None:
+                self._documentos.clear()
+                self._locks.clear()
+            else:
+                self._documentos.pop(order_id, None)
+                self._locks.pop(order_id, None)
+
+
+order_cache = OrderDocumentCache()
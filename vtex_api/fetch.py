@@ -1,27 +1,33 @@
-import json
 import logging
 import os
 
 import requests
 from dotenv import load_dotenv
 
+from observability.logs import LazyJson
+from observability.metrics import instrumentar_vtex
+from transport.session import http_get
+from vtex_api.cache import order_cache
+
 # Carregar variáveis do .env
 load_dotenv()
 
 VTEX_APP_KEY = os.getenv("VTEX_APP_KEY")
 VTEX_APP_TOKEN = os.getenv("VTEX_APP_TOKEN")
+# Sem valor, usa https://{VTEX_ACCOUNT}.myvtex.com
+VTEX_BASE_URL = os.getenv("VTEX_BASE_URL")
 
 
-def vtex_fetch_customer_data(vtex_order_id):
-    # Carregar variáveis do arquivo .env
-
+@instrumentar_vtex("pedido")
+def _vtex_request_order_document(vtex_order_id):
     # Parâmetros da VTEX
     app_key = os.getenv("VTEX_APP_KEY")
     app_token = os.getenv("VTEX_APP_TOKEN")
     account = os.getenv("VTEX_ACCOUNT")
 
     # Construir URL da API
-    url = f"https://{account}.myvtex.com/api/oms/pvt/orders/{vtex_order_id}"
+    base_url = VTEX_BASE_URL or f"https://{account}.myvtex.com"
+    url = f"{base_url}/api/oms/pvt/orders/{vtex_order_id}"
 
     # Cabeçalhos da requisição
     headers = {
@@ -32,12 +38,13 @@ def vtex_fetch_customer_data(vtex_order_id):
     # Requisição GET
     try:
         logging.info("🔐 Autenticando na API da Vtex...")
-        response = requests.get(url, headers=headers)
+        response = http_get(url, headers=headers)
 
         # Verificar e imprimir resultado
         if response.status_code == 200:
-            logging.debug("Pedido encontrado:")
-            return response.json()
+            dados = response.json()
+            logging.debug("Pedido %s encontrado:\n%s", vtex_order_id, LazyJson(dados))
+            return dados
         else:
             logging.error(f"Erro: {response.status_code}")
             logging.error(response.text)
@@ -47,37 +54,17 @@ def vtex_fetch_customer_data(vtex_order_id):
         return None
 
 
-def vtex_fetch_order_data(vtex_order_id):
-    # Carregar variáveis do arquivo .env
+def vtex_fetch_order_document(vtex_order_id):
+    """
+    Retorna o documento do pedido, buscando na VTEX apenas na primeira chamada
+    da execução. As chamadas seguintes leem o payload do cache de pedidos.
+    """
+    return order_cache.get_or_fetch(vtex_order_id, _vtex_request_order_document)
 
-    # Parâmetros da VTEX
-    app_key = os.getenv("VTEX_APP_KEY")
-    app_token = os.getenv("VTEX_APP_TOKEN")
-    account = os.getenv("VTEX_ACCOUNT")
 
-    # Construir URL da API
-    url = f"https://{account}.myvtex.com/api/oms/pvt/orders/{vtex_order_id}"
-
-    # Cabeçalhos da requisição
-    headers = {
-        "X-VTEX-API-AppKey": app_key,
-        "X-VTEX-API-AppToken": app_token
-    }
-
-    # Requisição GET
-    try:
-        logging.info("🔐 Autenticando na API da Vtex...")
-        response = requests.get(url, headers=headers)
+def vtex_fetch_customer_data(vtex_order_id):
+    return vtex_fetch_order_document(vtex_order_id)
 
-        # Verificar e imprimir resultado
-        if response.status_code == 200:
-            logging.debug(f"Pedido {vtex_order_id} encontrado:")
-            logging.debug(json.dumps(response.json(), indent=2, ensure_ascii=False))
-            return response.json()
-        else:
-            logging.error(f"Erro: {response.status_code}")
-            logging.error(response.text)
 
-    except requests.RequestException as e:
-        logging.error(f"Erro ao autenticar: {e}")
-        return None
+def vtex_fetch_order_data(vtex_order_id):
+    return vtex_fetch_order_document(vtex_order_id)
@@ -1,17 +1,22 @@
 import os
-import json
 import logging
 import requests
 from dotenv import load_dotenv
 from typing import Any, Dict
 
+from observability.logs import LazyJson
+from observability.metrics import instrumentar_vtex
+from transport.session import http_post
+
 # carregar VTEX creds do .env
 load_dotenv()
 
 VTEX_ACCOUNT    = os.getenv("VTEX_ACCOUNT")
 VTEX_APPKEY     = os.getenv("VTEX_APP_KEY")
 VTEX_APPTOKEN   = os.getenv("VTEX_APP_TOKEN")
+VTEX_BASE_URL   = os.getenv("VTEX_BASE_URL")
 
+@instrumentar_vtex("invoice")
 def vtex_send_invoice(
     order_id: str,
     invoice_data: Dict[str, Any]
@@ -19,10 +24,8 @@ def vtex_send_invoice(
     if not (VTEX_ACCOUNT and VTEX_APPKEY and VTEX_APPTOKEN):
         raise RuntimeError("VTEX_ACCOUNT, VTEX_APPKEY ou VTEX_APPTOKEN não configurados no .env")
 
-    url = (
-        f"https://{VTEX_ACCOUNT}.vtexcommercestable.com.br"
-        f"/api/oms/pvt/orders/{order_id}/invoice"
-    )
+    base_url = VTEX_BASE_URL or f"https://{VTEX_ACCOUNT}.vtexcommercestable.com.br"
+    url = f"{base_url}/api/oms/pvt/orders/{order_id}/invoice"
     headers = {
         "X-VTEX-API-AppKey":   VTEX_APPKEY,
         "X-VTEX-API-AppToken": VTEX_APPTOKEN,
@@ -31,10 +34,10 @@ def vtex_send_invoice(
     }
 
     logging.debug(f"🔗 POST VTEX → {url}")
-    logging.debug("📤 Payload:\n%s", json.dumps(invoice_data, indent=2, ensure_ascii=False))
+    logging.debug("📤 Payload:\n%s", LazyJson(invoice_data))
 
     try:
-        resp = requests.post(url, headers=headers, json=invoice_data, timeout=60)
+        resp = http_post(url, headers=headers, json=invoice_data)
         resp.raise_for_status()
         logging.info(f"✅ Invoice enviada com sucesso para pedido {order_id}")
         return resp.json()